@@ -17,12 +17,51 @@ Modifications:
 import os
 import re
 import json
+import uuid
+import tempfile
+import difflib
 import requests
 import datetime as dt
+from collections import deque
 import streamlit as st
 from streamlit.components.v1 import html
 import logging
 
+from coach_ai import notifications, plans
+from coach_ai.analytics import rollup_series, weekly_adherence
+from coach_ai.batch import BATCH_PLAN_STORE, ingest_batch_results, iter_profile_batch_jobs
+from coach_ai.cache import get_shared_cache
+from coach_ai.calendar_events import (
+    apply_calendar_offsets, build_calendar_layout, compute_plan_horizon_end,
+    expand_calendar_events, get_session_time_slot, iter_ics_calendar,
+)
+from coach_ai.exercises import apply_local_substitution, format_local_substitution, resolve_local_substitution
+from coach_ai.faq import FaqCache, faq_system_prompt
+from coach_ai.llm import ai_edit_plan, call_openai_exercise_suggestion, call_openai_nutrition, call_openai_plan
+from coach_ai.nutrition import fallback_nutrition
+from coach_ai.plans import fallback_plan, plan_digest
+from coach_ai.notifications import validate_phone_number
+from coach_ai.profile import QUESTIONS_BY_KEY, TOTAL_Q, load_roster_profiles, profile_from_answers
+from coach_ai.resilience import action_io_budget, external_request, get_circuit_breakers, start_io_budget
+from coach_ai.roster import (
+    ROSTER_CHECKPOINT_DIR, ROSTER_MAX_WORKERS, RosterRuns, read_roster_checkpoint, roster_checkpoint_path,
+)
+from coach_ai.search import SEARCH_PAGE_SIZE
+from coach_ai.session import (
+    CHAT_HISTORY_MAX, append_chat_message, get_large_text, search_activity, session_size_report, set_large_text,
+)
+from coach_ai.snapshots import (
+    SnapshotWriter, changed_session_snapshot, is_known_user_key, load_session_snapshot, new_user_key,
+)
+from coach_ai.speculation import SpeculationPool
+from coach_ai.versions import PlanVersionStore
+from coach_ai.weather import (
+    annotate_events_with_forecast, fetch_week_forecast, geocode_city, get_weather, weather_advice,
+)
+from coach_ai.workouts import (
+    add_workout, delete_workout, get_workout_index, get_workout_rollups, iter_workouts, recent_workouts,
+)
+
 # ===================== CONFIGURATION LOGGING =====================
 logging.basicConfig(
     level=logging.INFO,
@@ -57,6 +96,27 @@ def get_initial_api_key() -> str:
 
     return key
 
+# ===================== ÉTAT PARTAGÉ DU PROCESSUS =====================
+@st.cache_resource(show_spinner=False)
+def get_speculation_pool() -> SpeculationPool:
+    """Exécuteur, travaux spéculatifs par session (modification, plan initial) et métriques du processus."""
+    return SpeculationPool()
+
+@st.cache_resource(show_spinner=False)
+def get_substitution_stats() -> dict:
+    """Compteurs du processus : remplacements d'exercices résolus localement / envoyés au LLM."""
+    return {"local": 0, "llm": 0}
+
+@st.cache_resource(show_spinner=False)
+def get_roster_runs() -> RosterRuns:
+    """Générations d'effectif en cours dans le processus (survivent aux rechargements de page)."""
+    return RosterRuns()
+
+# ===================== CACHE FAQ DU CHAT =====================
+@st.cache_resource(show_spinner=False)
+def get_faq_cache() -> FaqCache:
+    return FaqCache()
+
 # ===================== PAGE CONFIG =====================
 st.set_page_config(
     page_title="Coach IA – Serge Pro Edition",
@@ -345,18 +405,59 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ===================== SAUVEGARDE DE SESSION =====================
+@st.cache_resource(show_spinner=False)
+def get_snapshot_writer() -> SnapshotWriter:
+    return SnapshotWriter()
+
+def issue_user_key() -> str:
+    """Émet une nouvelle clé utilisateur aléatoire et la place dans l'URL (?u=...)."""
+    key = new_user_key()
+    st.query_params["u"] = key
+    return key
+
+def get_user_key() -> str:
+    """Clé utilisateur portée par l'URL (?u=...) si ce serveur l'a émise, sinon une nouvelle clé."""
+    key = st.query_params.get("u")
+    if is_known_user_key(key):
+        return key
+    return issue_user_key()
+
+def restore_session_snapshot() -> bool:
+    """Restaure l'état sauvegardé de l'utilisateur (une fois par session)."""
+    if st.session_state.get("user_key"):
+        return False
+    user_key = get_user_key()
+    st.session_state.user_key = user_key
+    return load_session_snapshot(st.session_state, user_key)
+
+def save_session_snapshot():
+    """Planifie l'écriture de l'instantané si l'état persistant a changé depuis la dernière fois."""
+    user_key = st.session_state.get("user_key")
+    if not user_key or st.session_state.step == "landing":
+        return
+    blob = changed_session_snapshot(st.session_state)
+    if blob:
+        get_snapshot_writer().submit(user_key, blob)
+
 # ===================== STATE INITIALIZATION =====================
+DEFAULT_USER_NAME = "Athlète"
+
 def _init_state():
     """Initialise l'état de session avec valeurs par défaut"""
     defaults = {
+        # Identifiant technique de la session
+        "session_uid": uuid.uuid4().hex,
+        
         # Navigation
         "step": "landing",
-        "q_index": 0,
+        "form_page": 0,
         "answers": {},
         "page": None,
         
         # Plans et contenu
         "plan_text": "",
+        "plan_history": {"versions": [], "cursor": -1},
         "plan_edit_mode": False,
         "nutrition_plan": None,
         "nutrition_edit_mode": False,
@@ -365,7 +466,7 @@ def _init_state():
         "api_key": get_initial_api_key(),
         
         # Profil
-        "user_name": "Athlète",
+        "user_name": DEFAULT_USER_NAME,
         "user_email": "",
         "user_dob": dt.date.today(),
         "user_gender": "Homme",
@@ -389,18 +490,13 @@ def _init_state():
         "distance_unit": "Kilomètres (km)",
         "language": "Français",
         
-        # History
-        "completed_workouts": [],
-        "chat_messages": [{
-            "role": "system",
-            "content": (
-                "Tu es Serge, un coach sportif professionnel certifié. "
-                "Tu aides les utilisateurs avec leurs questions sur l'entraînement, "
-                "la nutrition, la récupération et la motivation. Réponds de façon "
-                "concise, encourageante et professionnelle."
-            )
-        }],
-        "chat_history": [],
+        # History (tampon circulaire, les messages les plus anciens partent sur disque)
+        "chat_history": deque(maxlen=CHAT_HISTORY_MAX),
+        "chat_seq": 0,
+        
+        # Index de recherche (construit à la première recherche)
+        "search_index": None,
+        "chat_spill_offsets": None,
         
         # WhatsApp
         "whatsapp_phone_number_id": "",
@@ -412,11 +508,13 @@ def _init_state():
         
         # Calendrier
         "calendar_start_date": dt.date.today(),
-        "calendar_events": [],
+        "calendar_layout": None,
         "_last_plan_hash": None,
         
         # Workout history
         "workout_history": [],
+        "workout_index": None,
+        "workout_rollups": None,
         
         # État visuel
         "flash_plan_updated": False,
@@ -427,6 +525,8 @@ def _init_state():
 
         # Modification de plan en attente (via chat)
         "pending_plan_change": None,
+
+        # Mode coach (effectif)
     }
     
     for k, v in defaults.items():
@@ -435,7 +535,8 @@ def _init_state():
             logger.debug(f"Initialized state: {k}")
 
 _init_state()
-
+restore_session_snapshot()
+start_io_budget()
 
 # ===================== WHATSAPP FUNCTIONS =====================
 def send_whatsapp_text_message(to_number: str, message: str) -> bool:
@@ -450,29 +551,8 @@ def send_whatsapp_text_message(to_number: str, message: str) -> bool:
             st.error("⚠️ Identifiants WhatsApp Business API manquants")
             return False
         
-        url = f"https://graph.facebook.com/{version}/{phone_id}/messages"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        }
-        data = {
-            "messaging_product": "whatsapp",
-            "recipient_type": "individual",
-            "to": to_number,
-            "type": "text",
-            "text": {"preview_url": False, "body": message}
-        }
-        
-        logger.info(f"Sending WhatsApp message to {to_number[:4]}***")
-        response = requests.post(url, headers=headers, data=json.dumps(data), timeout=30)
-        
-        if response.status_code == 200:
-            logger.info("WhatsApp message sent successfully")
-            return True
-        else:
-            logger.error(f"WhatsApp API error: {response.status_code}")
-            return False
-            
+        return notifications.send_whatsapp_text_message(to_number, message, phone_id, token, version)
+    
     except requests.exceptions.Timeout:
         logger.error("WhatsApp API timeout")
         st.error("❌ Timeout lors de l'envoi WhatsApp")
@@ -493,44 +573,15 @@ def send_whatsapp_template_message(to_number: str, template_name: str, template_
             st.error("⚠️ Identifiants WhatsApp manquants")
             return False
         
-        url = f"https://graph.facebook.com/{version}/{phone_id}/messages"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        }
-        
-        components = []
-        if template_params:
-            parameters = [{"type": "text", "text": str(param)} for param in template_params]
-            components.append({"type": "body", "parameters": parameters})
-        
-        data = {
-            "messaging_product": "whatsapp",
-            "to": to_number,
-            "type": "template",
-            "template": {
-                "name": template_name,
-                "language": {"code": "fr"},
-                "components": components
-            }
-        }
-        
-        logger.info(f"Sending WhatsApp template '{template_name}'")
-        response = requests.post(url, headers=headers, data=json.dumps(data), timeout=30)
-        
-        return response.status_code == 200
+        return notifications.send_whatsapp_template_message(
+            to_number, template_name, phone_id, token, version, template_params
+        )
         
     except Exception as e:
         logger.error(f"WhatsApp template error: {str(e)}")
         st.error(f"❌ Erreur: {str(e)}")
         return False
 
-def validate_phone_number(phone: str) -> bool:
-    """Valide un numéro de téléphone"""
-    if not phone or not phone.isdigit():
-        return False
-    return 10 <= len(phone) <= 15
-
 # ===================== SIDEBAR NAVIGATION =====================
 with st.sidebar:
     st.title("🏋️ Coach Serge Pro")
@@ -599,14 +650,14 @@ with st.sidebar:
         st.session_state.whatsapp_api_version = api_version
         st.session_state.message_template_name = template_name
     
-    notifications = st.toggle(
+    reminders_enabled = st.toggle(
         "🔔 Activer les rappels",
         value=st.session_state.notifications_enabled,
         key="sidebar_notifications"
     )
-    st.session_state.notifications_enabled = notifications
+    st.session_state.notifications_enabled = reminders_enabled
     
-    if notifications:
+    if reminders_enabled:
         recipient = st.text_input(
             "📞 Numéro destinataire",
             value=st.session_state.recipient_phone,
@@ -653,199 +704,48 @@ with st.sidebar:
     if debug_mode:
         st.write(f"**Step:** {st.session_state.step}")
         st.write(f"**Page:** {st.session_state.page}")
-        st.write(f"**Q-index:** {st.session_state.q_index}")
+        st.write(f"**Form page:** {st.session_state.form_page}")
+        for name, breaker in get_circuit_breakers().items():
+            st.write(f"**Circuit {name}:** {breaker.state}")
+        st.write(f"**Cache partagé:** {get_shared_cache().stats}")
+        faq = get_faq_cache()
+        st.write(f"**Cache FAQ:** {len(faq)} réponses, taux {faq.hit_rate():.0%} — {faq.stats}")
+        st.write(f"**Spéculation:** {get_speculation_pool().metrics}")
+        substitutions = get_substitution_stats()
+        total = substitutions["local"] + substitutions["llm"]
+        if total:
+            st.write(f"**Remplacements locaux:** {substitutions['local']}/{total} ({100 * substitutions['local'] / total:.0f} %)")
+        size_report = session_size_report(st.session_state)
+        st.write(f"**Session:** {sum(max(0, r['octets']) for r in size_report) / 1024:.1f} Ko")
+        st.table(size_report[:10])
 
 # ===================== QUESTIONNAIRE CONSTANTS =====================
-QUESTIONS = [
-    {"key":"age","label":"Quel est ton âge?","type":"number","min":13,"max":100},
-    {"key":"sexe","label":"Quel est ton sexe?","type":"select","options":["Homme","Femme","Autre / Préfère ne pas dire"]},
-    {"key":"taille_cm","label":"Quelle est ta taille (en cm)?","type":"number","min":120,"max":220},
-    {"key":"poids_kg","label":"Quel est ton poids (en kg)?","type":"number","min":35,"max":220},
-    {"key":"niveau_exp","label":"Quel est ton niveau d'expérience en entraînement?","type":"select",
-     "options":["Débutant","Intermédiaire","Avancé","Expert"]},
-    {"key":"blessures","label":"As-tu actuellement des blessures ou des limitations physiques?","type":"text",
-     "help":"Indique toute blessure pour qu'on adapte les exercices"},
-    {"key":"sante","label":"As-tu des problèmes de santé connus (asthme, hypertension, diabète, etc.)?","type":"text"},
-    {"key":"activite","label":"Quel est ton niveau d'activité physique au quotidien (hors entraînements)?","type":"select",
-     "options":["Peu actif (Travail de bureau)","Modérément actif (Marche régulière)",
-                "Actif (Travail physique)","Très actif (Sports fréquents)"]},
-    {"key":"objectif_principal","label":"Quel est ton objectif principal d'entraînement?","type":"text",
-     "help":"Sois précis: perte de poids, gain musculaire, endurance, force..."},
-    {"key":"objectif_secondaire","label":"As-tu un objectif secondaire?","type":"text","help":"Optionnel"},
-    {"key":"horizon","label":"Dans combien de temps veux-tu atteindre ton objectif principal?","type":"select",
-     "options":["3 mois","6 mois","1 an","Plus d'un an"]},
-    {"key":"motivation","label":"Quel est ton niveau de motivation sur 10?","type":"slider","min":1,"max":10},
-    {"key":"types_exos","label":"Quel type d'exercices préfères-tu?","type":"multiselect",
-     "options":["Musculation","Cardio (course, vélo...)","HIIT (haute intensité)",
-                "Sports collectifs","Yoga / Pilates","Natation","Autre"]},
-    {"key":"jours_sem","label":"Combien de jours par semaine veux-tu t'entraîner?","type":"slider","min":1,"max":7},
-    {"key":"duree_min","label":"Combien de temps veux-tu consacrer à chaque séance (en min)?","type":"slider",
-     "min":15,"max":120,"step":5},
-    {"key":"moment","label":"À quel moment de la journée préfères-tu t'entraîner?","type":"select",
-     "options":["Matin (6h-10h)","Midi (11h-14h)","Après-midi (15h-18h)","Soir / Nuit (19h+)"]},
-    {"key":"lieu","label":"Préfères-tu t'entraîner à l'intérieur ou dehors?","type":"select",
-     "options":["Intérieur (gym, maison)","Extérieur (parc, rue...)","Peu importe"]},
-    {"key":"materiel","label":"Quel matériel d'entraînement as-tu à ta disposition?","type":"text",
-     "help":"Liste le matériel disponible"},
-    {"key":"sommeil_h","label":"Combien d'heures dors-tu en moyenne par nuit?","type":"slider","min":4.0,"max":12.0,"step":0.5},
-    {"key":"ville","label":"Dans quelle ville t'entraînes-tu (pour la météo)?","type":"text"},
-    {"key":"nutrition","label":"Souhaites-tu recevoir des conseils de nutrition et/ou de récupération?","type":"select",
-     "options":["Oui, absolument","Oui, si possible","Non merci"]},
+# Questionnaire regroupé en pages (un formulaire soumis d'un bloc par page) ; toutes
+# les réponses qui pilotent le plan sont connues avant la dernière page
+FORM_PAGES = [
+    {"title": "👤 Ton profil", "keys": ["age", "sexe", "taille_cm", "poids_kg"]},
+    {"title": "🩺 Santé et forme", "keys": ["niveau_exp", "blessures", "sante", "activite", "sommeil_h"]},
+    {"title": "🎯 Tes objectifs", "keys": ["objectif_principal", "objectif_secondaire", "horizon", "motivation"]},
+    {"title": "🏋️ Ton entraînement", "keys": ["types_exos", "jours_sem", "duree_min", "moment", "lieu", "materiel"]},
+    {"title": "📍 Derniers détails", "keys": ["ville", "nutrition"]},
 ]
-
-TOTAL_Q = len(QUESTIONS)
+TOTAL_PAGES = len(FORM_PAGES)
 
 # ===================== OPENAI FUNCTIONS =====================
-def call_openai_plan(api_key: str, profile: dict) -> str:
-    """Génère un plan d'entraînement via OpenAI en respectant le nb de séances/semaine."""
-    try:
-        if not api_key or not api_key.startswith("sk-"):
-            logger.warning("Invalid API key for plan generation")
-            return ""
-
-        try:
-            jours_sem = int(profile.get("jours_sem") or 3)
-        except Exception:
-            jours_sem = 3
-        jours_sem = max(1, min(7, jours_sem))
-
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        system_prompt = (
-            "Tu es un coach sportif certifié professionnel.\n"
-            f"L'utilisateur souhaite s'entraîner **{jours_sem} jours par semaine**.\n\n"
-            "GENÈRE un plan d'entraînement personnalisé sur **7 jours** au format Markdown.\n"
-            "- Utilise des sections claires du type : **Jour X — Titre**.\n"
-            "- Pour chaque **jour d'entraînement** (il doit y en avoir exactement "
-            f"{jours_sem} sur 7) indique : durée, exercices (séries x reps) et RPE (1-10), "
-            "ainsi que des conseils de récupération.\n"
-            "- Pour les **jours de repos**, écris clairement : **Jour X — Repos complet** "
-            "et ne propose AUCUN exercice, AUCUNE activité physique, même pas de "
-            "« récupération active ».\n"
-            "- Respecte les blessures, le matériel disponible et le niveau de l'utilisateur."
-        )
-
-        body = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Profil utilisateur: {json.dumps(profile, ensure_ascii=False)}"}
-            ],
-            "max_tokens": 1000,
-            "temperature": 0.7
-        }
-
-        logger.info("Calling OpenAI API for workout plan")
-        response = requests.post(url, headers=headers, json=body, timeout=60)
-
-        if response.status_code == 200:
-            data = response.json()
-            plan = data["choices"][0]["message"]["content"]
-            logger.info("Plan generated successfully")
-            return plan
-        else:
-            logger.error(f"OpenAI API error: {response.status_code}")
-            return ""
-
-    except requests.exceptions.Timeout:
-        logger.error("OpenAI API timeout")
-        st.error("❌ Timeout - L'API OpenAI ne répond pas")
-        return ""
-    except Exception as e:
-        logger.error(f"OpenAI plan error: {str(e)}", exc_info=True)
-        return ""
-
-def compute_calorie_targets(profile: dict):
-    """Calcule l'apport calorique et macros cibles en fonction du profil."""
-    objectif = profile.get("objectif_principal", "Condition générale") or "Condition générale"
-    sexe = profile.get("sexe", "Homme") or "Homme"
-    poids = float(profile.get("poids_kg", 70) or 70)
-    taille = float(profile.get("taille_cm", 175) or 175)
-    age = int(profile.get("age", 30) or 30)
-    activite = profile.get("activite", "Modérément actif") or "Modérément actif"
-
-    if sexe == "Homme":
-        bmr = 10 * poids + 6.25 * taille - 5 * age + 5
-    else:
-        bmr = 10 * poids + 6.25 * taille - 5 * age - 161
-
-    facteur_act = {
-        "Peu actif (Travail de bureau)": 1.2,
-        "Modérément actif (Marche régulière)": 1.4,
-        "Actif (Travail physique)": 1.6,
-        "Très actif (Sports fréquents)": 1.8
-    }.get(activite, 1.4)
-
-    calories = int(bmr * facteur_act)
-
-    obj_lower = (objectif or "").lower()
-    if "perte" in obj_lower:
-        calories -= 400
-    elif "masse" in obj_lower or "gain" in obj_lower:
-        calories += 400
-
-    proteines = round(poids * 1.8)
-    glucides = round((calories * 0.5) / 4)
-    lipides = round((calories * 0.25) / 9)
-
-    return calories, proteines, glucides, lipides, objectif
-
-def call_openai_nutrition(api_key: str, profile: dict) -> str:
-    """Génère un plan nutritionnel via OpenAI sur 7 jours avec cibles caloriques."""
-    try:
-        if not api_key or not api_key.startswith("sk-"):
-            return ""
-
-        calories, proteines, glucides, lipides, objectif = compute_calorie_targets(profile)
-
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        system_prompt = (
-            "Tu es un nutritionniste certifié.\n"
-            f"L'objectif principal déclaré est : {objectif}.\n"
-            f"Les cibles quotidiennes approximatives sont : {calories} kcal, "
-            f"{proteines} g de protéines, {glucides} g de glucides, {lipides} g de lipides.\n\n"
-            "Crée un **plan nutritionnel sur exactement 7 jours (Jour 1 à Jour 7)** "
-            "au format Markdown.\n"
-            "Pour CHAQUE jour, inclus :\n"
-            "- Petit-déjeuner\n- Dîner\n- Souper\n- 1 à 2 collations\n"
-            "- Un total calorique estimé pour la journée (proche des cibles, ±10%).\n"
-            "Utilise des intitulés clairs du type : `### Jour 1`, `### Jour 2`, ..., `### Jour 7`.\n"
-            "Assure-toi de ne PAS oublier le Jour 7."
-        )
-
-        body = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Profil: {json.dumps(profile, ensure_ascii=False)}"}
-            ],
-            "max_tokens": 1500,
-            "temperature": 0.7
-        }
-
-        logger.info("Calling OpenAI API for nutrition plan")
-        response = requests.post(url, headers=headers, json=body, timeout=60)
-
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        return ""
-
-    except Exception as e:
-        logger.error(f"OpenAI nutrition error: {str(e)}")
-        return ""
-
 def call_openai_chat(api_key: str, user_input: str, profile: dict, current_plan: str = "", nutrition_plan: str = "") -> str:
-    """Obtient une réponse de chat du coach IA"""
+    """Obtient une réponse de chat du coach IA (questions fréquentes servies par le cache FAQ)"""
     try:
+        faq = get_faq_cache()
+        # Le nom par défaut n'identifie personne
+        user_name = st.session_state.get("user_name")
+        identity = (None if user_name == DEFAULT_USER_NAME else user_name, st.session_state.get("user_email"))
+        faq_key = faq.make_key(user_input, profile, identity)
+        if faq_key:
+            cached = faq.get(faq_key)
+            if cached:
+                logger.info(f"FAQ cache hit (taux {faq.hit_rate():.0%})")
+                return cached
+        
         if not api_key or not api_key.startswith("sk-"):
             return "Configure une clé API OpenAI pour utiliser le chat IA."
         
@@ -855,18 +755,22 @@ def call_openai_chat(api_key: str, user_input: str, profile: dict, current_plan:
             "Content-Type": "application/json"
         }
         
-        system_prompt = (
-            f"Tu es Serge, un coach sportif professionnel expert et motivant. "
-            f"Tu discutes avec ton client et tu connais son profil, son plan d'entraînement et son plan nutritionnel. "
-            f"Réponds de manière personnalisée, concise et pratique. "
-            f"\n\n**PROFIL CLIENT:**\n{json.dumps(profile, ensure_ascii=False, indent=2)}"
-        )
-        
-        if current_plan:
-            system_prompt += f"\n\n**PLAN D'ENTRAÎNEMENT ACTUEL:**\n{current_plan[:1500]}"
-        
-        if nutrition_plan:
-            system_prompt += f"\n\n**PLAN NUTRITIONNEL:**\n{nutrition_plan[:1000]}"
+        if faq_key:
+            # Réponse partagée avec tout le groupe de profils : aucun contexte personnel
+            system_prompt = faq_system_prompt(profile)
+        else:
+            system_prompt = (
+                f"Tu es Serge, un coach sportif professionnel expert et motivant. "
+                f"Tu discutes avec ton client et tu connais son profil, son plan d'entraînement et son plan nutritionnel. "
+                f"Réponds de manière personnalisée, concise et pratique. "
+                f"\n\n**PROFIL CLIENT:**\n{json.dumps(profile, ensure_ascii=False, indent=2)}"
+            )
+            
+            if current_plan:
+                system_prompt += f"\n\n**PLAN D'ENTRAÎNEMENT ACTUEL:**\n{current_plan[:1500]}"
+            
+            if nutrition_plan:
+                system_prompt += f"\n\n**PLAN NUTRITIONNEL:**\n{nutrition_plan[:1000]}"
         
         body = {
             "model": "gpt-4o-mini",
@@ -879,124 +783,19 @@ def call_openai_chat(api_key: str, user_input: str, profile: dict, current_plan:
         }
         
         logger.info("Calling OpenAI API for chat")
-        response = requests.post(url, headers=headers, json=body, timeout=30)
+        response = external_request("openai", "POST", url, timeout=30, headers=headers, json=body)
         
         if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
+            reply = response.json()["choices"][0]["message"]["content"]
+            if faq_key:
+                faq.put(faq_key, reply)
+            return reply
         return "Désolé, je ne peux pas répondre pour le moment."
         
     except Exception as e:
         logger.error(f"OpenAI chat error: {str(e)}")
         return f"Erreur: {str(e)}"
 
-def call_openai_exercise_suggestion(api_key: str, request: str, profile: dict, current_plan: str) -> str:
-    """Propose des exercices de remplacement sans modifier le plan (demande confirmation)."""
-    if not api_key or not api_key.startswith("sk-"):
-        return "Configure une clé API OpenAI pour que je puisse analyser et proposer un remplacement précis."
-
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    system_prompt = (
-        "Tu es un coach sportif professionnel.\n"
-        "L'utilisateur veut modifier un ou plusieurs exercices dans son plan d'entraînement.\n"
-        "Lis sa demande et PROPOSE 1 à 3 exercices de remplacement **concrets** "
-        "(nom, séries, répétitions, éventuellement charge ou RPE) qui soient équivalents.\n"
-        "Ne réécris PAS tout le plan, concentre-toi seulement sur les substitutions proposées.\n"
-        "À la fin, termine TOUJOURS par une question très claire du type :\n"
-        "\"Veux-tu que je mette à jour le plan avec ces changements ? Réponds par oui ou non.\""
-    )
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {
-            "role": "user",
-            "content": (
-                f"Profil utilisateur:\n{json.dumps(profile, ensure_ascii=False, indent=2)}\n\n"
-                f"Plan actuel (extrait):\n{(current_plan or '')[:2000]}\n\n"
-                f"Demande de l'utilisateur :\n{request}"
-            )
-        }
-    ]
-
-    body = {
-        "model": "gpt-4o-mini",
-        "messages": messages,
-        "max_tokens": 700,
-        "temperature": 0.6
-    }
-
-    try:
-        logger.info("Calling OpenAI for exercise suggestion (no plan update yet)")
-        response = requests.post(url, headers=headers, json=body, timeout=60)
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            logger.error(f"OpenAI exercise suggestion error: {response.status_code}")
-            return "Je n'ai pas pu générer une suggestion d'exercice pour le moment."
-    except Exception as e:
-        logger.error(f"Exercise suggestion error: {e}")
-        return f"Erreur lors de la suggestion d'exercice : {e}"
-
-def fallback_nutrition(profile: dict) -> str:
-    """Génère un plan nutritionnel simple sur 7 jours avec les bons apports."""
-    calories, proteines, glucides, lipides, objectif = compute_calorie_targets(profile)
-
-    base_intro = f"""**Plan nutritionnel — Objectif : {objectif}**
-
-🔹 Apport cible : **{calories} kcal / jour**  
-🔹 Répartition macros (approx.) :  
-- Protéines : {proteines} g  
-- Glucides : {glucides} g  
-- Lipides : {lipides} g  
-
-Ce plan propose 7 jours avec des menus variés mais équilibrés, autour de ces cibles.
-"""
-
-    jours = []
-    for i in range(1, 8):
-        jours.append(f"""
----
-
-### Jour {i}
-
-**Petit-déjeuner** (~{int(0.25 * calories)} kcal)  
-- Avoine (60g) avec fruits rouges  
-- Yogourt grec (150g)  
-- 1 fruit (pomme ou banane)  
-
-**Dîner** (~{int(0.3 * calories)} kcal)  
-- Source de protéine (poulet, tofu ou poisson, 120-150g)  
-- Féculent complet (riz brun, quinoa, pâtes de blé entier ~80-100g crus)  
-- Légumes variés (brocoli, carottes, salade)  
-- 1 c. à soupe d'huile d'olive  
-
-**Souper** (~{int(0.3 * calories)} kcal)  
-- Source de protéine (saumon, légumineuses, tempeh, etc. 120-150g)  
-- Légumes cuits ou crus  
-- Portion modérée de féculents (riz, pommes de terre, etc.)  
-
-**Collations** (~{int(0.15 * calories)} kcal au total)  
-- 1 poignée d'amandes ou noix (20-30g)  
-- 1 yogourt ou un petit shake protéiné  
-- 1 fruit
-
-**Total cible** : ~{calories} kcal (±10%)  
-""")
-
-    conseils = """
----
-
-💧 **Hydratation :** 2-3 L d'eau par jour  
-🚫 **À limiter :** sucres ajoutés, aliments ultra-transformés, alcool en excès  
-✅ **À privilégier :** aliments entiers, protéines maigres, légumes, fruits frais, fibres  
-"""
-
-    return base_intro + "\n".join(jours) + conseils
-
 # ===================== CALENDRIER FUNCTIONS =====================
 try:
     from streamlit_calendar import calendar as st_calendar
@@ -1005,357 +804,229 @@ except ImportError:
     CALENDAR_AVAILABLE = False
     logger.warning("streamlit-calendar not installed")
 
-def parse_workout_plan(plan_text: str) -> list:
-    """Parse le plan pour extraire les sessions par jour"""
-    sessions = []
-    
+def current_plan_digest() -> str:
+    """Empreinte du plan courant, calculée une seule fois par changement de plan."""
+    digest = st.session_state.get("_last_plan_hash")
+    if digest is None:
+        plan_text = get_large_text(st.session_state, "plan_text")
+        if not plan_text:
+            return None
+        digest = plan_digest(plan_text)
+        st.session_state._last_plan_hash = digest
+    return digest
+
+def parse_workout_plan(plan_text: str, digest: str = None) -> list:
+    """Parse le plan ; le résultat est mis en cache par empreinte de contenu."""
     if not plan_text or not isinstance(plan_text, str) or not plan_text.strip():
-        logger.warning("Plan text is empty or invalid")
-        return sessions
-    
-    lines = plan_text.splitlines()
-    logger.info(f"Parsing plan with {len(lines)} lines")
-    
-    patterns = [
-        re.compile(r'^\s*\*\*\s*(?:Jour|Day|JOUR|DAY)\s+(\d+)\s*(?:[:\-–—]\s*(.*))?\s*\*\*\s*$', re.IGNORECASE),
-        re.compile(r'^\s*(?:Jour|Day|JOUR|DAY)\s+(\d+)\s*(?:[:\-–—]\s*(.*))?\s*$', re.IGNORECASE),
-        re.compile(r'^\s*#{1,6}\s*(?:Jour|Day|JOUR|DAY)\s+(\d+)\s*(?:[:\-–—]\s*(.*))?\s*$', re.IGNORECASE),
-    ]
-    
-    current_day = None
-    current_title = None
-    current_description = []
-    
-    for line_num, line in enumerate(lines, 1):
-        line_stripped = line.strip()
-        
-        if not line_stripped:
-            continue
-        
-        matched = False
-        for pattern in patterns:
-            match = pattern.match(line_stripped)
-            if match:
-                matched = True
-                
-                if current_day is not None:
-                    desc = "\n".join(current_description).strip()
-                    sessions.append({
-                        "day": current_day,
-                        "title": current_title or "Entraînement",
-                        "description": desc[:500] if desc else "Séance d'entraînement"
-                    })
-                    logger.debug(f"Saved session Day {current_day}: {current_title}")
-                
-                current_day = int(match.group(1))
-                current_title = (match.group(2) or "Entraînement").strip() if match.lastindex and match.group(2) else "Entraînement"
-                current_description = []
-                logger.info(f"Line {line_num}: Found Day {current_day} - {current_title}")
-                break
-        
-        if matched:
-            continue
-        
-        if current_day is not None:
-            if not re.match(r'^[\*\-=_#]{3,}$', line_stripped):
-                if len(current_description) < 20:
-                    current_description.append(line_stripped)
-    
-    if current_day is not None:
-        desc = "\n".join(current_description).strip()
-        sessions.append({
-            "day": current_day,
-            "title": current_title or "Entraînement",
-            "description": desc[:500] if desc else "Séance d'entraînement"
-        })
-        logger.debug(f"Saved final session Day {current_day}: {current_title}")
-    
-    logger.info(f"✅ Parsed {len(sessions)} total sessions from plan")
-    
-    for session in sessions:
-        logger.info(f" → Jour {session['day']}: {session['title']}")
-    
-    if len(sessions) == 0:
-        logger.warning("No sessions found with standard patterns, trying basic parsing")
-        for line in lines:
-            if re.search(r'(?:jour|day)\s*(\d+)', line, re.IGNORECASE):
-                match = re.search(r'(?:jour|day)\s*(\d+)', line, re.IGNORECASE)
-                day_num = int(match.group(1))
-                sessions.append({
-                    "day": day_num,
-                    "title": f"Jour {day_num}",
-                    "description": line.strip()
-                })
-                logger.info(f" → Basic parse: Jour {day_num}")
-    
-    return sessions
-
-def create_calendar_events(sessions: list, start_date=None) -> list:
-    """Crée des événements calendrier à partir des sessions"""
-    from datetime import datetime, timedelta
-    
+        return plans.parse_workout_plan(plan_text)
+    return _parse_workout_plan_cached(digest or plan_digest(plan_text), plan_text)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _parse_workout_plan_cached(digest: str, _plan_text: str) -> list:
+    return plans.parse_workout_plan(_plan_text)
+
+def create_calendar_events(sessions: list, start_date=None, end_date=None) -> list:
+    """Crée des événements calendrier récurrents à partir des sessions."""
     if not sessions:
         return []
-    
+
     if start_date is None:
-        start_date = datetime.now()
-    
-    if hasattr(start_date, 'hour'):
-        start_date = datetime.combine(start_date.date(), datetime.min.time())
-    else:
-        start_date = datetime.combine(start_date, datetime.min.time())
-    
+        start_date = dt.date.today()
+
     moment_pref = st.session_state.answers.get("moment", "Matin (6h-10h)")
     duree = int(st.session_state.answers.get("duree_min", 60) or 60)
-    
-    time_map = {
-        "Matin (6h-10h)": "07:00",
-        "Midi (11h-14h)": "12:00",
-        "Après-midi (15h-18h)": "15:00",
-        "Soir / Nuit (19h+)": "18:00"
-    }
-    
-    start_time = time_map.get(moment_pref, "07:00")
-    hour, minute = map(int, start_time.split(':'))
-    end_minute = minute + duree
-    end_hour = hour + (end_minute // 60)
-    end_minute = end_minute % 60
-    end_time = f"{end_hour:02d}:{end_minute:02d}"
-    
-    events = []
-    for session in sessions:
-        event_date = start_date + timedelta(days=session['day'] - 1)
-        date_str = event_date.strftime("%Y-%m-%d")
-        
-        title_lower = (session['title'] or "").lower()
-        is_rest = any(word in title_lower for word in ["repos", "rest", "récupération", "recovery"])
-        color = "#888888" if is_rest else "#3ea6ff"
-        
-        events.append({
-            "title": f"Jour {session['day']}: {session['title']}",
-            "start": f"{date_str}T{start_time}:00",
-            "end": f"{date_str}T{end_time}:00",
-            "extendedProps": {
-                "description": session['description'],
-                "day_number": session['day']
-            },
-            "backgroundColor": color,
-            "borderColor": color,
-            "textColor": "#ffffff"
-        })
-    
-    logger.info(f"Created {len(events)} calendar events")
+
+    layout = build_calendar_layout(sessions, moment_pref, duree)
+    events = apply_calendar_offsets(layout, start_date, end_date)
+    logger.info(f"Created {len(events)} recurring calendar events")
     return events
 
-def recompute_calendar_events():
-    """Recalcule les événements du calendrier"""
+# ===================== EXPORT ICALENDAR =====================
+def build_user_ics():
+    """Flux iCalendar du plan de l'utilisateur courant sur tout son horizon."""
+    start_date = st.session_state.get("calendar_start_date") or dt.date.today()
+    end_date = compute_plan_horizon_end(
+        start_date,
+        st.session_state.answers.get("horizon"),
+        st.session_state.get("target_date")
+    )
+    schedule = {
+        "sessions": parse_workout_plan(get_large_text(st.session_state, "plan_text"), current_plan_digest()),
+        "start_date": start_date,
+        "end_date": end_date,
+        "moment": st.session_state.answers.get("moment", "Matin (6h-10h)"),
+        "duree": st.session_state.answers.get("duree_min", 60),
+        "uid": "lp9"
+    }
+    return iter_ics_calendar([schedule])
+
+def recompute_calendar_events(dates_only: bool = False) -> list:
+    """
+    Recalcule les événements du calendrier.
+
+    Seule la disposition compacte (modèles + décalages) est conservée en session ;
+    les événements datés sont dérivés à la demande. Avec `dates_only=True`
+    (changement de date de début), la disposition en cache est simplement
+    re-datée sans re-parser le plan.
+    """
     start_date = st.session_state.get("calendar_start_date")
     if not start_date:
         start_date = dt.date.today()
         st.session_state.calendar_start_date = start_date
     
-    plan_text = st.session_state.get("plan_text", "") or ""
+    plan_text = get_large_text(st.session_state, "plan_text")
     if not plan_text:
-        st.session_state.calendar_events = []
-        return
+        st.session_state.calendar_layout = None
+        return []
+    
+    end_date = compute_plan_horizon_end(
+        start_date,
+        st.session_state.answers.get("horizon"),
+        st.session_state.get("target_date")
+    )
+    
+    layout = st.session_state.get("calendar_layout")
+    moment_pref = st.session_state.answers.get("moment", "Matin (6h-10h)")
+    duree = int(st.session_state.answers.get("duree_min", 60) or 60)
+    slot = get_session_time_slot(moment_pref, duree)
+    plan_hash = current_plan_digest()
+    
+    layout_is_current = bool(layout) and (
+        dates_only or (layout["plan_hash"] == plan_hash and layout["slot"] == slot)
+    )
     
-    sessions = parse_workout_plan(plan_text)
-    events = create_calendar_events(sessions, start_date)
-    st.session_state.calendar_events = events
+    if not layout_is_current:
+        sessions = parse_workout_plan(plan_text, plan_hash)
+        layout = build_calendar_layout(sessions, moment_pref, duree, plan_hash=plan_hash, previous=layout)
+        st.session_state.calendar_layout = layout
+    
+    events = apply_calendar_offsets(layout, start_date, end_date)
     logger.info(f"Calendar recomputed: {len(events)} events")
+    return events
 
-# ===================== MÉTÉO FUNCTIONS =====================
-def geocode_city(city: str):
-    """Récupère les coordonnées d'une ville"""
-    try:
-        response = requests.get(
-            "https://geocoding-api.open-meteo.com/v1/search",
-            params={"name": city, "count": 1, "language": "fr"},
-            timeout=10
-        )
-        results = response.json().get("results", [])
-        if not results:
-            return None
-        loc = results[0]
-        return (
-            float(loc["latitude"]),
-            float(loc["longitude"]),
-            f'{loc["name"]}, {loc.get("country","")}'
-        )
-    except Exception as e:
-        logger.error(f"Geocoding error: {str(e)}")
-        return None
+def get_calendar_events() -> list:
+    """Événements datés, dérivés à la demande de la disposition compacte en session."""
+    return recompute_calendar_events(dates_only=bool(st.session_state.get("calendar_layout")))
 
-def get_today_weather(lat: float, lon: float):
-    """Récupère la météo du jour"""
-    try:
-        response = requests.get(
-            "https://api.open-meteo.com/v1/forecast",
-            params={
-                "latitude": lat,
-                "longitude": lon,
-                "hourly": "temperature_2m,precipitation_probability",
-                "forecast_days": 1,
-                "timezone": "auto"
-            },
-            timeout=10
-        )
-        return response.json()
-    except Exception as e:
-        logger.error(f"Weather API error: {str(e)}")
-        return None
+# ===================== HISTORIQUE DES VERSIONS DU PLAN =====================
+# Versions gardées par session (annuler / rétablir)
+PLAN_HISTORY_MAX = 20
 
-def weather_advice(weather_json, planned_minutes: int) -> str:
-    """Génère des conseils selon la météo"""
-    try:
-        temps = weather_json["hourly"]["temperature_2m"][0]
-        prec = weather_json["hourly"]["precipitation_probability"][0]
-        
-        if prec > 50 or temps < 0 or temps > 28:
-            return (
-                f"⚠️ Météo peu favorable ({temps}°C, pluie {prec}%). "
-                f"Alternative indoor ~{planned_minutes} min : circuit cardio / full body / yoga."
-            )
-        return f"✅ Météo OK ({temps}°C, pluie {prec}%). Entraînement extérieur possible!"
-    except Exception as e:
-        logger.error(f"Weather advice error: {str(e)}")
-        return "Météo indisponible."
-
-def get_weather(city: str = "Montreal") -> dict:
-    """Récupère la météo actuelle pour une ville via Open-Meteo (plus fiable)."""
-    geo = geocode_city(city)
-    if geo:
-        lat, lon, full_name = geo
-        try:
-            response = requests.get(
-                "https://api.open-meteo.com/v1/forecast",
-                params={
-                    "latitude": lat,
-                    "longitude": lon,
-                    "current_weather": True,
-                    "timezone": "auto"
-                },
-                timeout=10
-            )
-            data = response.json()
-            cw = data.get("current_weather", {}) or {}
-            temp = cw.get("temperature")
-            weather_code = cw.get("weathercode")
-
-            code_map = {
-                0: "Ciel dégagé",
-                1: "Principalement dégagé",
-                2: "Partiellement nuageux",
-                3: "Couvert",
-                45: "Brouillard",
-                48: "Brouillard givrant",
-                51: "Bruine faible",
-                53: "Bruine modérée",
-                55: "Bruine forte",
-                61: "Pluie faible",
-                63: "Pluie modérée",
-                65: "Pluie forte",
-                71: "Neige faible",
-                73: "Neige modérée",
-                75: "Neige forte",
-                80: "Averses faibles",
-                81: "Averses modérées",
-                82: "Averses fortes"
-            }
-            condition = code_map.get(weather_code, "Conditions variables")
+@st.cache_resource(show_spinner=False)
+def get_plan_version_store() -> PlanVersionStore:
+    return PlanVersionStore()
 
-            if isinstance(temp, (int, float)):
-                return {
-                    "temp": f"{round(temp)}",
-                    "condition": condition,
-                    "humidity": "--",
-                    "feels_like": f"{round(temp)}"
-                }
-        except Exception as e:
-            logger.warning(f"Open-Meteo error in get_weather: {e}")
+def commit_plan_text(text: str):
+    """Remplace le plan courant, l'ajoute à l'historique et met à jour le calendrier."""
+    store = get_plan_version_store()
+    history = st.session_state.plan_history
+    versions = history["versions"]
+    current = versions[history["cursor"]] if versions else None
 
-    logger.warning("Fallback météo utilisé (valeurs par défaut).")
-    return {
-        "temp": "20",
-        "condition": "Ensoleillé",
-        "humidity": "65",
-        "feels_like": "18"
-    }
+    owner = st.session_state.session_uid
 
-# ===================== PLAN ADAPTATION (AI AGENT) =====================
-def _extract_json_block(text: str):
-    """Extrait un bloc JSON d'une réponse texte (avec ou sans ```json)."""
-    try:
-        m = re.search(r"```json(.*?)```", text, flags=re.DOTALL | re.IGNORECASE)
-        if m:
-            return json.loads(m.group(1).strip())
+    if current is None and get_large_text(st.session_state, "plan_text"):
+        # Plan restauré d'une sauvegarde : il devient la première version de l'historique
+        current = store.put(get_large_text(st.session_state, "plan_text"), owner=owner)
+        versions.append(current)
+        history["cursor"] = 0
+
+    digest = plan_digest(text)
+    if digest == current and digest == st.session_state.get("_last_plan_hash"):
+        # Contenu inchangé : ni nouvelle version ni recalcul du calendrier
+        return
 
-        m = re.search(r"(\{.*\})", text, flags=re.DOTALL)
-        if m:
-            return json.loads(m.group(1).strip())
+    if digest != current:
+        store.put(text, parent=current, digest=digest, owner=owner)
+        # Une nouvelle version après « annuler » efface les versions « rétablir »
+        for dropped in versions[history["cursor"] + 1:]:
+            store.release(dropped, owner)
+        del versions[history["cursor"] + 1:]
+        versions.append(digest)
+        while len(versions) > PLAN_HISTORY_MAX:
+            store.release(versions.pop(0), owner)
+        history["cursor"] = len(versions) - 1
+
+    set_large_text(st.session_state, "plan_text", text)
+    st.session_state._last_plan_hash = digest
+    recompute_calendar_events()
+
+def keep_plan_history_alive():
+    """
+    Maintient les versions de la session dans le magasin partagé. Si elles ont
+    été libérées (session inactive trop longtemps), l'historique repart du plan courant.
+    """
+    history = st.session_state.plan_history
+    if history["versions"] and not get_plan_version_store().touch(st.session_state.session_uid):
+        logger.info("Plan history expired, restarting from the current plan")
+        st.session_state.plan_history = {"versions": [], "cursor": -1}
+
+def _move_plan_cursor(step: int) -> bool:
+    history = st.session_state.plan_history
+    target = history["cursor"] + step
+    if not (0 <= target < len(history["versions"])):
+        return False
+    history["cursor"] = target
+    digest = history["versions"][target]
+    text = get_plan_version_store().get(digest)
+    set_large_text(st.session_state, "plan_text", text)
+    st.session_state._last_plan_hash = digest
+    recompute_calendar_events()
+    return True
+
+def undo_plan_change() -> bool:
+    """Revient à la version précédente du plan."""
+    return _move_plan_cursor(-1)
+
+def redo_plan_change() -> bool:
+    """Rétablit la version suivante du plan."""
+    return _move_plan_cursor(1)
+
+def previous_plan_diff() -> str:
+    """Diff unifié entre la version précédente et la version courante du plan."""
+    history = st.session_state.plan_history
+    if history["cursor"] < 1:
+        return ""
+    store = get_plan_version_store()
+    previous = store.get(history["versions"][history["cursor"] - 1]).splitlines()
+    current = store.get(history["versions"][history["cursor"]]).splitlines()
+    return "\n".join(difflib.unified_diff(
+        previous, current, fromfile="version précédente", tofile="version actuelle", lineterm=""
+    ))
 
-        return None
-    except Exception:
-        return None
+# ===================== MÉTÉO FUNCTIONS =====================
+@st.cache_data(ttl=1800, show_spinner=False)
+def _fetch_week_forecast(lat: float, lon: float, days: int):
+    """Appel Open-Meteo mis en cache (processus, puis cache partagé) ; lève une exception en cas d'échec (jamais mis en cache)."""
+    return fetch_week_forecast(lat, lon, days)
 
-def ai_edit_plan(api_key: str, instruction: str, plan_text: str, profile: dict) -> dict:
-    """Adapte le plan complet avec l'IA"""
-    if not api_key or not api_key.startswith("sk-"):
-        return {"ok": False, "new_plan": "", "summary": "Pas de clé API."}
-    
+def get_week_forecast(lat: float, lon: float, days: int = 7):
+    """Récupère la prévision horaire (température, probabilité de pluie) sur `days` jours."""
     try:
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        system_prompt = (
-            "Tu es un coach certifié. Tu reçois un plan d'entraînement en Markdown "
-            "et une instruction de modification. Adapte le plan selon l'instruction "
-            "en gardant le format (jours, exercices, RPE). Respecte les contraintes. "
-            "Réponds STRICTEMENT en JSON: {\"new_plan\": \"\", \"summary\": \"\", \"changed_days\": []}"
-        )
-        
-        user_prompt = (
-            f"=== PROFIL ===\n{json.dumps(profile, ensure_ascii=False)}\n\n"
-            f"=== INSTRUCTION ===\n{instruction}\n\n"
-            f"=== PLAN ACTUEL ===\n{plan_text}\n\n"
-            "=== FORMAT SORTIE ===\n"
-            "{\"new_plan\": \"...\", \"summary\": \"...\", \"changed_days\": [1,2,3]}"
-        )
-        
-        body = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "max_tokens": 1400,
-            "temperature": 0.5
-        }
-        
-        logger.info(f"Calling AI edit plan: {instruction[:50]}...")
-        response = requests.post(url, headers=headers, json=body, timeout=60)
-        
-        if response.status_code != 200:
-            return {"ok": False, "new_plan": "", "summary": f"Erreur API: {response.status_code}"}
-        
-        content = response.json()["choices"][0]["message"]["content"]
-        obj = _extract_json_block(content) or {}
-        
-        new_plan = obj.get("new_plan", "").strip()
-        summary = obj.get("summary", "").strip()
-        
-        if new_plan and ("Jour 1" in new_plan or "Day 1" in new_plan):
-            logger.info("Plan adapted successfully")
-            return {"ok": True, "new_plan": new_plan, "summary": summary or "Plan adapté."}
-        
-        return {"ok": False, "new_plan": "", "summary": "Réponse modèle non exploitable."}
-        
+        return _fetch_week_forecast(lat, lon, days)
     except Exception as e:
-        logger.error(f"AI edit plan error: {str(e)}", exc_info=True)
-        return {"ok": False, "new_plan": "", "summary": f"Erreur: {str(e)}"}
+        logger.error(f"Weather API error: {str(e)}")
+        return None
+
+def get_user_week_forecast():
+    """Prévision 7 jours pour la ville du profil (None si indisponible)."""
+    ville = st.session_state.answers.get("ville", "Montreal") or "Montreal"
+    geo = geocode_city(ville)
+    if not geo:
+        return None
+    lat, lon, _ = geo
+    return get_week_forecast(lat, lon)
+
+# ===================== PRÉCHARGEMENT DU QUESTIONNAIRE =====================
+def prefetch_city_weather(city: str):
+    """Géocode la ville et charge sa prévision en arrière-plan (caches partagés)."""
+    def warm():
+        geo = geocode_city(city)
+        if geo:
+            get_week_forecast(geo[0], geo[1])
+
+    if city and city.strip():
+        get_speculation_pool().submit(warm)
 
 # ===================== CHAT COMMAND HANDLER =====================
 def handle_chat_command(user_text: str):
@@ -1365,22 +1036,47 @@ def handle_chat_command(user_text: str):
 
     # 0) Si une modification est en attente, on check d'abord oui/non
     pending = st.session_state.get("pending_plan_change")
+    is_confirmation = any(w in low for w in ["oui", "yes", "ok", "vas-y", "vas y", "go", "applique", "apply"])
+    if not (pending and is_confirmation):
+        # Tout autre message rend caduque la modification calculée par anticipation
+        get_speculation_pool().discard_edit(st.session_state.session_uid)
+    
     if pending:
-        if any(w in low for w in ["oui", "yes", "ok", "vas-y", "vas y", "go", "applique", "apply"]):
+        if is_confirmation:
+            local = pending.get("local")
+            if local:
+                new_plan, count = apply_local_substitution(
+                    get_large_text(st.session_state, "plan_text"), local["source"], local["replacement"]
+                )
+                if count:
+                    st.session_state.pending_plan_change = None
+                    commit_plan_text(new_plan)
+                    st.session_state.flash_plan_updated = True
+                    return {
+                        "feedback": (
+                            "✅ J'ai mis à jour ton plan avec les changements proposés.\n\n"
+                            f"**Résumé** — {local['source']} → {local['replacement']} ({count} occurrence(s))."
+                        ),
+                        "plan_changed": True,
+                        "calendar_changed": True,
+                        "is_command": True
+                    }
+
             profile = st.session_state.answers
-            result = ai_edit_plan(
+            plan_text = get_large_text(st.session_state, "plan_text")
+            result = get_speculation_pool().take_edit(
+                st.session_state.session_uid, pending["instruction"], plan_text
+            ) or ai_edit_plan(
                 st.session_state.api_key,
                 pending["instruction"],
-                st.session_state.plan_text,
+                plan_text,
                 profile
             )
             st.session_state.pending_plan_change = None
 
             if result.get("ok"):
-                st.session_state.plan_text = result["new_plan"]
+                commit_plan_text(result["new_plan"])
                 st.session_state.flash_plan_updated = True
-                st.session_state._last_plan_hash = hash(st.session_state.plan_text)
-                recompute_calendar_events()
                 feedback = (
                     "✅ J'ai mis à jour ton plan avec les changements proposés.\n\n"
                     f"**Résumé** — {result.get('summary', 'Plan adapté.')}"
@@ -1410,16 +1106,10 @@ def handle_chat_command(user_text: str):
 
     # 1) Regénération complète du plan
     if re.search(r"\b(régénère|regenere|regenerate)\b.*\bplan\b", low):
-        profile = {k: st.session_state.answers.get(k) for k in [
-            "age", "sexe", "taille_cm", "poids_kg", "niveau_exp", "blessures", "sante",
-            "activite", "objectif_principal", "objectif_secondaire", "horizon", "motivation",
-            "types_exos", "jours_sem", "duree_min", "moment", "lieu", "materiel",
-            "sommeil_h", "ville", "nutrition"
-        ]}
-        plan_text = call_openai_plan(st.session_state.api_key, profile) if st.session_state.api_key else ""
-        st.session_state.plan_text = plan_text or fallback_plan(profile)
-        st.session_state._last_plan_hash = hash(st.session_state.plan_text)
-        recompute_calendar_events()
+        profile = profile_from_answers(st.session_state.answers)
+        plan_text = call_openai_plan(st.session_state.api_key, profile, use_cache=False) if st.session_state.api_key else ""
+        plan_text = plan_text or fallback_plan(profile)
+        commit_plan_text(plan_text)
         return {
             "feedback": "🔄 J'ai régénéré ton plan.",
             "plan_changed": True,
@@ -1436,6 +1126,27 @@ def handle_chat_command(user_text: str):
     is_replacement_request = any(re.search(p, low) for p in replace_patterns)
 
     if is_replacement_request:
+        resolution = resolve_local_substitution(
+            text, st.session_state.answers, get_large_text(st.session_state, "plan_text")
+        )
+        if resolution:
+            stats = get_substitution_stats()
+            stats["local"] += 1
+            logger.info(f"Local substitution: {resolution['source']['name']} ({stats['local']} local / {stats['llm']} LLM)")
+            st.session_state.pending_plan_change = {
+                "instruction": text,
+                "local": {
+                    "source": resolution["source"]["name"],
+                    "replacement": resolution["options"][0]["name"]
+                }
+            }
+            return {
+                "feedback": format_local_substitution(resolution),
+                "plan_changed": False,
+                "calendar_changed": False,
+                "is_command": True
+            }
+
         if not st.session_state.api_key:
             return {
                 "feedback": "💡 Pour que je puisse proposer et appliquer un exercice de remplacement automatiquement, ajoute une clé OpenAI dans la barre latérale.",
@@ -1444,16 +1155,21 @@ def handle_chat_command(user_text: str):
                 "is_command": True
             }
 
+        get_substitution_stats()["llm"] += 1
         suggestion = call_openai_exercise_suggestion(
             st.session_state.api_key,
             text,
             st.session_state.answers,
-            st.session_state.plan_text
+            get_large_text(st.session_state, "plan_text")
         )
 
         st.session_state.pending_plan_change = {
             "instruction": text
         }
+        get_speculation_pool().start_edit(
+            st.session_state.session_uid, st.session_state.api_key, text,
+            get_large_text(st.session_state, "plan_text"), st.session_state.answers
+        )
 
         return {
             "feedback": suggestion,
@@ -1474,7 +1190,7 @@ def handle_chat_command(user_text: str):
     is_plan_modification = any(re.search(pattern, low) for pattern in plan_modification_keywords)
 
     if is_plan_modification and st.session_state.api_key:
-        if not st.session_state.plan_text:
+        if not get_large_text(st.session_state, "plan_text"):
             profile = {k: st.session_state.answers.get(k) for k in [
                 "age", "sexe", "taille_cm", "poids_kg", "niveau_exp", "blessures", "sante",
                 "activite", "objectif_principal", "objectif_secondaire", "horizon", "motivation",
@@ -1482,20 +1198,18 @@ def handle_chat_command(user_text: str):
                 "sommeil_h", "ville", "nutrition"
             ]}
             plan_text = call_openai_plan(st.session_state.api_key, profile) or fallback_plan(profile)
-            st.session_state.plan_text = plan_text
+            commit_plan_text(plan_text)
 
         result = ai_edit_plan(
             st.session_state.api_key,
             text,
-            st.session_state.plan_text,
+            get_large_text(st.session_state, "plan_text"),
             st.session_state.answers
         )
 
         if result.get("ok"):
-            st.session_state.plan_text = result["new_plan"]
+            commit_plan_text(result["new_plan"])
             st.session_state.flash_plan_updated = True
-            st.session_state._last_plan_hash = hash(st.session_state.plan_text)
-            recompute_calendar_events()
             return {
                 "feedback": f"🧠 J'ai adapté le plan automatiquement.\n\n**Résumé** — {result.get('summary','')}",
                 "plan_changed": True,
@@ -1600,12 +1314,66 @@ def calculate_streak(workouts: list) -> int:
     
     return streak
 
-def get_next_workout(plan_text: str, last_completed_day: int = None) -> dict:
+# ===================== STATISTIQUES D'ENTRAÎNEMENT =====================
+# Fenêtres affichées sur la page Statistiques
+ANALYTICS_WEEKS = 12
+ANALYTICS_MONTHS = 12
+
+# ===================== RECHERCHE PLEIN TEXTE =====================
+def render_search_panel(key_prefix: str):
+    """Champ de recherche paginé (séances + chat)."""
+    query = st.text_input("🔎 Rechercher", placeholder="Ex: genou, fractionné…", key=f"{key_prefix}_search")
+    if not query:
+        return
+    page_key = f"{key_prefix}_search_page"
+    page = st.session_state.get(page_key, 0)
+    result = search_activity(st.session_state, query, page)
+    pages = max(1, -(-result["total"] // SEARCH_PAGE_SIZE))
+    if page >= pages:
+        page = pages - 1
+        result = search_activity(st.session_state, query, page)
+    st.caption(f"{result['total']} résultat(s) — page {page + 1}/{pages}")
+
+    for item in result["items"]:
+        record = item["record"]
+        if item["kind"] == "workout":
+            st.markdown(f"🏋️ **{record['date']} — {record['type']}** ({record['duration']} min) : {record.get('notes', '')}")
+        else:
+            icon = "👤" if record.get("role") == "user" else "🤖"
+            st.markdown(f"{icon} {record.get('content', '')[:300]}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("⬅️ Précédent", key=f"{key_prefix}_search_prev", disabled=page == 0):
+            st.session_state[page_key] = page - 1
+            st.rerun()
+    with col2:
+        if st.button("Suivant ➡️", key=f"{key_prefix}_search_next", disabled=page >= pages - 1):
+            st.session_state[page_key] = page + 1
+            st.rerun()
+
+# ===================== MODE COACH =====================
+# Intervalle de rafraîchissement de l'avancement d'une génération d'effectif (secondes)
+ROSTER_POLL_SECONDS = 1.0
+
+@st.fragment(run_every=ROSTER_POLL_SECONDS)
+def render_roster_progress(checkpoint_path: str, profiles: list):
+    """Avancement de la génération en arrière-plan, relu dans le fichier de reprise."""
+    runs = get_roster_runs()
+    results, _ = runs.results(checkpoint_path, profiles)
+    total = len(profiles)
+    st.progress(len(results) / total if total else 1.0)
+    st.write(f"⏳ {len(results)}/{total} athlètes générés")
+    if not runs.is_running(checkpoint_path):
+        # Génération terminée : la page complète affiche les résultats
+        st.rerun()
+
+def get_next_workout(plan_text: str, last_completed_day: int = None, digest: str = None) -> dict:
     """Récupère le prochain workout en tenant compte des jours complétés"""
     if not plan_text:
         return None
     
-    sessions = parse_workout_plan(plan_text)
+    sessions = parse_workout_plan(plan_text, digest)
     if not sessions:
         return None
     
@@ -1627,7 +1395,7 @@ def get_next_workout(plan_text: str, last_completed_day: int = None) -> dict:
 
 def render_top_navigation(current_page=None):
     """Navigation horizontale en haut"""
-    cols = st.columns([1, 1, 1, 1, 1, 1, 1, 1, 1])
+    cols = st.columns([1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1])
     
     with cols[0]:
         if st.button("👤 Profil", key=f"nav_{current_page}_profile", use_container_width=True, 
@@ -1678,81 +1446,26 @@ def render_top_navigation(current_page=None):
             st.rerun()
     
     with cols[8]:
+        if st.button("📈 Stats", key=f"nav_{current_page}_analytics", use_container_width=True, 
+                    disabled=(current_page == "analytics")):
+            st.session_state.page = "analytics"
+            st.rerun()
+    
+    with cols[9]:
+        if st.button("👥 Coach", key=f"nav_{current_page}_roster", use_container_width=True, 
+                    disabled=(current_page == "roster")):
+            st.session_state.page = "roster"
+            st.rerun()
+    
+    with cols[10]:
         if st.button("🔄 Reset", key=f"nav_{current_page}_reset", use_container_width=True):
             st.session_state.step = "form"
-            st.session_state.q_index = 0
+            st.session_state.form_page = 0
             st.session_state.page = None
             st.rerun()
 
-def fallback_plan(profile: dict) -> str:
-    """Génère un plan d'entraînement basique sur 7 jours en respectant jours_sem."""
-    niveau = profile.get("niveau_exp", "Débutant") or "Débutant"
-    try:
-        jours = int(profile.get("jours_sem", 3) or 3)
-    except Exception:
-        jours = 3
-    jours = max(1, min(7, jours))
-
-    duree = int(profile.get("duree_min", 45) or 45)
-    objectif = profile.get("objectif_principal", "Condition générale") or "Condition générale"
-
-    header = f"""# Plan d'entraînement personnalisé
-
-**Niveau :** {niveau}  
-**Objectif :** {objectif}  
-**Fréquence :** {jours} jours/semaine  
-**Durée par séance :** {duree} min
-
----
-"""
-
-    templates = [
-        ("Full Body", [
-            "- Échauffement: 5-10 min cardio léger",
-            "- Squats: 3 x 10-12",
-            "- Pompes (sur genoux si nécessaire): 3 x 8-10",
-            "- Fentes: 3 x 10 (chaque jambe)",
-            "- Planche: 3 x 20-30 sec",
-            "- Retour au calme: étirements 5 min"
-        ]),
-        ("Cardio + Core", [
-            "- Échauffement: 5 min",
-            "- Intervalles cardio: 20-25 min (course/vélo/rameur)",
-            "- Crunches: 3 x 15",
-            "- Mountain climbers: 3 x 20 sec",
-            "- Russian twists: 3 x 15",
-            "- Étirements: 5 min"
-        ]),
-        ("Force haut du corps", [
-            "- Échauffement: 5-10 min",
-            "- Développé couché ou pompes: 3 x 8-10",
-            "- Rowing: 3 x 10-12",
-            "- Élévations latérales: 3 x 12-15",
-            "- Gainage: 3 x 30 sec",
-            "- Étirements: 5 min"
-        ])
-    ]
-
-    lines = [header]
-
-    training_days = 0
-    for day in range(1, 8):
-        if training_days < jours:
-            title, exos = templates[training_days % len(templates)]
-            lines.append(f"**Jour {day} — {title}**")
-            lines.append(f"⏱ Durée: {duree} min | 🔥 RPE: 6-7/10")
-            lines.extend(exos)
-            lines.append("\n---\n")
-            training_days += 1
-        else:
-            lines.append(f"**Jour {day} — Repos complet**")
-            lines.append("💤 Aucune séance prévue, concentre-toi sur le sommeil, l'hydratation et la récupération.")
-            lines.append("\n---\n")
-
-    lines.append("**Conseils généraux :**\n- Hydrate-toi bien avant, pendant et après\n- Écoute ton corps et ajuste l'intensité\n- Augmente progressivement la charge\n")
-    return "\n".join(lines)
-
 # ===================== MAIN APP LOGIC =====================
+keep_plan_history_alive()
 
 # Landing Page
 if st.session_state.step == "landing":
@@ -1772,42 +1485,37 @@ if st.session_state.step == "landing":
         
         if st.button("🚀 Commencer mon parcours", use_container_width=True, key="start_btn"):
             st.session_state.step = "form"
-            st.session_state.q_index = 0
+            st.session_state.form_page = 0
             st.rerun()
 
 # Form / Questionnaire
 elif st.session_state.step == "form":
-    idx = st.session_state.q_index
+    page_idx = st.session_state.form_page
     
-    if idx >= TOTAL_Q:
+    if page_idx >= TOTAL_PAGES:
         st.session_state.step = "dashboard"
         
-        profile = {k: st.session_state.answers.get(k) for k in [
-            "age", "sexe", "taille_cm", "poids_kg", "niveau_exp", "blessures", "sante",
-            "activite", "objectif_principal", "objectif_secondaire", "horizon", "motivation",
-            "types_exos", "jours_sem", "duree_min", "moment", "lieu", "materiel",
-            "sommeil_h", "ville", "nutrition"
-        ]}
+        profile = profile_from_answers(st.session_state.answers)
         
         if st.session_state.api_key:
-            with st.spinner("🤖 Génération de ton plan personnalisé..."):
-                plan_text = call_openai_plan(st.session_state.api_key, profile)
-                st.session_state.plan_text = plan_text or fallback_plan(profile)
+            with st.spinner("🤖 Génération de ton plan personnalisé..."), action_io_budget():
+                plan_text = get_speculation_pool().take_plan_prefetch(
+                    st.session_state.session_uid, profile
+                ) or call_openai_plan(st.session_state.api_key, profile)
+                plan_text = plan_text or fallback_plan(profile)
         else:
-            st.session_state.plan_text = fallback_plan(profile)
+            plan_text = fallback_plan(profile)
         
-        st.session_state._last_plan_hash = hash(st.session_state.plan_text)
-        recompute_calendar_events()
+        commit_plan_text(plan_text)
         st.rerun()
     
     else:
-        q = QUESTIONS[idx]
-        
-        progress = (idx / TOTAL_Q)
+        form_page = FORM_PAGES[page_idx]
+        progress = sum(len(p["keys"]) for p in FORM_PAGES[:page_idx]) / TOTAL_Q
         st.markdown(f"""
         <div class="form-progress">
             <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                <span>Question {idx + 1} sur {TOTAL_Q}</span>
+                <span>Étape {page_idx + 1} sur {TOTAL_PAGES}</span>
                 <span>{int(progress * 100)}%</span>
             </div>
             <div class="form-progress-bar">
@@ -1816,26 +1524,36 @@ elif st.session_state.step == "form":
         </div>
         """, unsafe_allow_html=True)
         
-        st.markdown(f"### {q['label']}")
-        if q.get("help"):
-            st.info(q["help"])
-        
-        default_val = st.session_state.answers.get(q["key"])
-        answer = render_input(q, default=default_val)
-        
-        col1, col2, col3 = st.columns([1, 2, 1])
-        
-        with col1:
-            if idx > 0:
-                if st.button("⬅️ Précédent", use_container_width=True, key="prev_btn"):
-                    st.session_state.q_index -= 1
-                    st.rerun()
-        
-        with col3:
-            if st.button("Suivant ➡️", use_container_width=True, key="next_btn"):
-                st.session_state.answers[q["key"]] = answer
-                st.session_state.q_index += 1
-                st.rerun()
+        # Les réponses de la page ne sont envoyées qu'à la soumission du formulaire
+        with st.form(f"form_page_{page_idx}"):
+            st.markdown(f"### {form_page['title']}")
+            page_answers = {}
+            for key in form_page["keys"]:
+                q = QUESTIONS_BY_KEY[key]
+                page_answers[key] = render_input(q, default=st.session_state.answers.get(key))
+                if q.get("help"):
+                    st.caption(q["help"])
+            
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                previous = page_idx > 0 and st.form_submit_button(
+                    "⬅️ Précédent", use_container_width=True, key="prev_btn"
+                )
+            with col3:
+                submitted = st.form_submit_button("Suivant ➡️", use_container_width=True, key="next_btn")
+        
+        if previous or submitted:
+            st.session_state.answers.update(page_answers)
+            st.session_state.form_page += 1 if submitted else -1
+            if submitted:
+                # Préchargement : météo dès que la ville est connue ; plan dès que toutes les
+                # réponses le sont (dernière page, ou toute page quand le questionnaire est repris)
+                if "ville" in page_answers:
+                    prefetch_city_weather(page_answers["ville"])
+                get_speculation_pool().start_plan_prefetch(
+                    st.session_state.session_uid, st.session_state.api_key, st.session_state.answers
+                )
+            st.rerun()
 
 # Dashboard / Main App
 elif st.session_state.step == "dashboard":
@@ -1885,21 +1603,36 @@ elif st.session_state.step == "dashboard":
         render_top_navigation("plan")
         st.title("📋 Mon Plan d'Entraînement")
         
-        if st.session_state.plan_text:
+        plan_text = get_large_text(st.session_state, "plan_text")
+        if plan_text:
             if st.session_state.flash_plan_updated:
                 st.success("✅ Plan mis à jour automatiquement!")
                 st.session_state.flash_plan_updated = False
             
-            col1, col2 = st.columns([4, 1])
+            history = st.session_state.plan_history
+            col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
             with col2:
+                if st.button("↩️ Annuler", key="undo_plan_btn", disabled=history["cursor"] < 1):
+                    undo_plan_change()
+                    st.rerun()
+            with col3:
+                if st.button("↪️ Rétablir", key="redo_plan_btn",
+                             disabled=history["cursor"] >= len(history["versions"]) - 1):
+                    redo_plan_change()
+                    st.rerun()
+            with col4:
                 if st.button("✏️ Éditer", key="edit_plan_btn"):
                     st.session_state.plan_edit_mode = not st.session_state.plan_edit_mode
                     st.rerun()
             
+            if history["cursor"] >= 1 and not st.session_state.plan_edit_mode:
+                with st.expander("🔍 Comparer avec la version précédente"):
+                    st.code(previous_plan_diff() or "Aucune différence.", language="diff")
+            
             if st.session_state.plan_edit_mode:
                 edited = st.text_area(
                     "Modifie ton plan",
-                    value=st.session_state.plan_text,
+                    value=plan_text,
                     height=500,
                     key="plan_editor"
                 )
@@ -1907,10 +1640,8 @@ elif st.session_state.step == "dashboard":
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("💾 Sauvegarder", use_container_width=True, key="save_plan"):
-                        st.session_state.plan_text = edited
+                        commit_plan_text(edited)
                         st.session_state.plan_edit_mode = False
-                        st.session_state._last_plan_hash = hash(edited)
-                        recompute_calendar_events()
                         st.success("✅ Plan sauvegardé!")
                         st.rerun()
                 
@@ -1919,7 +1650,7 @@ elif st.session_state.step == "dashboard":
                         st.session_state.plan_edit_mode = False
                         st.rerun()
             else:
-                st.markdown(st.session_state.plan_text)
+                st.markdown(plan_text)
         else:
             st.info("Aucun plan disponible. Génère-en un depuis le chat ou le dashboard.")
     
@@ -1943,14 +1674,34 @@ elif st.session_state.step == "dashboard":
         st.markdown("### 💡 Conseils d'entraînement")
         
         duree = int(st.session_state.answers.get("duree_min", 45) or 45)
-        geo = geocode_city(ville)
-        
-        if geo:
-            lat, lon, full_name = geo
-            weather_json = get_today_weather(lat, lon)
-            if weather_json:
-                advice = weather_advice(weather_json, duree)
-                st.info(advice)
+        forecast = get_user_week_forecast()
+        
+        if forecast and "hourly" in forecast:
+            moment_pref = st.session_state.answers.get("moment", "Matin (6h-10h)")
+            slot_hour = int(get_session_time_slot(moment_pref, duree)[0][:2])
+            # La prévision commence à 00h aujourd'hui : l'index horaire du jour = l'heure
+            advice = weather_advice(forecast, duree, hour_index=slot_hour)
+            st.info(f"Aujourd'hui à {slot_hour}h — {advice}")
+            
+            today = dt.date.today()
+            week_events = annotate_events_with_forecast(
+                get_calendar_events(), forecast,
+                today, today + dt.timedelta(days=7), duree
+            )
+            week_sessions = sorted(
+                (e for e in week_events if "weather" in e.get("extendedProps", {})),
+                key=lambda e: e["start"]
+            )
+            
+            if week_sessions:
+                st.markdown("### 📅 Tes séances des 7 prochains jours")
+                for event in week_sessions:
+                    weather_info = event["extendedProps"]["weather"]
+                    line = f"**{event['start'][:10]} {event['start'][11:16]}** — {event['title']} : {weather_info['advice']}"
+                    if weather_info["recommendation"] == "indoor":
+                        st.warning(line)
+                    else:
+                        st.success(line)
         else:
             st.warning("Impossible de récupérer les prévisions détaillées.")
     
@@ -1958,6 +1709,9 @@ elif st.session_state.step == "dashboard":
         render_top_navigation("chat")
         st.title("💬 Chat avec Serge")
         
+        with st.expander("🔎 Rechercher dans l'historique"):
+            render_search_panel("chat")
+        
         chat_container = st.container()
         
         with chat_container:
@@ -1973,26 +1727,27 @@ elif st.session_state.step == "dashboard":
         user_input = st.chat_input("Tape ton message...", key="chat_input")
         
         if user_input:
-            st.session_state.chat_history.append({"role": "user", "content": user_input})
-            
-            cmd_result = handle_chat_command(user_input)
+            append_chat_message(st.session_state, "user", user_input)
             
-            if cmd_result["is_command"]:
-                response = cmd_result["feedback"]
-            else:
-                profile = st.session_state.answers
-                plan = st.session_state.plan_text
-                nutrition = st.session_state.nutrition_plan or ""
+            with action_io_budget():
+                cmd_result = handle_chat_command(user_input)
                 
-                response = call_openai_chat(
-                    st.session_state.api_key,
-                    user_input,
-                    profile,
-                    plan,
-                    nutrition
-                )
+                if cmd_result["is_command"]:
+                    response = cmd_result["feedback"]
+                else:
+                    profile = st.session_state.answers
+                    plan = get_large_text(st.session_state, "plan_text")
+                    nutrition = get_large_text(st.session_state, "nutrition_plan")
+                    
+                    response = call_openai_chat(
+                        st.session_state.api_key,
+                        user_input,
+                        profile,
+                        plan,
+                        nutrition
+                    )
             
-            st.session_state.chat_history.append({"role": "assistant", "content": response})
+            append_chat_message(st.session_state, "assistant", response)
             st.rerun()
     
     elif st.session_state.page == "calendar":
@@ -2002,12 +1757,16 @@ elif st.session_state.step == "dashboard":
         if not CALENDAR_AVAILABLE:
             st.warning("📦 Module `streamlit-calendar` non installé. Installe-le avec : `pip install streamlit-calendar`")
             
-            st.subheader("Sessions planifiées")
-            sessions = parse_workout_plan(st.session_state.plan_text)
-            
-            for session in sessions:
-                st.markdown(f"**Jour {session['day']} — {session['title']}**")
-                st.write(session['description'][:200] + "...")
+            st.subheader("Sessions planifiées (7 prochains jours)")
+            today = dt.date.today()
+            upcoming = sorted(
+                expand_calendar_events(get_calendar_events(), today, today + dt.timedelta(days=7)),
+                key=lambda e: e["start"]
+            )
+
+            for event in upcoming:
+                st.markdown(f"**{event['start'][:10]} — {event['title']}**")
+                st.write(event['extendedProps']['description'][:200] + "...")
                 st.markdown("---")
         else:
             start_date = st.date_input(
@@ -2017,8 +1776,8 @@ elif st.session_state.step == "dashboard":
             )
             
             if start_date != st.session_state.calendar_start_date:
+                # Les événements sont re-datés à l'affichage : aucun recalcul nécessaire
                 st.session_state.calendar_start_date = start_date
-                recompute_calendar_events()
                 st.rerun()
             
             if st.button("🔄 Recalculer", key="recalc_cal"):
@@ -2026,11 +1785,33 @@ elif st.session_state.step == "dashboard":
                 st.success("✅ Calendrier mis à jour!")
                 st.rerun()
             
-            events = st.session_state.calendar_events
+            if get_large_text(st.session_state, "plan_text"):
+                # Document d'un seul utilisateur : une règle RRULE par jour du plan (7 au plus),
+                # quelle que soit la durée de l'horizon, soit quelques Ko. st.download_button
+                # charge de toute façon le contenu en mémoire ; les exports volumineux (effectifs)
+                # passent par write_ics_file (CLI).
+                st.download_button(
+                    "📥 Exporter vers mon agenda (.ics)",
+                    data="".join(build_user_ics()),
+                    file_name="plan_entrainement.ics",
+                    mime="text/calendar",
+                    key="export_ics"
+                )
+            
+            events = get_calendar_events()
             
             if events:
+                forecast = get_user_week_forecast()
+                if forecast:
+                    today = dt.date.today()
+                    events = annotate_events_with_forecast(
+                        events, forecast, today, today + dt.timedelta(days=7),
+                        int(st.session_state.answers.get("duree_min", 45) or 45)
+                    )
+                
                 calendar_options = {
                     "initialView": "dayGridMonth",
+                    "initialDate": st.session_state.calendar_start_date.isoformat(),
                     "headerToolbar": {
                         "left": "prev,next today",
                         "center": "title",
@@ -2049,18 +1830,19 @@ elif st.session_state.step == "dashboard":
         render_top_navigation("nutrition")
         st.title("🍎 Plan Nutritionnel")
         
-        if not st.session_state.nutrition_plan:
+        nutrition_plan = get_large_text(st.session_state, "nutrition_plan")
+        if not nutrition_plan:
             col1, col2 = st.columns([3, 1])
             with col2:
                 if st.button("🤖 Générer", key="gen_nutrition"):
                     profile = st.session_state.answers
                     
                     if st.session_state.api_key:
-                        with st.spinner("Génération du plan nutritionnel..."):
+                        with st.spinner("Génération du plan nutritionnel..."), action_io_budget():
                             nutrition = call_openai_nutrition(st.session_state.api_key, profile)
-                            st.session_state.nutrition_plan = nutrition or fallback_nutrition(profile)
+                            set_large_text(st.session_state, "nutrition_plan", nutrition or fallback_nutrition(profile))
                     else:
-                        st.session_state.nutrition_plan = fallback_nutrition(profile)
+                        set_large_text(st.session_state, "nutrition_plan", fallback_nutrition(profile))
                     
                     st.rerun()
             
@@ -2076,7 +1858,7 @@ elif st.session_state.step == "dashboard":
             if st.session_state.nutrition_edit_mode:
                 edited = st.text_area(
                     "Modifie ton plan nutritionnel",
-                    value=st.session_state.nutrition_plan,
+                    value=nutrition_plan,
                     height=500,
                     key="nutrition_editor"
                 )
@@ -2084,7 +1866,7 @@ elif st.session_state.step == "dashboard":
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("💾 Sauvegarder", use_container_width=True, key="save_nutrition"):
-                        st.session_state.nutrition_plan = edited
+                        set_large_text(st.session_state, "nutrition_plan", edited)
                         st.session_state.nutrition_edit_mode = False
                         st.success("✅ Plan nutritionnel sauvegardé!")
                         st.rerun()
@@ -2094,7 +1876,7 @@ elif st.session_state.step == "dashboard":
                         st.session_state.nutrition_edit_mode = False
                         st.rerun()
             else:
-                st.markdown(st.session_state.nutrition_plan)
+                st.markdown(nutrition_plan)
     
     elif st.session_state.page == "workouts":
         render_top_navigation("workouts")
@@ -2122,24 +1904,180 @@ elif st.session_state.step == "dashboard":
                 "duration": workout_duration,
                 "notes": notes
             }
-            st.session_state.workout_history.append(workout)
+            add_workout(st.session_state, workout)
             st.success("✅ Séance enregistrée!")
             st.rerun()
         
         st.markdown("---")
         st.subheader("📊 Historique")
+        render_search_panel("workouts")
         
-        if st.session_state.workout_history:
-            for i, w in enumerate(reversed(st.session_state.workout_history)):
+        if get_workout_index(st.session_state):
+            for w in iter_workouts(st.session_state, reverse=True):
                 with st.expander(f"{w['date']} — {w['type']} ({w['duration']} min)"):
                     st.write(f"**Notes:** {w['notes']}")
                     
-                    if st.button("🗑️ Supprimer", key=f"del_workout_{i}"):
-                        st.session_state.workout_history.remove(w)
+                    if st.button("🗑️ Supprimer", key=f"del_workout_{w['id']}"):
+                        delete_workout(st.session_state, w["id"])
                         st.rerun()
         else:
             st.info("Aucune séance enregistrée.")
     
+    elif st.session_state.page == "analytics":
+        render_top_navigation("analytics")
+        st.title("📈 Statistiques d'entraînement")
+        
+        rollups = get_workout_rollups(st.session_state)
+        if not rollups["total"]["sessions"]:
+            st.info("Aucune séance enregistrée.")
+        else:
+            planned = int(st.session_state.answers.get("jours_sem", 3) or 3)
+            adherence = weekly_adherence(rollups, planned, ANALYTICS_WEEKS)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Séances", rollups["total"]["sessions"])
+            with col2:
+                st.metric("Minutes", rollups["total"]["minutes"])
+            with col3:
+                avg = sum(adherence["réalisation (%)"]) / len(adherence["réalisation (%)"])
+                st.metric(f"Réalisation ({planned}/sem.)", f"{avg:.0f} %")
+            
+            st.subheader(f"📅 Par semaine ({ANALYTICS_WEEKS} dernières)")
+            weekly = rollup_series(rollups, "week", ANALYTICS_WEEKS)
+            st.bar_chart(weekly, x="période", y="séances")
+            st.line_chart(weekly, x="période", y="minutes")
+            
+            st.subheader("🎯 Réalisation vs séances prévues")
+            st.bar_chart(adherence, x="période", y="réalisation (%)")
+            
+            st.subheader(f"🗓️ Par mois ({ANALYTICS_MONTHS} derniers)")
+            st.bar_chart(rollup_series(rollups, "month", ANALYTICS_MONTHS), x="période", y="séances")
+            
+            st.subheader("🏷️ Types d'entraînement")
+            types = sorted(rollups["type"].items(), key=lambda item: -item[1])
+            st.bar_chart({"type": [t for t, _ in types], "séances": [n for _, n in types]}, x="type", y="séances")
+    
+    elif st.session_state.page == "roster":
+        render_top_navigation("roster")
+        st.title("👥 Mode Coach — Effectif")
+        
+        st.write(
+            "Importe un fichier **CSV** ou **JSONL** (une ligne par athlète, colonnes = clés du "
+            "questionnaire : `age`, `sexe`, `poids_kg`, `jours_sem`, ...). "
+            "Les plans sont générés en parallèle dans la limite du débit API configuré."
+        )
+        
+        uploaded = st.file_uploader("Fichier d'effectif", type=["csv", "jsonl", "ndjson"], key="roster_file")
+        
+        if uploaded is not None:
+            data = uploaded.getvalue()
+            try:
+                profiles = load_roster_profiles(data, uploaded.name)
+            except Exception as e:
+                logger.error(f"Roster parsing error: {e}")
+                st.error(f"❌ Fichier illisible : {e}")
+                profiles = []
+            
+            if profiles:
+                checkpoint_path = roster_checkpoint_path(data)
+                runs = get_roster_runs()
+                running = runs.is_running(checkpoint_path)
+                results, results_payload = runs.results(checkpoint_path, profiles)
+                st.info(
+                    f"📋 {len(profiles)} athlètes chargés — {len(results)} déjà générés"
+                    f"{' (génération en cours)' if running else ' (reprise)'}."
+                )
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    workers = st.number_input(
+                        "Requêtes simultanées", min_value=1, max_value=64,
+                        value=ROSTER_MAX_WORKERS, key="roster_workers"
+                    )
+                with col2:
+                    with_nutrition = st.checkbox("Inclure la nutrition", value=True, key="roster_nutrition")
+                
+                if st.button(
+                    "🚀 Générer les plans", use_container_width=True, key="roster_generate", disabled=running
+                ):
+                    runs.start(
+                        st.session_state.api_key,
+                        profiles,
+                        checkpoint_path,
+                        max_workers=int(workers),
+                        include_nutrition=with_nutrition
+                    )
+                    st.rerun()
+                
+                if running:
+                    render_roster_progress(checkpoint_path, profiles)
+                elif runs.error(checkpoint_path):
+                    st.error(f"❌ Génération interrompue : {runs.error(checkpoint_path)}")
+                
+                with st.expander("📦 Génération hors ligne (Batch API)", expanded=False):
+                    st.write(
+                        "Prépare un fichier de requêtes au format Batch API d'OpenAI "
+                        "(mêmes prompts que la génération interactive), puis importe le "
+                        "fichier de résultats pour mettre à jour les plans stockés."
+                    )
+                    batch_jobs = iter_profile_batch_jobs(
+                        profiles, kinds=("plan", "nutrition") if with_nutrition else ("plan",)
+                    )
+                    st.download_button(
+                        "📥 Fichier de requêtes batch (JSONL)",
+                        data="".join(json.dumps(job, ensure_ascii=False) + "\n" for job in batch_jobs),
+                        file_name="batch_requests.jsonl",
+                        mime="application/json",
+                        key="roster_batch_requests"
+                    )
+                    batch_results = st.file_uploader(
+                        "Fichier de résultats batch", type=["jsonl"], key="roster_batch_results"
+                    )
+                    if batch_results is not None and st.button("📤 Importer les résultats", key="roster_batch_ingest"):
+                        # Fichier propre à cet import : deux imports simultanés ne s'écrasent pas
+                        os.makedirs(ROSTER_CHECKPOINT_DIR, exist_ok=True)
+                        with tempfile.NamedTemporaryFile(
+                            "wb", dir=ROSTER_CHECKPOINT_DIR, prefix="batch_results_", suffix=".jsonl", delete=False
+                        ) as f:
+                            f.write(batch_results.getvalue())
+                        try:
+                            stats = ingest_batch_results(f.name, BATCH_PLAN_STORE)
+                        except (OSError, ValueError, KeyError) as e:
+                            logger.error(f"Batch ingest error: {e}")
+                            st.error(f"❌ Fichier de résultats illisible : {e}")
+                        else:
+                            st.success(f"✅ {stats['ok']} réponses intégrées, {stats['failed']} ignorées.")
+                        finally:
+                            os.remove(f.name)
+                
+                # Plans intégrés depuis la Batch API (page Effectif ou `python -m coach_ai batch ingest`)
+                stored = read_roster_checkpoint(BATCH_PLAN_STORE)
+                batch_records = [stored[p["athlete_id"]] for p in profiles if p["athlete_id"] in stored]
+                if batch_records:
+                    st.subheader(f"📦 Plans intégrés par batch ({len(batch_records)}/{len(profiles)})")
+                    for record in batch_records:
+                        with st.expander(f"{record['athlete_id']} (batch, {record.get('generated_at', '?')})"):
+                            st.markdown(record["plan"])
+                            if record.get("nutrition"):
+                                st.markdown("---")
+                                st.markdown(record["nutrition"])
+                
+                if results:
+                    st.download_button(
+                        "📥 Télécharger les résultats (JSONL)",
+                        data=results_payload,
+                        file_name="roster_plans.jsonl",
+                        mime="application/json",
+                        key="roster_download"
+                    )
+                    for record in results:
+                        with st.expander(f"{record['athlete_id']} ({record['source']})"):
+                            st.markdown(record["plan"])
+                            if record.get("nutrition"):
+                                st.markdown("---")
+                                st.markdown(record["nutrition"])
+    
     else:
         # Dashboard principal
         render_top_navigation(None)
@@ -2153,8 +2091,8 @@ elif st.session_state.step == "dashboard":
         
         col1, col2, col3 = st.columns(3)
         
-        completed = len(st.session_state.workout_history)
-        streak = calculate_streak(st.session_state.workout_history)
+        completed = get_workout_rollups(st.session_state)["total"]["sessions"]
+        streak = calculate_streak(list(iter_workouts(st.session_state)))
         
         with col1:
             st.markdown(f"""
@@ -2190,7 +2128,9 @@ elif st.session_state.step == "dashboard":
         with col_left:
             st.subheader("📋 Prochain entraînement")
             
-            next_workout = get_next_workout(st.session_state.plan_text, st.session_state.last_completed_day)
+            next_workout = get_next_workout(
+                get_large_text(st.session_state, "plan_text"), st.session_state.last_completed_day, current_plan_digest()
+            )
             
             if next_workout:
                 st.markdown(f"""
@@ -2207,7 +2147,7 @@ elif st.session_state.step == "dashboard":
                         "duration": int(st.session_state.answers.get("duree_min", 45) or 45),
                         "notes": "Séance complétée"
                     }
-                    st.session_state.workout_history.append(workout)
+                    add_workout(st.session_state, workout)
                     st.session_state.last_completed_day = next_workout['day']
                     st.success("🎉 Bravo! Séance enregistrée!")
                     st.rerun()
@@ -2241,10 +2181,10 @@ elif st.session_state.step == "dashboard":
         
         st.markdown("<br><br>", unsafe_allow_html=True)
         
-        if st.session_state.workout_history:
+        recent = recent_workouts(st.session_state, 5)
+        if recent:
             st.subheader("📊 Activité récente")
             
-            recent = st.session_state.workout_history[-5:]
             
             for w in reversed(recent):
                 cols = st.columns([2, 2, 1])
@@ -2276,3 +2216,6 @@ elif st.session_state.step == "dashboard":
         if diff != 0:
             # Progression non calculable sans poids de départ : ici on affiche un placeholder
             st.progress(0.0)
+
+# Sauvegarde différée de l'état persistant (après le rendu complet de la page)
+save_session_snapshot()
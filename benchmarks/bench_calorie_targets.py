@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : calcul des cibles caloriques en lot (NumPy) vs boucle sur la version scalaire.
+
+Usage :
+    python benchmarks/bench_calorie_targets.py [--sizes 10000 1000000] [--scalar-max 10000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from coach_ai.nutrition import (  # noqa: E402
+    ACTIVITY_FACTORS,
+    compute_calorie_targets,
+    compute_calorie_targets_batch,
+)
+
+SEXES = ["Homme", "Femme", "Autre / Préfère ne pas dire"]
+OBJECTIFS = ["Perte de poids", "Gain musculaire", "Prise de masse", "Endurance", "Condition générale"]
+
+
+def make_columns(n: int, seed: int = 42) -> dict:
+    """Génère un effectif synthétique de n profils en colonnes."""
+    rng = np.random.default_rng(seed)
+    activites = list(ACTIVITY_FACTORS)
+    return {
+        "poids": rng.uniform(35, 220, n).round(1),
+        "taille": rng.integers(120, 221, n).astype(float),
+        "age": rng.integers(13, 101, n),
+        "sexe": np.array(SEXES)[rng.integers(0, len(SEXES), n)],
+        "activite": np.array(activites)[rng.integers(0, len(activites), n)],
+        "objectif": np.array(OBJECTIFS)[rng.integers(0, len(OBJECTIFS), n)],
+    }
+
+
+def bench_batch(columns: dict) -> float:
+    start = time.perf_counter()
+    compute_calorie_targets_batch(**columns)
+    return time.perf_counter() - start
+
+
+def bench_scalar(columns: dict) -> float:
+    profiles = [
+        {
+            "poids_kg": float(columns["poids"][i]),
+            "taille_cm": float(columns["taille"][i]),
+            "age": int(columns["age"][i]),
+            "sexe": str(columns["sexe"][i]),
+            "activite": str(columns["activite"][i]),
+            "objectif_principal": str(columns["objectif"][i]),
+        }
+        for i in range(len(columns["poids"]))
+    ]
+    start = time.perf_counter()
+    for profile in profiles:
+        compute_calorie_targets(profile)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--scalar-max", type=int, default=10_000,
+                        help="Taille max pour laquelle la boucle scalaire est mesurée")
+    args = parser.parse_args()
+
+    print(f"{'profils':>10} | {'lot (s)':>10} | {'scalaire (s)':>12} | {'profils/s (lot)':>16}")
+    print("-" * 58)
+    for n in args.sizes:
+        columns = make_columns(n)
+        batch_s = bench_batch(columns)
+        scalar_s = bench_scalar(columns) if n <= args.scalar_max else float("nan")
+        print(f"{n:>10} | {batch_s:>10.4f} | {scalar_s:>12.4f} | {n / batch_s:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Logique métier du Coach IA Serge, importable sans Streamlit.
+
+Modules :
+- profile : questionnaire et chargement de profils (CSV, JSONL, JSON)
+- llm : client OpenAI (plan, nutrition, suggestions, adaptation de plan)
+- plans : analyse des plans Markdown et plans de repli
+- calendar_events : séances récurrentes et export iCalendar
+- weather : géocodage, prévisions et conseils météo
+- nutrition : cibles caloriques (scalaire et vectorisé) et plan de repli
+- notifications : messages WhatsApp Business
+- exercises : catalogue local d'exercices et remplacements sans LLM
+- faq : cache des réponses aux questions fréquentes du chat
+- versions : historique des versions de plans (deltas adressés par contenu)
+- search : index plein texte des séances et du chat
+- session : mémoire de session (textes compressés, chat archivé sur disque, recherche)
+- snapshots : instantanés de session versionnés et clés utilisateur
+- workouts, analytics : journal des séances (pierres tombales) et agrégats incrémentaux
+- speculation : modification du plan et plan initial calculés par anticipation
+- roster, batch : génération en masse (pool de threads) et hors ligne (Batch API)
+- cache, resilience, config, text : infrastructure partagée
+
+La chaîne complète profil → plan → calendrier → .ics est disponible en ligne de
+commande : `python -m coach_ai profil.json --ics plan.ics` (depuis la racine du
+dépôt, ou n'importe où après `pip install -e .`), ainsi que la génération hors
+ligne : `python -m coach_ai batch prepare|run-local|ingest ...`.
+"""
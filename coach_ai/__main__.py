@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from coach_ai.cli import main
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Agrégats incrémentaux des séances (semaine ISO, mois, type) et séries de la page Statistiques."""
+
+import datetime as dt
+
+def _empty_workout_rollups() -> dict:
+    return {"total": {"sessions": 0, "minutes": 0}, "week": {}, "month": {}, "type": {}}
+
+def _workout_bucket_keys(workout: dict):
+    """Clés (semaine ISO, mois) d'une séance ; None si la date est illisible."""
+    try:
+        day = dt.date.fromisoformat(workout.get("date", ""))
+    except (TypeError, ValueError):
+        return None
+    year, week, _ = day.isocalendar()
+    return f"{year}-S{week:02d}", day.strftime("%Y-%m")
+
+def apply_workout_to_rollups(rollups: dict, workout: dict, sign: int):
+    """Ajoute (sign=1) ou retire (sign=-1) une séance des agrégats, en O(1)."""
+    minutes = sign * int(workout.get("duration") or 0)
+    rollups["total"]["sessions"] += sign
+    rollups["total"]["minutes"] += minutes
+
+    keys = _workout_bucket_keys(workout)
+    if keys:
+        for period, key in zip(("week", "month"), keys):
+            bucket = rollups[period].setdefault(key, {"sessions": 0, "minutes": 0})
+            bucket["sessions"] += sign
+            bucket["minutes"] += minutes
+            if bucket["sessions"] <= 0:
+                del rollups[period][key]
+
+    workout_type = (workout.get("type") or "").strip() or "Autre"
+    count = rollups["type"].get(workout_type, 0) + sign
+    if count > 0:
+        rollups["type"][workout_type] = count
+    else:
+        rollups["type"].pop(workout_type, None)
+
+def rebuild_workout_rollups(workouts) -> dict:
+    """Recalcule entièrement les agrégats (sessions restaurées ou anciennes)."""
+    rollups = _empty_workout_rollups()
+    for workout in workouts:
+        apply_workout_to_rollups(rollups, workout, 1)
+    return rollups
+
+def _recent_period_keys(today: dt.date, period: str, count: int) -> list:
+    """Clés des `count` dernières semaines ou derniers mois, du plus ancien au plus récent."""
+    keys = []
+    if period == "week":
+        for i in range(count - 1, -1, -1):
+            year, week, _ = (today - dt.timedelta(weeks=i)).isocalendar()
+            keys.append(f"{year}-S{week:02d}")
+    else:
+        for i in range(count - 1, -1, -1):
+            year, month = divmod(today.year * 12 + today.month - 1 - i, 12)
+            keys.append(f"{year}-{month + 1:02d}")
+    return keys
+
+def rollup_series(rollups: dict, period: str, count: int, today: dt.date = None) -> dict:
+    """Séances et minutes des dernières périodes (lecture directe des agrégats)."""
+    keys = _recent_period_keys(today or dt.date.today(), period, count)
+    buckets = [rollups[period].get(key, {"sessions": 0, "minutes": 0}) for key in keys]
+    return {
+        "période": keys,
+        "séances": [b["sessions"] for b in buckets],
+        "minutes": [b["minutes"] for b in buckets],
+    }
+
+def weekly_adherence(rollups: dict, planned_per_week: int, weeks: int, today: dt.date = None) -> dict:
+    """Taux de réalisation hebdomadaire par rapport au nombre de séances prévues (plafonné à 100 %)."""
+    series = rollup_series(rollups, "week", weeks, today)
+    planned = max(1, int(planned_per_week or 0))
+    rates = [min(100, round(100 * done / planned)) for done in series["séances"]]
+    return {"période": series["période"], "réalisation (%)": rates}
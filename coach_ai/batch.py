@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Génération hors ligne au format Batch API d'OpenAI : fichiers de requêtes (mêmes
+prompts que l'interactif), traitement local de substitution et intégration des résultats.
+"""
+
+import os
+import json
+import logging
+import datetime as dt
+
+from coach_ai.config import get_config_value
+from coach_ai.llm import (
+    NUTRITION_PROFILE_PREFIX, PLAN_PROFILE_PREFIX, build_edit_plan_request, build_nutrition_request,
+    build_plan_request, extract_json_block,
+)
+from coach_ai.nutrition import fallback_nutrition
+from coach_ai.plans import fallback_plan
+from coach_ai.roster import ROSTER_CHECKPOINT_DIR, read_roster_checkpoint
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_ID_SEPARATOR = "::"
+BATCH_PLAN_STORE = get_config_value("BATCH_PLAN_STORE", os.path.join(ROSTER_CHECKPOINT_DIR, "plan_store.jsonl"))
+# Préfixe du message utilisateur qui précède le profil JSON, par type de requête
+_PROFILE_PROMPT_PREFIXES = {"plan": PLAN_PROFILE_PREFIX, "nutrition": NUTRITION_PROFILE_PREFIX}
+
+def _batch_job(athlete_id: str, kind: str, body: dict) -> dict:
+    """Ligne de requête au format OpenAI Batch API."""
+    return {
+        "custom_id": f"{athlete_id}{BATCH_ID_SEPARATOR}{kind}",
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": body
+    }
+
+def iter_profile_batch_jobs(profiles: list, kinds=("plan", "nutrition")):
+    """Génère les requêtes batch (mêmes prompts que l'interactif) pour un effectif."""
+    builders = {"plan": build_plan_request, "nutrition": build_nutrition_request}
+    for profile in profiles:
+        prompt_profile = {k: v for k, v in profile.items() if k != "athlete_id"}
+        for kind in kinds:
+            yield _batch_job(profile["athlete_id"], kind, builders[kind](prompt_profile))
+
+def edit_batch_job(athlete_id: str, instruction: str, plan_text: str, profile: dict) -> dict:
+    """Requête batch d'adaptation de plan (même prompt que ai_edit_plan)."""
+    return _batch_job(athlete_id, "edit", build_edit_plan_request(instruction, plan_text, profile))
+
+def write_batch_requests(path: str, jobs) -> int:
+    """Écrit un fichier JSONL de requêtes batch et retourne le nombre de lignes."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for job in jobs:
+            f.write(json.dumps(job, ensure_ascii=False) + "\n")
+            count += 1
+    logger.info(f"Batch request file written: {path} ({count} requests)")
+    return count
+
+def _local_batch_reply(kind: str, body: dict) -> str:
+    """Réponse de substitution hors ligne, reconstruite depuis le prompt de la requête."""
+    user_content = body["messages"][-1]["content"]
+
+    if kind == "edit":
+        current_plan = user_content.split("=== PLAN ACTUEL ===\n", 1)[-1].split("\n\n=== FORMAT SORTIE ===", 1)[0]
+        return json.dumps({
+            "new_plan": current_plan,
+            "summary": "Plan inchangé (traitement local hors ligne).",
+            "changed_days": []
+        }, ensure_ascii=False)
+
+    prefix = _PROFILE_PROMPT_PREFIXES.get(kind)
+    if prefix is None or not user_content.startswith(prefix):
+        raise ValueError(f"requête {kind!r} sans profil reconnaissable")
+    profile = json.loads(user_content[len(prefix):])
+    if kind == "nutrition":
+        return fallback_nutrition(profile)
+    return fallback_plan(profile)
+
+def run_local_batch(input_path: str, output_path: str) -> int:
+    """
+    Traite localement un fichier de requêtes batch et écrit un fichier de résultats.
+
+    Le format de sortie est celui de l'API Batch d'OpenAI ; les réponses sont
+    produites par les générateurs de repli, ce qui permet de tester tout le flux hors ligne.
+    """
+    count = 0
+    with open(input_path, encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            kind = job["custom_id"].rsplit(BATCH_ID_SEPARATOR, 1)[-1]
+            count += 1
+            try:
+                content = _local_batch_reply(kind, job["body"])
+                result = {
+                    "id": f"batch_req_local_{count}",
+                    "custom_id": job["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "request_id": f"local-{count}",
+                        "body": {
+                            "object": "chat.completion",
+                            "model": job["body"].get("model"),
+                            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]
+                        }
+                    },
+                    "error": None
+                }
+            except Exception as e:
+                result = {
+                    "id": f"batch_req_local_{count}",
+                    "custom_id": job["custom_id"],
+                    "response": None,
+                    "error": {"code": "local_error", "message": str(e)}
+                }
+            dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    logger.info(f"Local batch processed: {count} requests -> {output_path}")
+    return count
+
+def ingest_batch_results(results_path: str, store_path: str) -> dict:
+    """
+    Intègre un fichier de résultats batch dans le magasin de plans (JSONL par athlète).
+
+    Les réponses en erreur ou inexploitables sont ignorées : le plan déjà stocké est conservé.
+    Retourne les compteurs {"ok": n, "failed": n}.
+    """
+    store = read_roster_checkpoint(store_path)
+    stats = {"ok": 0, "failed": 0}
+
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            athlete_id, _, kind = result["custom_id"].rpartition(BATCH_ID_SEPARATOR)
+            response = result.get("response") or {}
+
+            if result.get("error") or response.get("status_code") != 200:
+                stats["failed"] += 1
+                continue
+
+            content = response["body"]["choices"][0]["message"]["content"] or ""
+            record = store.setdefault(athlete_id, {"athlete_id": athlete_id, "plan": "", "nutrition": None})
+
+            if kind == "plan" and content.strip():
+                record["plan"] = content
+            elif kind == "nutrition" and content.strip():
+                record["nutrition"] = content
+            elif kind == "edit":
+                obj = extract_json_block(content) or {}
+                new_plan = (obj.get("new_plan") or "").strip()
+                if not (new_plan and ("Jour 1" in new_plan or "Day 1" in new_plan)):
+                    stats["failed"] += 1
+                    continue
+                record["plan"] = new_plan
+            else:
+                stats["failed"] += 1
+                continue
+
+            record["source"] = "batch"
+            record["generated_at"] = dt.datetime.now().isoformat(timespec="seconds")
+            stats["ok"] += 1
+
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+    tmp_path = store_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in store.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, store_path)
+
+    logger.info(f"Batch results ingested into {store_path}: {stats}")
+    return stats
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""Cache partagé entre répliques (SQLite ou Redis) avec baux anti-ruée."""
+
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import functools
+import threading
+
+from coach_ai.config import get_config_value
+from coach_ai.resilience import io_deadline
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# "sqlite:///chemin.sqlite3" (défaut, volume partagé), "redis://hôte:port/0", ou "none"
+SHARED_CACHE_URL = get_config_value("SHARED_CACHE_URL", "sqlite:///shared_cache.sqlite3")
+
+# Durées de vie par espace de noms (secondes)
+GEOCODE_CACHE_TTL = 30 * 24 * 3600
+FORECAST_CACHE_TTL = 1800
+WEATHER_CACHE_TTL = 600
+LLM_CACHE_TTL = int(get_config_value("LLM_CACHE_TTL", 7 * 24 * 3600))
+
+# Intervalle de scrutation quand une autre réplique calcule déjà la même clé
+CACHE_LEASE_POLL_SECONDS = 0.2
+
+# Purge des entrées expirées du cache SQLite : toutes les N écritures, ou au plus tard après ce délai (s)
+SQLITE_PRUNE_EVERY_WRITES = 256
+SQLITE_PRUNE_INTERVAL = 600
+
+class SQLiteCacheBackend:
+    """Cache sur fichier SQLite, partageable par plusieurs processus sur un même volume."""
+
+    def __init__(self, path: str, prune_every: int = SQLITE_PRUNE_EVERY_WRITES,
+                 prune_interval: float = SQLITE_PRUNE_INTERVAL):
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._prune_every = max(1, prune_every)
+        self._prune_interval = prune_interval
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._prune_locked(time.time())
+
+    def _prune_locked(self, now: float):
+        """Supprime les entrées et baux expirés (verrou tenu par l'appelant)."""
+        self._conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        self._conn.execute("DELETE FROM leases WHERE expires <= ?", (now,))
+        self._writes_since_prune = 0
+        self._last_prune = now
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, now + ttl)
+            )
+            # Purge opportuniste : un processus de longue durée ne laisse pas grossir le fichier
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= self._prune_every or now - self._last_prune >= self._prune_interval:
+                self._prune_locked(now)
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.expires <= ?",
+                (key, owner, now + ttl, now)
+            )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+class RedisCacheBackend:
+    """Cache sur Redis (ou tout serveur compatible avec le protocole Redis)."""
+
+    # Supprime le bail seulement s'il appartient encore à `owner` (lecture et suppression atomiques)
+    RELEASE_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url, socket_timeout=2)
+        self._release_lease = self._client.register_script(self.RELEASE_LEASE_SCRIPT)
+
+    def get(self, key: str):
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(self._client.set(f"lease:{key}", owner, nx=True, px=int(ttl * 1000)))
+
+    def release_lease(self, key: str, owner: str):
+        self._release_lease(keys=[f"lease:{key}"], args=[owner])
+
+class _InFlight:
+    """Calcul d'une clé en cours dans ce processus ; les autres threads attendent son résultat."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+class SharedCache:
+    """
+    Cache partagé entre répliques : clés préfixées par espace de noms, durée de vie
+    par entrée et protection contre les ruées (une clé froide demandée par plusieurs
+    sessions à la fois n'est calculée qu'une fois). Une panne du cache n'est jamais
+    bloquante : la valeur est alors simplement recalculée.
+    """
+
+    def __init__(self, backend=None, prefix: str = "coach"):
+        self.backend = backend
+        self.prefix = prefix
+        self.owner = uuid.uuid4().hex
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "waits": 0, "errors": 0}
+
+    def _full_key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def get(self, namespace: str, key: str):
+        if not self.backend:
+            return None
+        try:
+            raw = self.backend.get(self._full_key(namespace, key))
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Shared cache read error ({namespace}): {e}")
+            return None
+        return None if raw is None else json.loads(raw)
+
+    def set(self, namespace: str, key: str, value, ttl: float):
+        if not self.backend:
+            return
+        try:
+            self.backend.set(self._full_key(namespace, key), json.dumps(value).encode("utf-8"), ttl)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Shared cache write error ({namespace}): {e}")
+
+    def _acquire_lease(self, full_key: str, ttl: float) -> bool:
+        try:
+            return self.backend.acquire_lease(full_key, self.owner, ttl)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Shared cache lease error: {e}")
+            return True
+
+    def _release_lease(self, full_key: str):
+        try:
+            self.backend.release_lease(full_key, self.owner)
+        except Exception as e:
+            logger.warning(f"Shared cache lease release error: {e}")
+
+    def get_or_compute(self, namespace: str, key: str, ttl: float, compute, lease_timeout: float = 30.0):
+        """
+        Retourne la valeur en cache ou la calcule avec `compute()`.
+
+        Dans le processus, un seul thread calcule une clé donnée : les autres attendent
+        son résultat sans bloquer les autres clés (aucun verrou n'est tenu pendant
+        `compute()`). Entre répliques, seul le détenteur du bail appelle `compute()`,
+        les autres attendent que la valeur apparaisse. Un résultat None n'est pas mis en cache.
+        """
+        value = self.get(namespace, key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+        if not self.backend:
+            return compute()
+
+        full_key = self._full_key(namespace, key)
+        wait_until = time.monotonic() + lease_timeout
+        deadline = io_deadline.get()
+        if deadline is not None:
+            wait_until = min(wait_until, deadline)
+
+        while True:
+            with self._inflight_lock:
+                flight = self._inflight.get(full_key)
+                if flight is None:
+                    flight = self._inflight[full_key] = _InFlight()
+                    break
+            self.stats["waits"] += 1
+            if not flight.done.wait(max(0.0, wait_until - time.monotonic())):
+                logger.warning(f"Shared cache in-flight wait timed out ({namespace})")
+                return self._compute_with_lease(namespace, key, full_key, ttl, compute, lease_timeout, wait_until)
+            if flight.value is not None:
+                self.stats["hits"] += 1
+                return flight.value
+            # Le calcul concurrent a échoué : ce thread prend le relais
+
+        try:
+            flight.value = self._compute_with_lease(namespace, key, full_key, ttl, compute, lease_timeout, wait_until)
+            return flight.value
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(full_key, None)
+            flight.done.set()
+
+    def _compute_with_lease(self, namespace: str, key: str, full_key: str, ttl: float, compute,
+                            lease_timeout: float, wait_until: float):
+        # Un autre thread a pu remplir la clé entre-temps
+        value = self.get(namespace, key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        while not self._acquire_lease(full_key, lease_timeout):
+            self.stats["waits"] += 1
+            time.sleep(CACHE_LEASE_POLL_SECONDS)
+            value = self.get(namespace, key)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+            if time.monotonic() >= wait_until:
+                logger.warning(f"Shared cache lease wait timed out ({namespace})")
+                break
+
+        self.stats["misses"] += 1
+        try:
+            value = compute()
+            if value is not None:
+                self.set(namespace, key, value, ttl)
+            return value
+        finally:
+            self._release_lease(full_key)
+
+def content_cache_key(*parts) -> str:
+    """Clé de cache stable (BLAKE2b) à partir de valeurs sérialisables en JSON."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def get_shared_cache() -> SharedCache:
+    """Cache partagé du processus, selon SHARED_CACHE_URL."""
+    url = str(SHARED_CACHE_URL or "none")
+    try:
+        if url.startswith(("redis://", "rediss://")):
+            if not REDIS_AVAILABLE:
+                logger.warning("SHARED_CACHE_URL is redis but the redis package is not installed")
+                return SharedCache()
+            return SharedCache(RedisCacheBackend(url))
+        if url.startswith("sqlite:///"):
+            return SharedCache(SQLiteCacheBackend(url[len("sqlite:///"):]))
+    except Exception as e:
+        logger.error(f"Shared cache unavailable ({url}): {e}")
+    return SharedCache()
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""Disposition hebdomadaire des séances, événements récurrents et export iCalendar."""
+
+import hashlib
+import logging
+import datetime as dt
+
+logger = logging.getLogger(__name__)
+
+# Durée de projection du plan hebdomadaire selon l'horizon choisi au questionnaire
+HORIZON_DAYS = {
+    "3 mois": 91,
+    "6 mois": 182,
+    "1 an": 365,
+    "Plus d'un an": 730,
+}
+
+def compute_plan_horizon_end(start_date, horizon: str = None, target_date=None) -> dt.date:
+    """Calcule la date de fin (exclue) de projection du plan à partir de l'horizon et de la date cible."""
+    if isinstance(start_date, dt.datetime):
+        start_date = start_date.date()
+
+    end_date = start_date + dt.timedelta(days=7)
+
+    if horizon in HORIZON_DAYS:
+        end_date = max(end_date, start_date + dt.timedelta(days=HORIZON_DAYS[horizon]))
+
+    if isinstance(target_date, dt.datetime):
+        target_date = target_date.date()
+    if isinstance(target_date, dt.date):
+        end_date = max(end_date, target_date + dt.timedelta(days=1))
+
+    return end_date
+
+# Heure de début des séances selon le moment préféré
+SESSION_TIME_MAP = {
+    "Matin (6h-10h)": "07:00",
+    "Midi (11h-14h)": "12:00",
+    "Après-midi (15h-18h)": "15:00",
+    "Soir / Nuit (19h+)": "18:00"
+}
+
+def get_session_time_slot(moment_pref: str, duree: int) -> tuple:
+    """Retourne (heure de début, heure de fin) au format HH:MM pour une séance."""
+    start_time = SESSION_TIME_MAP.get(moment_pref, "07:00")
+    hour, minute = map(int, start_time.split(':'))
+    end_minute = minute + duree
+    end_hour = hour + (end_minute // 60)
+    end_minute = end_minute % 60
+    end_time = f"{end_hour:02d}:{end_minute:02d}"
+    return start_time, end_time
+
+def _calendar_day_template(session: dict, start_time: str, end_time: str) -> dict:
+    """Construit le modèle (sans date) d'un événement pour un jour du plan."""
+    title_lower = (session['title'] or "").lower()
+    is_rest = any(word in title_lower for word in ["repos", "rest", "récupération", "recovery"])
+    color = "#888888" if is_rest else "#3ea6ff"
+
+    return {
+        "title": f"Jour {session['day']}: {session['title']}",
+        "groupId": f"jour-{session['day']}",
+        "startTime": f"{start_time}:00",
+        "endTime": f"{end_time}:00",
+        "extendedProps": {
+            "description": session['description'],
+            "day_number": session['day'],
+            "is_rest": is_rest
+        },
+        "backgroundColor": color,
+        "borderColor": color,
+        "textColor": "#ffffff"
+    }
+
+def build_calendar_layout(sessions: list, moment_pref: str, duree: int, plan_hash=None, previous: dict = None) -> dict:
+    """
+    Construit la disposition du calendrier en décalages de jours (sans dates absolues).
+
+    Les modèles des jours dont le contenu n'a pas changé par rapport à `previous`
+    sont réutilisés tels quels ; seuls les jours modifiés sont reconstruits.
+    """
+    start_time, end_time = get_session_time_slot(moment_pref, duree)
+    slot = (start_time, end_time)
+
+    reusable = {}
+    if previous and previous.get("slot") == slot:
+        reusable = {day["key"]: day["template"] for day in previous.get("days", [])}
+
+    days = []
+    rebuilt = 0
+    for session in sessions:
+        # Empreinte courte du contenu du jour (la description n'est stockée qu'une fois, dans le modèle)
+        key = hashlib.blake2b(
+            f"{session['day']}\x1f{session['title']}\x1f{session['description']}".encode("utf-8"),
+            digest_size=8
+        ).hexdigest()
+        template = reusable.get(key)
+        if template is None:
+            template = _calendar_day_template(session, start_time, end_time)
+            rebuilt += 1
+        days.append({"key": key, "offset": session['day'] - 1, "template": template})
+
+    logger.info(f"Calendar layout: {len(days)} days, {rebuilt} rebuilt")
+    return {"plan_hash": plan_hash, "slot": slot, "days": days}
+
+def apply_calendar_offsets(layout: dict, start_date, end_date=None) -> list:
+    """
+    Date les modèles de la disposition à partir de la date de début.
+
+    Opération peu coûteuse : aucun parsing, seulement l'application des décalages.
+    Chaque jour devient UNE règle hebdomadaire (daysOfWeek / startRecur / endRecur)
+    que FullCalendar déplie uniquement sur la plage affichée : un horizon d'un an
+    coûte autant qu'une semaine.
+    """
+    if not layout or not layout.get("days"):
+        return []
+
+    if isinstance(start_date, dt.datetime):
+        start_date = start_date.date()
+    if end_date is None:
+        end_date = start_date + dt.timedelta(days=7)
+    elif isinstance(end_date, dt.datetime):
+        end_date = end_date.date()
+    end_str = end_date.strftime("%Y-%m-%d")
+
+    events = []
+    for day in layout["days"]:
+        event_date = start_date + dt.timedelta(days=day["offset"])
+        if event_date >= end_date:
+            continue
+
+        event = dict(day["template"])
+        # FullCalendar : 0 = dimanche ... 6 = samedi
+        event["daysOfWeek"] = [event_date.isoweekday() % 7]
+        event["startRecur"] = event_date.strftime("%Y-%m-%d")
+        event["endRecur"] = end_str
+        events.append(event)
+
+    return events
+
+def expand_calendar_events(events: list, range_start, range_end):
+    """
+    Déplie paresseusement les événements récurrents sur [range_start, range_end[.
+
+    Générateur : seules les occurrences de la plage demandée sont matérialisées.
+    """
+    if isinstance(range_start, dt.datetime):
+        range_start = range_start.date()
+    if isinstance(range_end, dt.datetime):
+        range_end = range_end.date()
+
+    for event in events:
+        first = dt.date.fromisoformat(event["startRecur"])
+        last = dt.date.fromisoformat(event["endRecur"])
+        lo = max(first, range_start)
+        hi = min(last, range_end)
+        if lo >= hi:
+            continue
+
+        # Première occurrence >= lo (même jour de semaine que startRecur)
+        current = lo + dt.timedelta(days=(first - lo).days % 7)
+        while current < hi:
+            date_str = current.isoformat()
+            yield {
+                "title": event["title"],
+                "start": f"{date_str}T{event['startTime']}",
+                "end": f"{date_str}T{event['endTime']}",
+                "extendedProps": event["extendedProps"],
+                "backgroundColor": event["backgroundColor"],
+                "borderColor": event["borderColor"],
+                "textColor": event["textColor"]
+            }
+            current += dt.timedelta(days=7)
+
+# ----- Export iCalendar -----
+def _ics_escape(text: str) -> str:
+    """Échappe un texte pour une propriété iCalendar (RFC 5545)."""
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+def _ics_fold(line: str) -> str:
+    """Replie une ligne iCalendar à 75 octets (lignes de continuation préfixées d'un espace)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+
+    parts = []
+    current = ""
+    current_len = 0
+    limit = 75
+    for char in line:
+        char_len = len(char.encode("utf-8"))
+        if current_len + char_len > limit:
+            parts.append(current)
+            current = " "
+            current_len = 1
+            limit = 75
+        current += char
+        current_len += char_len
+    parts.append(current)
+    return "\r\n".join(parts) + "\r\n"
+
+def iter_ics_events(sessions: list, start_date, end_date, moment_pref: str, duree: int, uid_prefix: str = "lp9"):
+    """
+    Génère les blocs VEVENT (une règle RRULE hebdomadaire par jour du plan).
+
+    Générateur ligne par ligne : la taille produite ne dépend pas de la durée de l'horizon.
+    """
+    if isinstance(start_date, dt.datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, dt.datetime):
+        end_date = end_date.date()
+
+    start_time, end_time = get_session_time_slot(moment_pref, duree)
+    start_hm = start_time.replace(":", "")
+    end_hm = end_time.replace(":", "")
+    stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    until = (end_date - dt.timedelta(days=1)).strftime("%Y%m%dT235959")
+
+    for session in sessions:
+        event_date = start_date + dt.timedelta(days=session["day"] - 1)
+        if event_date >= end_date:
+            continue
+        day_str = event_date.strftime("%Y%m%d")
+        summary = f"Jour {session['day']}: {session['title']}"
+
+        yield "BEGIN:VEVENT\r\n"
+        yield _ics_fold(f"UID:{uid_prefix}-jour-{session['day']}@coach-serge")
+        yield f"DTSTAMP:{stamp}\r\n"
+        yield f"DTSTART:{day_str}T{start_hm}00\r\n"
+        yield f"DTEND:{day_str}T{end_hm}00\r\n"
+        yield f"RRULE:FREQ=WEEKLY;UNTIL={until}\r\n"
+        yield _ics_fold(f"SUMMARY:{_ics_escape(summary)}")
+        yield _ics_fold(f"DESCRIPTION:{_ics_escape(session['description'])}")
+        yield "END:VEVENT\r\n"
+
+def iter_ics_calendar(schedules, calendar_name: str = "Coach Serge"):
+    """
+    Génère un document iCalendar complet pour un ou plusieurs athlètes.
+
+    `schedules` est un itérable (éventuellement paresseux) de dicts avec les clés
+    sessions, start_date, end_date, moment, duree et uid. Le document est produit
+    ligne par ligne, en mémoire constante quel que soit le nombre d'athlètes.
+    """
+    yield "BEGIN:VCALENDAR\r\n"
+    yield "VERSION:2.0\r\n"
+    yield "PRODID:-//LP9//Coach IA Serge//FR\r\n"
+    yield "CALSCALE:GREGORIAN\r\n"
+    yield _ics_fold(f"X-WR-CALNAME:{_ics_escape(calendar_name)}")
+
+    for schedule in schedules:
+        yield from iter_ics_events(
+            schedule["sessions"],
+            schedule["start_date"],
+            schedule["end_date"],
+            schedule.get("moment", "Matin (6h-10h)"),
+            int(schedule.get("duree", 60) or 60),
+            uid_prefix=schedule.get("uid", "lp9")
+        )
+
+    yield "END:VCALENDAR\r\n"
+
+def write_ics_file(path: str, lines) -> int:
+    """Écrit un flux de lignes iCalendar dans un fichier sans le matérialiser en mémoire."""
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for line in lines:
+            f.write(line)
+            count += 1
+    logger.info(f"ICS written to {path} ({count} lines)")
+    return count
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Chaîne profil → plan → calendrier → .ics en ligne de commande (sans Streamlit).
+
+Usage :
+    python -m coach_ai profil.json --ics plan.ics [--plans-dir plans/] [--nutrition]
+    python -m coach_ai effectif.csv --ics equipe.ics --offline
+
+Génération hors ligne (Batch API d'OpenAI, ex. régénération nocturne) :
+    python -m coach_ai batch prepare effectif.csv requetes.jsonl [--kinds plan nutrition]
+    python -m coach_ai batch run-local requetes.jsonl resultats.jsonl
+    python -m coach_ai batch ingest resultats.jsonl [--store plan_store.jsonl]
+"""
+
+import os
+import sys
+import argparse
+import logging
+import datetime as dt
+
+from coach_ai.batch import BATCH_PLAN_STORE, ingest_batch_results, iter_profile_batch_jobs, run_local_batch, write_batch_requests
+from coach_ai.calendar_events import compute_plan_horizon_end, iter_ics_calendar, write_ics_file
+from coach_ai.llm import call_openai_nutrition, call_openai_plan
+from coach_ai.nutrition import fallback_nutrition
+from coach_ai.plans import fallback_plan, parse_workout_plan, set_fallback_library_path
+from coach_ai.profile import load_roster_profiles
+
+def generate_plan(profile: dict, api_key: str = "") -> tuple:
+    """Plan d'un profil via OpenAI si une clé est fournie, sinon (ou en cas d'échec) plan de repli."""
+    prompt_profile = {k: v for k, v in profile.items() if k != "athlete_id"}
+    plan = call_openai_plan(api_key, prompt_profile) if api_key else ""
+    if plan:
+        return plan, "openai"
+    return fallback_plan(prompt_profile), "fallback"
+
+def generate_nutrition(profile: dict, api_key: str = "") -> str:
+    """Plan nutritionnel d'un profil (OpenAI si possible, sinon repli local)."""
+    prompt_profile = {k: v for k, v in profile.items() if k != "athlete_id"}
+    nutrition = call_openai_nutrition(api_key, prompt_profile) if api_key else ""
+    return nutrition or fallback_nutrition(prompt_profile)
+
+def iter_schedules(profiles: list, start_date: dt.date, api_key: str = "", plans_dir: str = None,
+                   include_nutrition: bool = False, report=None):
+    """
+    Génère paresseusement le calendrier de chaque athlète (pour iter_ics_calendar) ;
+    les plans sont écrits dans `plans_dir` au fil de l'eau si demandé.
+    """
+    for profile in profiles:
+        athlete_id = profile["athlete_id"]
+        plan, source = generate_plan(profile, api_key)
+        sessions = parse_workout_plan(plan)
+
+        if plans_dir:
+            with open(os.path.join(plans_dir, f"{athlete_id}.md"), "w", encoding="utf-8") as f:
+                f.write(plan)
+            if include_nutrition:
+                with open(os.path.join(plans_dir, f"{athlete_id}.nutrition.md"), "w", encoding="utf-8") as f:
+                    f.write(generate_nutrition(profile, api_key))
+
+        if report:
+            report(f"{athlete_id}: {len(sessions)} jours au plan ({source})")
+
+        yield {
+            "sessions": sessions,
+            "start_date": start_date,
+            "end_date": compute_plan_horizon_end(start_date, profile.get("horizon")),
+            "moment": profile.get("moment") or "Matin (6h-10h)",
+            "duree": profile.get("duree_min") or 60,
+            "uid": f"lp9-{athlete_id}"
+        }
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m coach_ai",
+        description="Génère plan(s) d'entraînement et calendrier iCalendar à partir de profils."
+    )
+    parser.add_argument("profiles", help="Profil JSON, ou effectif CSV / JSONL (clés du questionnaire)")
+    parser.add_argument("--ics", default="plan.ics", help="Fichier .ics de sortie (défaut : plan.ics)")
+    parser.add_argument("--plans-dir", help="Dossier où écrire le plan Markdown de chaque athlète")
+    parser.add_argument("--nutrition", action="store_true", help="Écrit aussi le plan nutritionnel (avec --plans-dir)")
+    parser.add_argument("--start", type=dt.date.fromisoformat, default=dt.date.today(),
+                        help="Date de début du calendrier (AAAA-MM-JJ, défaut : aujourd'hui)")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY", ""),
+                        help="Clé OpenAI (défaut : variable OPENAI_API_KEY)")
+    parser.add_argument("--offline", action="store_true", help="N'appelle pas OpenAI : plans de repli uniquement")
+    parser.add_argument("--calendar-name", default="Coach Serge", help="Nom du calendrier exporté")
+    parser.add_argument("--fallback-library", default=os.getenv("FALLBACK_LIBRARY_PATH"),
+                        help="Fichier où conserver la bibliothèque de plans de repli (défaut : en mémoire, rien n'est écrit)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Journalisation détaillée")
+    return parser
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m coach_ai batch",
+        description="Génération hors ligne au format Batch API d'OpenAI (mêmes prompts que l'application)."
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Journalisation détaillée")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare = commands.add_parser("prepare", help="Écrit le fichier de requêtes batch d'un effectif")
+    prepare.add_argument("profiles", help="Profil JSON, ou effectif CSV / JSONL")
+    prepare.add_argument("requests", help="Fichier JSONL de requêtes à produire")
+    prepare.add_argument("--kinds", nargs="+", choices=["plan", "nutrition"], default=["plan", "nutrition"],
+                         help="Documents à générer (défaut : plan nutrition)")
+
+    run_local = commands.add_parser("run-local", help="Traite un fichier de requêtes localement (plans de repli)")
+    run_local.add_argument("requests", help="Fichier JSONL de requêtes batch")
+    run_local.add_argument("results", help="Fichier JSONL de résultats à produire")
+    run_local.add_argument("--fallback-library", default=os.getenv("FALLBACK_LIBRARY_PATH"),
+                           help="Fichier où conserver la bibliothèque de plans de repli (défaut : en mémoire)")
+
+    ingest = commands.add_parser("ingest", help="Intègre un fichier de résultats batch dans le magasin de plans")
+    ingest.add_argument("results", help="Fichier JSONL de résultats (API Batch ou run-local)")
+    ingest.add_argument("--store", default=BATCH_PLAN_STORE,
+                        help=f"Magasin de plans JSONL (défaut : {BATCH_PLAN_STORE})")
+    return parser
+
+def _configure_logging(verbose: bool):
+    logging.basicConfig(
+        level=logging.INFO if verbose else logging.WARNING,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+def _read_profiles(path: str):
+    """Profils d'un fichier, ou None (message sur stderr) s'il est illisible ou vide."""
+    try:
+        with open(path, "rb") as f:
+            profiles = load_roster_profiles(f.read(), path)
+    except (OSError, ValueError) as e:
+        print(f"Profil illisible ({path}) : {e}", file=sys.stderr)
+        return None
+    if not profiles:
+        print(f"Aucun profil dans {path}", file=sys.stderr)
+        return None
+    return profiles
+
+def batch_main(argv: list) -> int:
+    args = build_batch_parser().parse_args(argv)
+    _configure_logging(args.verbose)
+
+    try:
+        if args.command == "prepare":
+            profiles = _read_profiles(args.profiles)
+            if profiles is None:
+                return 2
+            count = write_batch_requests(args.requests, iter_profile_batch_jobs(profiles, kinds=args.kinds))
+            print(f"{len(profiles)} profil(s) → {args.requests} ({count} requêtes)")
+        elif args.command == "run-local":
+            set_fallback_library_path(args.fallback_library)
+            count = run_local_batch(args.requests, args.results)
+            print(f"{count} requête(s) traitée(s) → {args.results}")
+        else:
+            stats = ingest_batch_results(args.results, args.store)
+            print(f"{stats['ok']} réponse(s) intégrée(s), {stats['failed']} ignorée(s) → {args.store}")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Échec de « batch {args.command} » : {e}", file=sys.stderr)
+        return 2
+    return 0
+
+def main(argv: list = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == "batch":
+        return batch_main(argv[1:])
+
+    args = build_parser().parse_args(argv)
+    _configure_logging(args.verbose)
+    set_fallback_library_path(args.fallback_library)
+
+    profiles = _read_profiles(args.profiles)
+    if profiles is None:
+        return 2
+
+    if args.plans_dir:
+        os.makedirs(args.plans_dir, exist_ok=True)
+
+    api_key = "" if args.offline else args.api_key
+    schedules = iter_schedules(
+        profiles, args.start, api_key=api_key, plans_dir=args.plans_dir,
+        include_nutrition=args.nutrition, report=print
+    )
+    lines = write_ics_file(args.ics, iter_ics_calendar(schedules, calendar_name=args.calendar_name))
+    print(f"{len(profiles)} profil(s) → {args.ics} ({lines} lignes)")
+    return 0
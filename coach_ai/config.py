@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""Paramètres de configuration (secrets Streamlit dans l'application, sinon environnement)."""
+
+import os
+import sys
+
+def get_config_value(name: str, default=None):
+    """Lit un paramètre dans st.secrets puis dans l'environnement, sinon `default`."""
+    # Les secrets ne sont consultés que dans l'application : la CLI n'importe jamais Streamlit
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            if name in st.secrets:
+                return st.secrets[name]
+        except Exception:
+            pass
+    return os.getenv(name, default)
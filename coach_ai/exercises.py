@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Catalogue d'exercices local : remplaçants compatibles (matériel, blessures) sans appel LLM."""
+
+import os
+import re
+import json
+import logging
+import functools
+
+from coach_ai.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+EXERCISE_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "exercises.json")
+
+# Mots-clés (sans accents) du champ « matériel » → équipement du catalogue
+EQUIPMENT_KEYWORDS = {
+    "haltere": "halteres",
+    "dumbbell": "halteres",
+    "kettlebell": "kettlebell",
+    "elastique": "elastiques",
+    "bande": "elastiques",
+    "banc": "banc",
+    "machine": "machine",
+    "poulie": "machine",
+    "traction": "barre_traction",
+    "barre": "barre",
+    "velo": "velo",
+    "rameur": "rameur",
+    "corde": "corde",
+    "piscine": "piscine",
+}
+GYM_KEYWORDS = ("salle", "gym", "fitness")
+
+# Mots-clés (sans accents) des blessures / demandes → contre-indications du catalogue
+INJURY_KEYWORDS = {
+    "genou": "genou",
+    "rotule": "genou",
+    "menisque": "genou",
+    "dos": "dos",
+    "lombaire": "dos",
+    "hernie": "dos",
+    "epaule": "epaule",
+    "coiffe": "epaule",
+    "poignet": "poignet",
+    "cheville": "cheville",
+    "hanche": "hanche",
+    "coude": "coude",
+}
+
+_ACCENT_CLASSES = {"a": "[aàâä]", "e": "[eéèêë]", "i": "[iîï]", "o": "[oôö]", "u": "[uùûü]", "c": "[cç]"}
+
+@functools.lru_cache(maxsize=None)
+def load_exercise_catalog(path: str = EXERCISE_CATALOG_PATH) -> dict:
+    """Catalogue d'exercices indexé par alias, schéma de mouvement et groupe musculaire."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            exercises = json.load(f)["exercises"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Exercise catalog unavailable ({path}): {e}")
+        exercises = []
+
+    by_alias, by_pattern, by_muscle = {}, {}, {}
+    all_equipment = set()
+    for exercise in exercises:
+        for alias in [exercise["name"]] + exercise.get("aliases", []):
+            by_alias.setdefault(normalize_text(alias), exercise)
+        by_pattern.setdefault(exercise["pattern"], []).append(exercise)
+        for muscle in exercise["muscles"]:
+            by_muscle.setdefault(muscle, []).append(exercise)
+        for requirement in exercise["equipment"]:
+            all_equipment.update(requirement.split("|"))
+
+    # Une seule expression pour tous les alias, les plus longs d'abord (« leg curl » avant « curl ») :
+    # à chaque position, le nom complet le plus long l'emporte et masque les alias qu'il contient.
+    # Insensible à la casse et aux accents, elle s'applique aussi bien au texte brut du plan.
+    aliases = sorted(by_alias, key=len, reverse=True)
+    variants = ["".join(_ACCENT_CLASSES.get(c, re.escape(c)) for c in alias) for alias in aliases]
+    alias_regex = re.compile(r"\b(" + "|".join(variants) + r")s?\b", re.IGNORECASE) if aliases else None
+    logger.info(f"Exercise catalog loaded: {len(exercises)} exercises, {len(aliases)} aliases")
+    return {
+        "by_alias": by_alias,
+        "by_pattern": by_pattern,
+        "by_muscle": by_muscle,
+        "alias_regex": alias_regex,
+        "all_equipment": all_equipment,
+    }
+
+def available_equipment(materiel: str, catalog: dict) -> set:
+    """Équipement disponible d'après le champ libre « matériel » (le poids du corps l'est toujours)."""
+    text = normalize_text(materiel)
+    if any(keyword in text for keyword in GYM_KEYWORDS):
+        return set(catalog["all_equipment"])
+    equipment = {"poids_du_corps"}
+    for keyword, item in EQUIPMENT_KEYWORDS.items():
+        if keyword in text:
+            equipment.add(item)
+    return equipment
+
+def detect_contraindications(*texts) -> set:
+    """Articulations à ménager mentionnées dans les blessures ou la demande."""
+    text = normalize_text(" ".join(t for t in texts if isinstance(t, str)))
+    return {
+        joint for keyword, joint in INJURY_KEYWORDS.items()
+        if re.search(rf"\b{keyword}[sx]?\b", text)
+    }
+
+def find_catalog_exercises(text: str, catalog: dict) -> list:
+    """Exercices du catalogue cités dans un texte, dans l'ordre d'apparition."""
+    if not catalog["alias_regex"]:
+        return []
+    found = []
+    for exercise, _ in iter_exercise_mentions(normalize_text(text), catalog):
+        if exercise not in found:
+            found.append(exercise)
+    return found
+
+def iter_exercise_mentions(text: str, catalog: dict):
+    """
+    (exercice, correspondance) de chaque exercice nommé dans un texte brut ou normalisé.
+
+    Les noms se recouvrant ne sont jamais comptés deux fois : « Goblet squat »
+    ou « Leg curl » ne sont pas des mentions de « Squat » ou de « Curl biceps ».
+    """
+    if not catalog["alias_regex"]:
+        return
+    for match in catalog["alias_regex"].finditer(text):
+        exercise = catalog["by_alias"].get(normalize_text(match.group(1)))
+        if exercise:
+            yield exercise, match
+
+def _equipment_ok(exercise: dict, equipment: set) -> bool:
+    # Chaque exigence doit être satisfaite ; « a|b » signifie l'un ou l'autre
+    return all(set(requirement.split("|")) & equipment for requirement in exercise["equipment"])
+
+def suggest_substitutions(source: dict, catalog: dict, equipment: set, avoid: set, limit: int = 3) -> list:
+    """Remplaçants compatibles : même schéma de mouvement d'abord, puis mêmes muscles."""
+    same_pattern = catalog["by_pattern"].get(source["pattern"], [])
+    same_muscles = sorted(
+        {id(ex): ex for muscle in source["muscles"] for ex in catalog["by_muscle"].get(muscle, [])}.values(),
+        key=lambda ex: -len(set(ex["muscles"]) & set(source["muscles"]))
+    )
+    options = []
+    for exercise in same_pattern + same_muscles:
+        if exercise is source or exercise in options:
+            continue
+        if not _equipment_ok(exercise, equipment) or avoid & set(exercise["avoid"]):
+            continue
+        options.append(exercise)
+        if len(options) == limit:
+            break
+    return options
+
+def resolve_local_substitution(request: str, profile: dict, plan_text: str = ""):
+    """
+    Résout une demande de remplacement avec le catalogue, sans appel LLM.
+
+    Retourne {"source", "options", "avoid"} ou None si la demande sort du
+    catalogue (exercice inconnu, absent du plan ou sans remplaçant compatible).
+    """
+    catalog = load_exercise_catalog()
+    mentioned = find_catalog_exercises(request, catalog)
+    if not mentioned:
+        return None
+    source = mentioned[0]
+    if not any(exercise is source for exercise, _ in iter_exercise_mentions(plan_text or "", catalog)):
+        return None
+
+    avoid = detect_contraindications(profile.get("blessures"), request)
+    # « remplace X par Y » : la cible est donnée par l'utilisateur
+    if len(mentioned) > 1 and re.search(r"\bpar\b", normalize_text(request)):
+        return {"source": source, "options": [mentioned[1]], "avoid": avoid}
+
+    options = suggest_substitutions(
+        source, catalog, available_equipment(profile.get("materiel") or "", catalog), avoid
+    )
+    if not options:
+        return None
+    return {"source": source, "options": options, "avoid": avoid}
+
+def apply_local_substitution(plan_text: str, source_name: str, replacement_name: str) -> tuple:
+    """
+    Remplace un exercice par un autre dans le plan ; retourne (nouveau plan, nb de remplacements).
+
+    Seuls les noms complets de l'exercice sont remplacés, jamais un alias inclus
+    dans le nom d'un autre exercice du catalogue.
+    """
+    catalog = load_exercise_catalog()
+    source = catalog["by_alias"].get(normalize_text(source_name))
+    if not source:
+        return plan_text, 0
+
+    replaced = []
+
+    def replace(match):
+        # Fonction de remplacement : le nom inséré n'est jamais interprété (\1, \g<0>…)
+        if catalog["by_alias"].get(normalize_text(match.group(1))) is not source:
+            return match.group(0)
+        replaced.append(match.start())
+        return replacement_name
+
+    return catalog["alias_regex"].sub(replace, plan_text), len(replaced)
+
+def format_local_substitution(resolution: dict) -> str:
+    source = resolution["source"]
+    lines = [f"🔁 **Remplacements possibles pour {source['name']}** :"]
+    for i, option in enumerate(resolution["options"], 1):
+        lines.append(f"{i}. **{option['name']}** — {option['prescription']}")
+    if resolution["avoid"]:
+        lines.append(f"\n_Choisis pour ménager : {', '.join(sorted(resolution['avoid']))}._")
+    lines.append(
+        f"\nVeux-tu que je remplace **{source['name']}** par **{resolution['options'][0]['name']}** "
+        "dans ton plan ? Réponds par oui ou non."
+    )
+    return "\n".join(lines)
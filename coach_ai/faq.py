@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Cache des réponses aux questions fréquentes du chat (questions normalisées, groupes de profils)."""
+
+import re
+import time
+import threading
+import itertools
+from collections import OrderedDict
+
+from coach_ai.config import get_config_value
+from coach_ai.nutrition import objective_calorie_adjustment
+from coach_ai.text import normalize_text, tokenize
+
+FAQ_CACHE_MAX_ENTRIES = int(get_config_value("FAQ_CACHE_MAX_ENTRIES", 2000))
+FAQ_CACHE_TTL = int(get_config_value("FAQ_CACHE_TTL", 7 * 24 * 3600))
+# Similarité minimale (Jaccard sur les termes normalisés) pour réutiliser une réponse
+FAQ_SIMILARITY_THRESHOLD = 0.8
+# Au-delà, le message est une conversation plutôt qu'une question fréquente
+FAQ_MAX_TERMS = 12
+# Entrées d'un groupe examinées (les plus récemment utilisées) lors d'une recherche par similarité
+FAQ_SIMILARITY_SCAN_LIMIT = int(get_config_value("FAQ_SIMILARITY_SCAN_LIMIT", 200))
+
+FAQ_STOPWORDS = frozenset("""
+a au aux avec ce ces cette dans de des du elle en est et etre il ils je j la le les leur lui ma me
+mes moi mon ne nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos
+votre vous y c d l m n s t est-ce quoi quel quelle quels quelles comment combien pourquoi quand
+faut faire dois doit peux peut puis bien tres plus moins avant apres pendant the what how is of to
+""".split())
+
+# Ordre important : les terminaisons longues d'abord
+_FAQ_SUFFIXES = ("ements", "ement", "ations", "ation", "euses", "euse", "eux", "ees", "ee", "es", "er", "ez", "e", "s", "x")
+
+# Tournures qui rendent une question propre à l'utilisateur (sur le texte normalisé)
+_FAQ_PERSONAL_PATTERN = re.compile(
+    r"\d|@|\b(mon plan|mon programme|ma seance|mes seances|aujourd hui|demain|hier|ce matin|ce soir|m appelle)\b"
+)
+
+def _faq_lemma(token: str) -> str:
+    """Racinisation grossière : même racine pour « protéine » / « protéines », « récupérer » / « récupération »."""
+    for suffix in _FAQ_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+def faq_terms(question: str) -> frozenset:
+    """Forme normalisée d'une question : sans casse, accents ni mots vides, lemmatisée."""
+    return frozenset(_faq_lemma(t) for t in tokenize(question) if t not in FAQ_STOPWORDS)
+
+def _weight_band(profile: dict) -> int:
+    try:
+        return int(float(profile.get("poids_kg") or 0) // 10) * 10
+    except (TypeError, ValueError):
+        return 0
+
+def faq_profile_bucket(profile: dict) -> str:
+    """Groupe de profils partageant les mêmes réponses (objectif, sexe, niveau, tranche de poids)."""
+    goal = objective_calorie_adjustment(profile.get("objectif_principal"))
+    return f"{goal}|{profile.get('sexe', '')}|{profile.get('niveau_exp', '')}|{_weight_band(profile)}"
+
+def faq_system_prompt(profile: dict) -> str:
+    """
+    Prompt d'une réponse destinée au cache FAQ : seuls les attributs qui définissent
+    le groupe de profils y figurent (ni profil complet, ni plan, ni plan nutritionnel),
+    la réponse étant ensuite servie à tout le groupe.
+    """
+    goal = objective_calorie_adjustment(profile.get("objectif_principal"))
+    goal_label = "perte de poids" if goal < 0 else "prise de masse" if goal > 0 else "maintien / forme"
+    band = _weight_band(profile)
+    context = {
+        "objectif": goal_label,
+        "sexe": profile.get("sexe") or "non précisé",
+        "niveau": profile.get("niveau_exp") or "non précisé",
+        "poids": f"{band}-{band + 9} kg" if band else "non précisé",
+    }
+    return (
+        "Tu es Serge, un coach sportif professionnel expert et motivant. "
+        "Réponds à une question générale d'entraînement ou de nutrition de manière concise et pratique, "
+        "sans supposer d'informations personnelles sur la personne (ni nom, ni plan, ni mensurations exactes). "
+        f"\n\n**PROFIL TYPE:**\n" + "\n".join(f"- {k} : {v}" for k, v in context.items())
+    )
+
+def mentions_personal_data(text: str, profile: dict, identity=()) -> bool:
+    """
+    Vrai si la question contient des données propres à l'utilisateur : identité (nom,
+    courriel), ville, mensurations du profil, chiffres ou contexte personnel.
+    """
+    normalized = normalize_text(text)
+    if _FAQ_PERSONAL_PATTERN.search(normalized):
+        return True
+    identity = [profile.get("ville"), *identity]
+    for key in ("poids_kg", "taille_cm", "age"):
+        try:
+            identity.append(str(int(float(profile.get(key)))))
+        except (TypeError, ValueError):
+            pass
+    for value in identity:
+        value = normalize_text(str(value or "")).strip()
+        if value and (len(value) >= 2 or value.isdigit()):
+            if re.search(rf"\b{re.escape(value)}\b", normalized):
+                return True
+    return False
+
+class FaqCache:
+    """
+    Cache des réponses aux questions fréquentes du chat, partagé par le processus.
+
+    Clé : groupe de profil + termes normalisés de la question. Une question
+    proche (Jaccard ≥ seuil) dans le même groupe réutilise la réponse ; seules les
+    `scan_limit` entrées les plus récemment utilisées du groupe sont comparées.
+    Éviction LRU au-delà de `max_entries` et expiration après `ttl` secondes.
+
+    Les réponses mises en cache doivent être générées avec faq_system_prompt :
+    elles sont servies à tous les utilisateurs du groupe.
+    """
+
+    def __init__(self, max_entries: int = FAQ_CACHE_MAX_ENTRIES, ttl: float = FAQ_CACHE_TTL,
+                 threshold: float = FAQ_SIMILARITY_THRESHOLD, scan_limit: int = FAQ_SIMILARITY_SCAN_LIMIT):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.scan_limit = scan_limit
+        self._entries = OrderedDict()
+        self._by_bucket = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "skipped": 0, "evictions": 0}
+
+    def make_key(self, question: str, profile: dict, identity=()):
+        """Clé de cache, ou None si la question est personnelle ou trop longue pour une FAQ."""
+        terms = faq_terms(question)
+        if not terms or len(terms) > FAQ_MAX_TERMS or mentions_personal_data(question, profile, identity):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return None
+        return (faq_profile_bucket(profile), terms)
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        bucket_keys = self._by_bucket.get(key[0])
+        if bucket_keys is not None:
+            bucket_keys.pop(key, None)
+            if not bucket_keys:
+                del self._by_bucket[key[0]]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] <= now:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                best, best_score = None, self.threshold
+                bucket_keys = self._by_bucket.get(key[0], {})
+                for other in itertools.islice(reversed(bucket_keys), self.scan_limit):
+                    # Borne de Jaccard par les tailles : inutile d'intersecter si elle est trop basse
+                    if min(len(key[1]), len(other[1])) < best_score * max(len(key[1]), len(other[1])):
+                        continue
+                    score = len(key[1] & other[1]) / len(key[1] | other[1])
+                    if score >= best_score and self._entries[other]["expires"] > now:
+                        best, best_score = other, score
+                if best is None:
+                    self.stats["misses"] += 1
+                    return None
+                key, entry = best, self._entries[best]
+                self.stats["similar_hits"] += 1
+            self.stats["hits"] += 1
+            self._entries.move_to_end(key)
+            self._by_bucket[key[0]].move_to_end(key)
+            return entry["answer"]
+
+    def put(self, key, answer: str):
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = {"answer": answer, "expires": time.time() + self.ttl}
+            self._by_bucket.setdefault(key[0], OrderedDict())[key] = None
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
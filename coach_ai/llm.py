@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""Client OpenAI (Chat Completions) : plan, nutrition, suggestions et adaptation de plan."""
+
+import re
+import json
+import time
+import logging
+
+import requests
+
+from coach_ai.cache import LLM_CACHE_TTL, content_cache_key, get_shared_cache
+from coach_ai.nutrition import compute_calorie_targets
+from coach_ai.plans import plan_digest
+from coach_ai.resilience import CircuitOpenError, DeadlineExceededError, external_request, io_deadline
+
+logger = logging.getLogger(__name__)
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+# Début du message utilisateur, suivi du profil JSON (relu par le traitement batch hors ligne)
+PLAN_PROFILE_PREFIX = "Profil utilisateur: "
+NUTRITION_PROFILE_PREFIX = "Profil: "
+
+def build_plan_request(profile: dict) -> dict:
+    """Corps de requête Chat Completions pour la génération du plan d'entraînement."""
+    try:
+        jours_sem = int(profile.get("jours_sem") or 3)
+    except Exception:
+        jours_sem = 3
+    jours_sem = max(1, min(7, jours_sem))
+
+    system_prompt = (
+        "Tu es un coach sportif certifié professionnel.\n"
+        f"L'utilisateur souhaite s'entraîner **{jours_sem} jours par semaine**.\n\n"
+        "GENÈRE un plan d'entraînement personnalisé sur **7 jours** au format Markdown.\n"
+        "- Utilise des sections claires du type : **Jour X — Titre**.\n"
+        "- Pour chaque **jour d'entraînement** (il doit y en avoir exactement "
+        f"{jours_sem} sur 7) indique : durée, exercices (séries x reps) et RPE (1-10), "
+        "ainsi que des conseils de récupération.\n"
+        "- Pour les **jours de repos**, écris clairement : **Jour X — Repos complet** "
+        "et ne propose AUCUN exercice, AUCUNE activité physique, même pas de "
+        "« récupération active ».\n"
+        "- Respecte les blessures, le matériel disponible et le niveau de l'utilisateur."
+    )
+
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": PLAN_PROFILE_PREFIX + json.dumps(profile, ensure_ascii=False)}
+        ],
+        "max_tokens": 1000,
+        "temperature": 0.7
+    }
+
+def build_nutrition_request(profile: dict) -> dict:
+    """Corps de requête Chat Completions pour le plan nutritionnel sur 7 jours."""
+    calories, proteines, glucides, lipides, objectif = compute_calorie_targets(profile)
+
+    system_prompt = (
+        "Tu es un nutritionniste certifié.\n"
+        f"L'objectif principal déclaré est : {objectif}.\n"
+        f"Les cibles quotidiennes approximatives sont : {calories} kcal, "
+        f"{proteines} g de protéines, {glucides} g de glucides, {lipides} g de lipides.\n\n"
+        "Crée un **plan nutritionnel sur exactement 7 jours (Jour 1 à Jour 7)** "
+        "au format Markdown.\n"
+        "Pour CHAQUE jour, inclus :\n"
+        "- Petit-déjeuner\n- Dîner\n- Souper\n- 1 à 2 collations\n"
+        "- Un total calorique estimé pour la journée (proche des cibles, ±10%).\n"
+        "Utilise des intitulés clairs du type : `### Jour 1`, `### Jour 2`, ..., `### Jour 7`.\n"
+        "Assure-toi de ne PAS oublier le Jour 7."
+    )
+
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": NUTRITION_PROFILE_PREFIX + json.dumps(profile, ensure_ascii=False)}
+        ],
+        "max_tokens": 1500,
+        "temperature": 0.7
+    }
+
+# Sortie structurée imposée au modèle pour l'adaptation d'un plan
+PLAN_EDIT_SCHEMA = {
+    "name": "plan_edit",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "new_plan": {"type": "string"},
+            "summary": {"type": "string"},
+            "changed_days": {"type": "array", "items": {"type": "integer"}}
+        },
+        "required": ["new_plan", "summary", "changed_days"],
+        "additionalProperties": False
+    }
+}
+
+def build_edit_plan_request(instruction: str, plan_text: str, profile: dict) -> dict:
+    """Corps de requête Chat Completions pour l'adaptation d'un plan existant."""
+    system_prompt = (
+        "Tu es un coach certifié. Tu reçois un plan d'entraînement en Markdown "
+        "et une instruction de modification. Adapte le plan selon l'instruction "
+        "en gardant le format (jours, exercices, RPE). Respecte les contraintes. "
+        "Réponds STRICTEMENT en JSON: {\"new_plan\": \"\", \"summary\": \"\", \"changed_days\": []}"
+    )
+
+    user_prompt = (
+        f"=== PROFIL ===\n{json.dumps(profile, ensure_ascii=False)}\n\n"
+        f"=== INSTRUCTION ===\n{instruction}\n\n"
+        f"=== PLAN ACTUEL ===\n{plan_text}\n\n"
+        "=== FORMAT SORTIE ===\n"
+        "{\"new_plan\": \"...\", \"summary\": \"...\", \"changed_days\": [1,2,3]}"
+    )
+
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "response_format": {"type": "json_schema", "json_schema": PLAN_EDIT_SCHEMA},
+        "max_tokens": 1400,
+        "temperature": 0.5
+    }
+
+def iter_stream_deltas(response, usage: dict = None):
+    """
+    Fragments de texte d'une réponse Chat Completions en streaming (SSE), dans le
+    budget d'E/S. Si `usage` est fourni, il reçoit la consommation de tokens.
+    """
+    deadline = io_deadline.get()
+    for line in response.iter_lines(decode_unicode=True):
+        if deadline is not None and time.monotonic() > deadline:
+            raise DeadlineExceededError("Budget d'E/S épuisé pendant la réception de la réponse")
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        if usage is not None and chunk.get("usage"):
+            usage.update(chunk["usage"])
+        if not chunk.get("choices"):
+            continue
+        delta = chunk["choices"][0]["delta"].get("content")
+        if delta:
+            yield delta
+
+def call_openai_plan(api_key: str, profile: dict, use_cache: bool = True) -> str:
+    """
+    Génère un plan d'entraînement via OpenAI en respectant le nb de séances/semaine.
+
+    Les réponses sont partagées entre répliques pour une même requête ;
+    `use_cache=False` force une nouvelle génération (qui remplace l'entrée).
+    """
+    try:
+        if not api_key or not api_key.startswith("sk-"):
+            logger.warning("Invalid API key for plan generation")
+            return ""
+
+        url = OPENAI_CHAT_URL
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+        body = build_plan_request(profile)
+        cache_key = content_cache_key(body)
+
+        def generate():
+            logger.info("Calling OpenAI API for workout plan")
+            response = external_request("openai", "POST", url, timeout=60, headers=headers, json=body)
+
+            if response.status_code == 200:
+                data = response.json()
+                plan = data["choices"][0]["message"]["content"]
+                logger.info("Plan generated successfully")
+                return plan
+            else:
+                logger.error(f"OpenAI API error: {response.status_code}")
+                return None
+
+        cache = get_shared_cache()
+        if not use_cache:
+            plan = generate()
+            if plan:
+                cache.set("llm-plan", cache_key, plan, LLM_CACHE_TTL)
+            return plan or ""
+        return cache.get_or_compute("llm-plan", cache_key, LLM_CACHE_TTL, generate, lease_timeout=90) or ""
+
+    except requests.exceptions.Timeout:
+        logger.error("OpenAI API timeout")
+        return ""
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        logger.warning(f"OpenAI plan skipped: {e}")
+        return ""
+    except Exception as e:
+        logger.error(f"OpenAI plan error: {str(e)}", exc_info=True)
+        return ""
+
+def call_openai_nutrition(api_key: str, profile: dict) -> str:
+    """Génère un plan nutritionnel via OpenAI sur 7 jours avec cibles caloriques."""
+    try:
+        if not api_key or not api_key.startswith("sk-"):
+            return ""
+
+        url = OPENAI_CHAT_URL
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+        body = build_nutrition_request(profile)
+
+        def generate():
+            logger.info("Calling OpenAI API for nutrition plan")
+            response = external_request("openai", "POST", url, timeout=60, headers=headers, json=body)
+
+            if response.status_code == 200:
+                return response.json()["choices"][0]["message"]["content"]
+            return None
+
+        return get_shared_cache().get_or_compute(
+            "llm-nutrition", content_cache_key(body), LLM_CACHE_TTL, generate, lease_timeout=90
+        ) or ""
+
+    except Exception as e:
+        logger.error(f"OpenAI nutrition error: {str(e)}")
+        return ""
+
+def call_openai_exercise_suggestion(api_key: str, request: str, profile: dict, current_plan: str) -> str:
+    """Propose des exercices de remplacement sans modifier le plan (demande confirmation)."""
+    if not api_key or not api_key.startswith("sk-"):
+        return "Configure une clé API OpenAI pour que je puisse analyser et proposer un remplacement précis."
+
+    url = "https://api.openai.com/v1/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    system_prompt = (
+        "Tu es un coach sportif professionnel.\n"
+        "L'utilisateur veut modifier un ou plusieurs exercices dans son plan d'entraînement.\n"
+        "Lis sa demande et PROPOSE 1 à 3 exercices de remplacement **concrets** "
+        "(nom, séries, répétitions, éventuellement charge ou RPE) qui soient équivalents.\n"
+        "Ne réécris PAS tout le plan, concentre-toi seulement sur les substitutions proposées.\n"
+        "À la fin, termine TOUJOURS par une question très claire du type :\n"
+        "\"Veux-tu que je mette à jour le plan avec ces changements ? Réponds par oui ou non.\""
+    )
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": (
+                f"Profil utilisateur:\n{json.dumps(profile, ensure_ascii=False, indent=2)}\n\n"
+                f"Plan actuel (extrait):\n{(current_plan or '')[:2000]}\n\n"
+                f"Demande de l'utilisateur :\n{request}"
+            )
+        }
+    ]
+
+    body = {
+        "model": "gpt-4o-mini",
+        "messages": messages,
+        "max_tokens": 700,
+        "temperature": 0.6
+    }
+
+    try:
+        logger.info("Calling OpenAI for exercise suggestion (no plan update yet)")
+        response = external_request("openai", "POST", url, timeout=60, headers=headers, json=body)
+        if response.status_code == 200:
+            return response.json()["choices"][0]["message"]["content"]
+        else:
+            logger.error(f"OpenAI exercise suggestion error: {response.status_code}")
+            return "Je n'ai pas pu générer une suggestion d'exercice pour le moment."
+    except Exception as e:
+        logger.error(f"Exercise suggestion error: {e}")
+        return f"Erreur lors de la suggestion d'exercice : {e}"
+
+def extract_json_block(text: str):
+    """Extrait le premier objet JSON valide d'une réponse texte (avec ou sans ```json)."""
+    if not text:
+        return None
+    decoder = json.JSONDecoder()
+    fence = re.search(r"```json\s*", text, flags=re.IGNORECASE)
+    start = text.find("{", fence.end() if fence else 0)
+    # Les accolades de la prose sont ignorées : on essaie chaque « { » jusqu'à un objet valide
+    while start != -1:
+        try:
+            obj, _ = decoder.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+class JsonStreamScanner:
+    """
+    Validation incrémentale d'un objet JSON reçu par fragments.
+
+    Suit la structure (chaînes, échappements, imbrication) sans jamais relire le
+    texte déjà reçu. `feed` lève ValueError dès qu'un caractère rend la réponse
+    inexploitable et retourne True quand l'objet racine est complet.
+    """
+
+    _BARE_CHARS = frozenset("0123456789+-.eEtrufalsn:, \t\r\n")
+    _FENCE = "```json"
+
+    def __init__(self):
+        self._parts = []
+        self._stack = []
+        self._prefix = ""
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self.complete = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.complete:
+            return True
+        start = 0
+        for i, ch in enumerate(chunk):
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append("}")
+                    start = i
+                elif not ch.isspace():
+                    self._prefix += ch.lower()
+                    if not self._FENCE.startswith(self._prefix):
+                        raise ValueError(f"réponse non JSON (début {self._prefix[:20]!r})")
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                self._stack.append("}" if ch == "{" else "]")
+            elif ch == "}" or ch == "]":
+                if self._stack.pop() != ch:
+                    raise ValueError(f"fermeture {ch!r} inattendue")
+                if not self._stack:
+                    self._parts.append(chunk[start:i + 1])
+                    self.complete = True
+                    return True
+            elif ch not in self._BARE_CHARS:
+                raise ValueError(f"caractère {ch!r} inattendu hors chaîne")
+        if self._started:
+            self._parts.append(chunk[start:])
+        return False
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+def ai_edit_plan(api_key: str, instruction: str, plan_text: str, profile: dict) -> dict:
+    """Adapte le plan complet avec l'IA"""
+    if not api_key or not api_key.startswith("sk-"):
+        return {"ok": False, "new_plan": "", "summary": "Pas de clé API."}
+    
+    try:
+        url = OPENAI_CHAT_URL
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        body = build_edit_plan_request(instruction, plan_text, profile)
+        status = {}
+        
+        def generate():
+            logger.info(f"Calling AI edit plan: {instruction[:50]}...")
+            stream_body = dict(body, stream=True, stream_options={"include_usage": True})
+            response = external_request(
+                "openai", "POST", url, timeout=60, headers=headers, json=stream_body, stream=True
+            )
+            status["code"] = response.status_code
+            if response.status_code != 200:
+                response.close()
+                return None
+            # Validation au fil de l'eau : une sortie malformée interrompt la réception ;
+            # après l'objet racine, seuls les derniers fragments (fin, consommation) sont lus
+            scanner = JsonStreamScanner()
+            usage = status["usage"] = {}
+            try:
+                for delta in iter_stream_deltas(response, usage):
+                    scanner.feed(delta)
+            except ValueError as e:
+                logger.warning(f"AI edit plan stream aborted: {e}")
+                status["malformed"] = True
+                return None
+            finally:
+                response.close()
+            obj = extract_json_block(scanner.text()) if scanner.complete else None
+            if obj is None:
+                status["malformed"] = True
+            return obj
+        
+        # Réponse partagée pour un même plan (empreinte) et une même demande
+        cache_key = f"{plan_digest(plan_text)}:{content_cache_key(body)}"
+        obj = get_shared_cache().get_or_compute("llm-edit", cache_key, LLM_CACHE_TTL, generate, lease_timeout=90)
+        
+        # Consommation de tokens de cet appel (vide si la réponse venait du cache)
+        usage = status.get("usage", {})
+        if obj is None:
+            if status.get("malformed"):
+                return {"ok": False, "new_plan": "", "summary": "Réponse modèle non exploitable.", "usage": usage}
+            return {"ok": False, "new_plan": "", "summary": f"Erreur API: {status.get('code')}", "usage": usage}
+        
+        new_plan = obj.get("new_plan", "").strip()
+        summary = obj.get("summary", "").strip()
+        
+        if new_plan and ("Jour 1" in new_plan or "Day 1" in new_plan):
+            logger.info("Plan adapted successfully")
+            return {"ok": True, "new_plan": new_plan, "summary": summary or "Plan adapté.", "usage": usage}
+        
+        return {"ok": False, "new_plan": "", "summary": "Réponse modèle non exploitable.", "usage": usage}
+        
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        logger.warning(f"AI edit plan skipped: {e}")
+        return {"ok": False, "new_plan": "", "summary": str(e)}
+    except Exception as e:
+        logger.error(f"AI edit plan error: {str(e)}", exc_info=True)
+        return {"ok": False, "new_plan": "", "summary": f"Erreur: {str(e)}"}
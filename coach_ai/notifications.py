@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Envoi de messages WhatsApp Business (Graph API) avec identifiants explicites."""
+
+import json
+import logging
+
+from coach_ai.resilience import external_request
+
+logger = logging.getLogger(__name__)
+
+WHATSAPP_API_VERSION = "v18.0"
+
+def _post_whatsapp_message(phone_id: str, token: str, version: str, data: dict) -> bool:
+    url = f"https://graph.facebook.com/{version or WHATSAPP_API_VERSION}/{phone_id}/messages"
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token}"
+    }
+    response = external_request("whatsapp", "POST", url, timeout=30, headers=headers, data=json.dumps(data))
+    if response.status_code != 200:
+        logger.error(f"WhatsApp API error: {response.status_code}")
+    return response.status_code == 200
+
+def send_whatsapp_text_message(to_number: str, message: str, phone_id: str, token: str,
+                               version: str = WHATSAPP_API_VERSION) -> bool:
+    """Envoie un message texte ; les erreurs réseau sont propagées à l'appelant."""
+    data = {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": to_number,
+        "type": "text",
+        "text": {"preview_url": False, "body": message}
+    }
+    logger.info(f"Sending WhatsApp message to {to_number[:4]}***")
+    sent = _post_whatsapp_message(phone_id, token, version, data)
+    if sent:
+        logger.info("WhatsApp message sent successfully")
+    return sent
+
+def send_whatsapp_template_message(to_number: str, template_name: str, phone_id: str, token: str,
+                                   version: str = WHATSAPP_API_VERSION, template_params: list = None) -> bool:
+    """Envoie un message template (langue fr) ; les erreurs réseau sont propagées à l'appelant."""
+    components = []
+    if template_params:
+        parameters = [{"type": "text", "text": str(param)} for param in template_params]
+        components.append({"type": "body", "parameters": parameters})
+
+    data = {
+        "messaging_product": "whatsapp",
+        "to": to_number,
+        "type": "template",
+        "template": {
+            "name": template_name,
+            "language": {"code": "fr"},
+            "components": components
+        }
+    }
+    logger.info(f"Sending WhatsApp template '{template_name}'")
+    return _post_whatsapp_message(phone_id, token, version, data)
+
+def validate_phone_number(phone: str) -> bool:
+    """Valide un numéro de téléphone"""
+    if not phone or not phone.isdigit():
+        return False
+    return 10 <= len(phone) <= 15
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Cibles caloriques et macros (scalaire et vectorisé) et plan nutritionnel de repli."""
+
+from string import Template
+
+import numpy as np
+
+# Facteurs d'activité (hors entraînements) appliqués au métabolisme de base
+ACTIVITY_FACTORS = {
+    "Peu actif (Travail de bureau)": 1.2,
+    "Modérément actif (Marche régulière)": 1.4,
+    "Actif (Travail physique)": 1.6,
+    "Très actif (Sports fréquents)": 1.8
+}
+
+def objective_calorie_adjustment(objectif: str) -> int:
+    """Ajustement calorique (kcal) selon le libellé de l'objectif principal."""
+    obj_lower = (objectif or "").lower()
+    if "perte" in obj_lower:
+        return -400
+    if "masse" in obj_lower or "gain" in obj_lower:
+        return 400
+    return 0
+
+def _lookup_by_category(values, mapping) -> np.ndarray:
+    """Applique `mapping` une seule fois par valeur distincte puis diffuse le résultat."""
+    values = np.asarray(values, dtype=str)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    mapped = np.array([mapping(v) for v in uniques])
+    return mapped[inverse.reshape(values.shape)]
+
+def compute_calorie_targets_batch(poids, taille, age, sexe, activite, objectif) -> dict:
+    """
+    Calcule les cibles caloriques et macros pour un ensemble de profils en colonnes.
+
+    Chaque argument est un tableau (ou une séquence) de même longueur. Les libellés
+    (sexe, activité, objectif) sont résolus une fois par valeur distincte, le reste
+    est entièrement vectorisé avec NumPy. Résultats identiques à compute_calorie_targets.
+    """
+    poids = np.asarray(poids, dtype=np.float64)
+    taille = np.asarray(taille, dtype=np.float64)
+    age = np.trunc(np.asarray(age, dtype=np.float64))
+
+    sexe_offset = np.where(np.asarray(sexe, dtype=str) == "Homme", 5.0, -161.0)
+    bmr = 10 * poids + 6.25 * taille - 5 * age + sexe_offset
+
+    facteur_act = _lookup_by_category(activite, lambda a: ACTIVITY_FACTORS.get(a, 1.4))
+    calories = np.trunc(bmr * facteur_act).astype(np.int64)
+    calories += _lookup_by_category(objectif, objective_calorie_adjustment).astype(np.int64)
+
+    return {
+        "calories": calories,
+        "proteines": np.rint(poids * 1.8).astype(np.int64),
+        "glucides": np.rint((calories * 0.5) / 4).astype(np.int64),
+        "lipides": np.rint((calories * 0.25) / 9).astype(np.int64),
+    }
+
+def profiles_to_calorie_columns(profiles: list) -> dict:
+    """Convertit une liste de profils (dicts du questionnaire) en colonnes avec les valeurs par défaut."""
+    columns = {"poids": [], "taille": [], "age": [], "sexe": [], "activite": [], "objectif": []}
+    for profile in profiles:
+        columns["poids"].append(float(profile.get("poids_kg", 70) or 70))
+        columns["taille"].append(float(profile.get("taille_cm", 175) or 175))
+        columns["age"].append(int(profile.get("age", 30) or 30))
+        columns["sexe"].append(profile.get("sexe", "Homme") or "Homme")
+        columns["activite"].append(profile.get("activite", "Modérément actif") or "Modérément actif")
+        columns["objectif"].append(profile.get("objectif_principal", "Condition générale") or "Condition générale")
+    return columns
+
+def compute_calorie_targets(profile: dict):
+    """Calcule l'apport calorique et macros cibles en fonction du profil."""
+    columns = profiles_to_calorie_columns([profile])
+    targets = compute_calorie_targets_batch(**columns)
+
+    return (
+        int(targets["calories"][0]),
+        int(targets["proteines"][0]),
+        int(targets["glucides"][0]),
+        int(targets["lipides"][0]),
+        columns["objectif"][0]
+    )
+
+_FALLBACK_NUTRITION_INTRO = Template("""**Plan nutritionnel — Objectif : ${objectif}**
+
+🔹 Apport cible : **${calories} kcal / jour**  
+🔹 Répartition macros (approx.) :  
+- Protéines : ${proteines} g  
+- Glucides : ${glucides} g  
+- Lipides : ${lipides} g  
+
+Ce plan propose 7 jours avec des menus variés mais équilibrés, autour de ces cibles.
+""")
+
+_FALLBACK_NUTRITION_DAY = """
+---
+
+### Jour ${day}
+
+**Petit-déjeuner** (~$${petit_dejeuner} kcal)  
+- Avoine (60g) avec fruits rouges  
+- Yogourt grec (150g)  
+- 1 fruit (pomme ou banane)  
+
+**Dîner** (~$${diner} kcal)  
+- Source de protéine (poulet, tofu ou poisson, 120-150g)  
+- Féculent complet (riz brun, quinoa, pâtes de blé entier ~80-100g crus)  
+- Légumes variés (brocoli, carottes, salade)  
+- 1 c. à soupe d'huile d'olive  
+
+**Souper** (~$${souper} kcal)  
+- Source de protéine (saumon, légumineuses, tempeh, etc. 120-150g)  
+- Légumes cuits ou crus  
+- Portion modérée de féculents (riz, pommes de terre, etc.)  
+
+**Collations** (~$${collations} kcal au total)  
+- 1 poignée d'amandes ou noix (20-30g)  
+- 1 yogourt ou un petit shake protéiné  
+- 1 fruit
+
+**Total cible** : ~$${calories} kcal (±10%)  
+"""
+
+# Les 7 jours sont pré-assemblés une seule fois : un rendu = une seule substitution
+_FALLBACK_NUTRITION_WEEK = Template("\n".join(
+    Template(_FALLBACK_NUTRITION_DAY).substitute(day=i) for i in range(1, 8)
+))
+
+_FALLBACK_NUTRITION_TIPS = """
+---
+
+💧 **Hydratation :** 2-3 L d'eau par jour  
+🚫 **À limiter :** sucres ajoutés, aliments ultra-transformés, alcool en excès  
+✅ **À privilégier :** aliments entiers, protéines maigres, légumes, fruits frais, fibres  
+"""
+
+def fallback_nutrition(profile: dict) -> str:
+    """Génère un plan nutritionnel simple sur 7 jours avec les bons apports."""
+    calories, proteines, glucides, lipides, objectif = compute_calorie_targets(profile)
+
+    base_intro = _FALLBACK_NUTRITION_INTRO.substitute(
+        objectif=objectif, calories=calories,
+        proteines=proteines, glucides=glucides, lipides=lipides
+    )
+    jours = _FALLBACK_NUTRITION_WEEK.substitute(
+        petit_dejeuner=int(0.25 * calories),
+        diner=int(0.3 * calories),
+        souper=int(0.3 * calories),
+        collations=int(0.15 * calories),
+        calories=calories
+    )
+
+    return base_intro + jours + _FALLBACK_NUTRITION_TIPS
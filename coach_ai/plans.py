@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""Plans d'entraînement : empreinte, analyse du Markdown par jour et plans de repli."""
+
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import functools
+from string import Template
+
+from coach_ai.config import get_config_value
+from coach_ai.profile import QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+def plan_digest(plan_text: str) -> str:
+    """Empreinte BLAKE2b du plan, stable entre processus et redémarrages (contrairement à hash())."""
+    return hashlib.blake2b(plan_text.encode("utf-8"), digest_size=16).hexdigest()
+
+def parse_workout_plan(plan_text: str) -> list:
+    """Parse le plan pour extraire les sessions par jour"""
+    sessions = []
+    
+    if not plan_text or not isinstance(plan_text, str) or not plan_text.strip():
+        logger.warning("Plan text is empty or invalid")
+        return sessions
+    
+    lines = plan_text.splitlines()
+    logger.info(f"Parsing plan with {len(lines)} lines")
+    
+    patterns = [
+        re.compile(r'^\s*\*\*\s*(?:Jour|Day|JOUR|DAY)\s+(\d+)\s*(?:[:\-–—]\s*(.*))?\s*\*\*\s*$', re.IGNORECASE),
+        re.compile(r'^\s*(?:Jour|Day|JOUR|DAY)\s+(\d+)\s*(?:[:\-–—]\s*(.*))?\s*$', re.IGNORECASE),
+        re.compile(r'^\s*#{1,6}\s*(?:Jour|Day|JOUR|DAY)\s+(\d+)\s*(?:[:\-–—]\s*(.*))?\s*$', re.IGNORECASE),
+    ]
+    
+    current_day = None
+    current_title = None
+    current_description = []
+    
+    for line_num, line in enumerate(lines, 1):
+        line_stripped = line.strip()
+        
+        if not line_stripped:
+            continue
+        
+        matched = False
+        for pattern in patterns:
+            match = pattern.match(line_stripped)
+            if match:
+                matched = True
+                
+                if current_day is not None:
+                    desc = "\n".join(current_description).strip()
+                    sessions.append({
+                        "day": current_day,
+                        "title": current_title or "Entraînement",
+                        "description": desc[:500] if desc else "Séance d'entraînement"
+                    })
+                    logger.debug(f"Saved session Day {current_day}: {current_title}")
+                
+                current_day = int(match.group(1))
+                current_title = (match.group(2) or "Entraînement").strip() if match.lastindex and match.group(2) else "Entraînement"
+                current_description = []
+                logger.info(f"Line {line_num}: Found Day {current_day} - {current_title}")
+                break
+        
+        if matched:
+            continue
+        
+        if current_day is not None:
+            if not re.match(r'^[\*\-=_#]{3,}$', line_stripped):
+                if len(current_description) < 20:
+                    current_description.append(line_stripped)
+    
+    if current_day is not None:
+        desc = "\n".join(current_description).strip()
+        sessions.append({
+            "day": current_day,
+            "title": current_title or "Entraînement",
+            "description": desc[:500] if desc else "Séance d'entraînement"
+        })
+        logger.debug(f"Saved final session Day {current_day}: {current_title}")
+    
+    logger.info(f"✅ Parsed {len(sessions)} total sessions from plan")
+    
+    for session in sessions:
+        logger.info(f" → Jour {session['day']}: {session['title']}")
+    
+    if len(sessions) == 0:
+        logger.warning("No sessions found with standard patterns, trying basic parsing")
+        for line in lines:
+            if re.search(r'(?:jour|day)\s*(\d+)', line, re.IGNORECASE):
+                match = re.search(r'(?:jour|day)\s*(\d+)', line, re.IGNORECASE)
+                day_num = int(match.group(1))
+                sessions.append({
+                    "day": day_num,
+                    "title": f"Jour {day_num}",
+                    "description": line.strip()
+                })
+                logger.info(f" → Basic parse: Jour {day_num}")
+    
+    return sessions
+
+_FALLBACK_PLAN_HEADER = Template("""# Plan d'entraînement personnalisé
+
+**Niveau :** ${niveau}  
+**Objectif :** ${objectif}  
+**Fréquence :** ${jours} jours/semaine  
+**Durée par séance :** ${duree} min
+
+---
+""")
+
+_FALLBACK_TRAINING_DAY = Template("**Jour ${day} — ${title}**\n⏱ Durée: ${duree} min | 🔥 RPE: 6-7/10\n${exos}\n\n---\n")
+
+_FALLBACK_REST_DAY = Template(
+    "**Jour ${day} — Repos complet**\n"
+    "💤 Aucune séance prévue, concentre-toi sur le sommeil, l'hydratation et la récupération.\n"
+    "\n---\n"
+)
+
+_FALLBACK_PLAN_TIPS = "**Conseils généraux :**\n- Hydrate-toi bien avant, pendant et après\n- Écoute ton corps et ajuste l'intensité\n- Augmente progressivement la charge\n"
+
+_FALLBACK_SESSION_TEMPLATES = [
+    ("Full Body", [
+        "- Échauffement: 5-10 min cardio léger",
+        "- Squats: 3 x 10-12",
+        "- Pompes (sur genoux si nécessaire): 3 x 8-10",
+        "- Fentes: 3 x 10 (chaque jambe)",
+        "- Planche: 3 x 20-30 sec",
+        "- Retour au calme: étirements 5 min"
+    ]),
+    ("Cardio + Core", [
+        "- Échauffement: 5 min",
+        "- Intervalles cardio: 20-25 min (course/vélo/rameur)",
+        "- Crunches: 3 x 15",
+        "- Mountain climbers: 3 x 20 sec",
+        "- Russian twists: 3 x 15",
+        "- Étirements: 5 min"
+    ]),
+    ("Force haut du corps", [
+        "- Échauffement: 5-10 min",
+        "- Développé couché ou pompes: 3 x 8-10",
+        "- Rowing: 3 x 10-12",
+        "- Élévations latérales: 3 x 12-15",
+        "- Gainage: 3 x 30 sec",
+        "- Étirements: 5 min"
+    ])
+]
+
+# Marqueur remplacé par l'objectif (texte libre) au moment de la recherche
+_OBJECTIF_MARKER = "\x00objectif\x00"
+
+# Fichier de la bibliothèque pré-calculée (relatif au dossier courant) ; la CLI le désactive par défaut
+FALLBACK_LIBRARY_PATH = get_config_value("FALLBACK_LIBRARY_PATH", "fallback_library.json.gz")
+_fallback_library_path = FALLBACK_LIBRARY_PATH
+
+# La version change automatiquement dès qu'un gabarit est modifié
+FALLBACK_LIBRARY_VERSION = hashlib.sha1(json.dumps([
+    _FALLBACK_PLAN_HEADER.template, _FALLBACK_TRAINING_DAY.template,
+    _FALLBACK_REST_DAY.template, _FALLBACK_PLAN_TIPS, _FALLBACK_SESSION_TEMPLATES
+], ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+def _render_fallback_plan_parts(niveau: str, jours: int, duree: int) -> list:
+    """Rend le plan de repli et le coupe autour de l'objectif : [avant, après]."""
+    blocks = [_FALLBACK_PLAN_HEADER.substitute(
+        niveau=niveau, objectif=_OBJECTIF_MARKER, jours=jours, duree=duree
+    )]
+
+    for day in range(1, 8):
+        if day <= jours:
+            title, exos = _FALLBACK_SESSION_TEMPLATES[(day - 1) % len(_FALLBACK_SESSION_TEMPLATES)]
+            blocks.append(_FALLBACK_TRAINING_DAY.substitute(
+                day=day, title=title, duree=duree, exos="\n".join(exos)
+            ))
+        else:
+            blocks.append(_FALLBACK_REST_DAY.substitute(day=day))
+
+    blocks.append(_FALLBACK_PLAN_TIPS)
+    return "\n".join(blocks).split(_OBJECTIF_MARKER, 1)
+
+def _fallback_plan_key(niveau: str, jours: int, duree: int) -> str:
+    return f"{niveau}|{jours}|{duree}"
+
+def set_fallback_library_path(path: str = None):
+    """Choisit le fichier de la bibliothèque de repli ; None la garde en mémoire sans rien écrire."""
+    global _fallback_library_path
+    _fallback_library_path = path or None
+
+def build_fallback_library(path: str = FALLBACK_LIBRARY_PATH) -> dict:
+    """
+    Pré-calcule tous les plans de repli (niveau x jours/sem x durée par pas de 5 min)
+    et les enregistre dans un fichier JSON compressé (sauf si `path` est None).
+    """
+    niveaux = next(q["options"] for q in QUESTIONS if q["key"] == "niveau_exp")
+    duree_q = next(q for q in QUESTIONS if q["key"] == "duree_min")
+
+    plans = {}
+    for niveau in niveaux:
+        for jours in range(1, 8):
+            for duree in range(duree_q["min"], duree_q["max"] + 1, duree_q["step"]):
+                plans[_fallback_plan_key(niveau, jours, duree)] = _render_fallback_plan_parts(niveau, jours, duree)
+
+    library = {"version": FALLBACK_LIBRARY_VERSION, "plans": plans}
+    if not path:
+        logger.info(f"Fallback library built in memory: {len(plans)} plans")
+        return library
+
+    try:
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(library, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        logger.info(f"Fallback library built: {len(plans)} plans -> {path}")
+    except OSError as e:
+        logger.warning(f"Fallback library not persisted: {e}")
+
+    return library
+
+@functools.lru_cache(maxsize=None)
+def load_fallback_library(path: str = FALLBACK_LIBRARY_PATH) -> dict:
+    """Charge la bibliothèque de repli depuis le disque (ou la reconstruit si absente/obsolète)."""
+    if not path:
+        return build_fallback_library(None)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            library = json.load(f)
+        if library.get("version") == FALLBACK_LIBRARY_VERSION:
+            logger.info(f"Fallback library loaded: {len(library['plans'])} plans")
+            return library
+        logger.info("Fallback library outdated, rebuilding")
+    except (OSError, ValueError):
+        logger.info("Fallback library missing, building")
+    return build_fallback_library(path)
+
+def fallback_plan(profile: dict) -> str:
+    """Génère un plan d'entraînement basique sur 7 jours en respectant jours_sem."""
+    niveau = profile.get("niveau_exp", "Débutant") or "Débutant"
+    try:
+        jours = int(profile.get("jours_sem", 3) or 3)
+    except Exception:
+        jours = 3
+    jours = max(1, min(7, jours))
+
+    duree = int(profile.get("duree_min", 45) or 45)
+    objectif = profile.get("objectif_principal", "Condition générale") or "Condition générale"
+
+    parts = load_fallback_library(_fallback_library_path)["plans"].get(_fallback_plan_key(niveau, jours, duree))
+    if parts is None:
+        # Combinaison hors bibliothèque (ex. durée hors pas de 5 min) : rendu direct
+        parts = _render_fallback_plan_parts(niveau, jours, duree)
+
+    return parts[0] + objectif + parts[1]
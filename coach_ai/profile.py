@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Questionnaire du profil athlète et chargement de profils depuis un fichier (CSV/JSONL)."""
+
+import io
+import re
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS = [
+    {"key":"age","label":"Quel est ton âge?","type":"number","min":13,"max":100},
+    {"key":"sexe","label":"Quel est ton sexe?","type":"select","options":["Homme","Femme","Autre / Préfère ne pas dire"]},
+    {"key":"taille_cm","label":"Quelle est ta taille (en cm)?","type":"number","min":120,"max":220},
+    {"key":"poids_kg","label":"Quel est ton poids (en kg)?","type":"number","min":35,"max":220},
+    {"key":"niveau_exp","label":"Quel est ton niveau d'expérience en entraînement?","type":"select",
+     "options":["Débutant","Intermédiaire","Avancé","Expert"]},
+    {"key":"blessures","label":"As-tu actuellement des blessures ou des limitations physiques?","type":"text",
+     "help":"Indique toute blessure pour qu'on adapte les exercices"},
+    {"key":"sante","label":"As-tu des problèmes de santé connus (asthme, hypertension, diabète, etc.)?","type":"text"},
+    {"key":"activite","label":"Quel est ton niveau d'activité physique au quotidien (hors entraînements)?","type":"select",
+     "options":["Peu actif (Travail de bureau)","Modérément actif (Marche régulière)",
+                "Actif (Travail physique)","Très actif (Sports fréquents)"]},
+    {"key":"objectif_principal","label":"Quel est ton objectif principal d'entraînement?","type":"text",
+     "help":"Sois précis: perte de poids, gain musculaire, endurance, force..."},
+    {"key":"objectif_secondaire","label":"As-tu un objectif secondaire?","type":"text","help":"Optionnel"},
+    {"key":"horizon","label":"Dans combien de temps veux-tu atteindre ton objectif principal?","type":"select",
+     "options":["3 mois","6 mois","1 an","Plus d'un an"]},
+    {"key":"motivation","label":"Quel est ton niveau de motivation sur 10?","type":"slider","min":1,"max":10},
+    {"key":"types_exos","label":"Quel type d'exercices préfères-tu?","type":"multiselect",
+     "options":["Musculation","Cardio (course, vélo...)","HIIT (haute intensité)",
+                "Sports collectifs","Yoga / Pilates","Natation","Autre"]},
+    {"key":"jours_sem","label":"Combien de jours par semaine veux-tu t'entraîner?","type":"slider","min":1,"max":7},
+    {"key":"duree_min","label":"Combien de temps veux-tu consacrer à chaque séance (en min)?","type":"slider",
+     "min":15,"max":120,"step":5},
+    {"key":"moment","label":"À quel moment de la journée préfères-tu t'entraîner?","type":"select",
+     "options":["Matin (6h-10h)","Midi (11h-14h)","Après-midi (15h-18h)","Soir / Nuit (19h+)"]},
+    {"key":"lieu","label":"Préfères-tu t'entraîner à l'intérieur ou dehors?","type":"select",
+     "options":["Intérieur (gym, maison)","Extérieur (parc, rue...)","Peu importe"]},
+    {"key":"materiel","label":"Quel matériel d'entraînement as-tu à ta disposition?","type":"text",
+     "help":"Liste le matériel disponible"},
+    {"key":"sommeil_h","label":"Combien d'heures dors-tu en moyenne par nuit?","type":"slider","min":4.0,"max":12.0,"step":0.5},
+    {"key":"ville","label":"Dans quelle ville t'entraînes-tu (pour la météo)?","type":"text"},
+    {"key":"nutrition","label":"Souhaites-tu recevoir des conseils de nutrition et/ou de récupération?","type":"select",
+     "options":["Oui, absolument","Oui, si possible","Non merci"]},
+]
+
+TOTAL_Q = len(QUESTIONS)
+QUESTIONS_BY_KEY = {q["key"]: q for q in QUESTIONS}
+
+def profile_from_answers(answers: dict) -> dict:
+    """Profil envoyé au modèle : toutes les questions, dans l'ordre du questionnaire (None si sans réponse)."""
+    return {q["key"]: answers.get(q["key"]) for q in QUESTIONS}
+
+def _coerce_answer(q: dict, raw):
+    """Convertit une valeur brute (CSV/JSONL) selon le type de question."""
+    if raw is None or raw == "":
+        return None
+    t = q["type"]
+    try:
+        if t in ("number", "slider"):
+            value = float(raw)
+            return int(value) if value.is_integer() and isinstance(q.get("step", 1), int) else value
+        if t == "multiselect":
+            if isinstance(raw, list):
+                return raw
+            return [v.strip() for v in re.split(r"[;|]", str(raw)) if v.strip()]
+    except (TypeError, ValueError):
+        return None
+    return raw
+
+def load_roster_profiles(data: bytes, filename: str) -> list:
+    """
+    Charge un effectif d'athlètes depuis un fichier CSV, JSONL ou JSON (un profil
+    ou une liste de profils).
+
+    Les colonnes reconnues sont les clés de QUESTIONS ; l'identifiant est lu dans
+    `athlete_id`, `id` ou `nom`, sinon il est généré à partir du numéro de ligne.
+    """
+    text = data.decode("utf-8-sig")
+
+    if filename.lower().endswith((".jsonl", ".ndjson")):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif filename.lower().endswith(".json"):
+        loaded = json.loads(text)
+        rows = loaded if isinstance(loaded, list) else [loaded]
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    profiles = []
+    for i, row in enumerate(rows, 1):
+        profile = {q["key"]: _coerce_answer(q, row.get(q["key"])) for q in QUESTIONS}
+        athlete_id = row.get("athlete_id") or row.get("id") or row.get("nom") or f"athlete-{i}"
+        profile["athlete_id"] = str(athlete_id)
+        profiles.append(profile)
+
+    logger.info(f"Roster loaded: {len(profiles)} profiles from {filename}")
+    return profiles
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Appels HTTP externes : disjoncteurs par dépendance et budget d'E/S par exécution."""
+
+import time
+import logging
+import functools
+import threading
+import contextlib
+import contextvars
+
+import requests
+
+from coach_ai.config import get_config_value
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Appel refusé immédiatement : le disjoncteur de la dépendance est ouvert."""
+
+class DeadlineExceededError(Exception):
+    """Appel refusé : le budget d'E/S de l'exécution en cours est épuisé."""
+
+class CircuitBreaker:
+    """
+    Disjoncteur par dépendance externe (fermé / ouvert / semi-ouvert).
+
+    Après `failure_threshold` échecs consécutifs, les appels échouent immédiatement
+    pendant `reset_timeout` secondes ; un seul appel d'essai est ensuite autorisé
+    et referme le disjoncteur s'il réussit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Indique si un appel peut partir maintenant."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_in(self) -> int:
+        """Secondes restantes avant le prochain appel d'essai."""
+        return max(0, int(self.reset_timeout - (time.monotonic() - self.opened_at)))
+
+@functools.lru_cache(maxsize=None)
+def get_circuit_breakers() -> dict:
+    """Disjoncteurs partagés par toutes les sessions du processus."""
+    return {
+        "openai": CircuitBreaker("openai", failure_threshold=3, reset_timeout=60.0),
+        "open-meteo": CircuitBreaker("open-meteo", failure_threshold=3, reset_timeout=30.0),
+        "whatsapp": CircuitBreaker("whatsapp", failure_threshold=3, reset_timeout=60.0),
+    }
+
+# Temps total maximal consacré aux E/S externes pendant une exécution du script
+IO_BUDGET_SECONDS = float(get_config_value("IO_BUDGET_SECONDS", 30))
+# Budget propre à une action explicite de l'utilisateur (génération, chat) : couvre un plan
+# puis une nutrition (60 s chacun) dans la même exécution, quel que soit le budget déjà consommé
+ACTION_IO_BUDGET_SECONDS = float(get_config_value("ACTION_IO_BUDGET_SECONDS", 150))
+
+# Échéance de l'exécution courante ; les threads de travail (mode coach) n'en héritent pas
+io_deadline = contextvars.ContextVar("io_deadline", default=None)
+
+def start_io_budget(seconds: float = IO_BUDGET_SECONDS):
+    """Démarre le budget d'E/S de l'exécution courante du script."""
+    io_deadline.set(time.monotonic() + seconds)
+
+@contextlib.contextmanager
+def action_io_budget(seconds: float = ACTION_IO_BUDGET_SECONDS):
+    """Remplace le budget de l'exécution le temps d'une action déclenchée par l'utilisateur."""
+    token = io_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        io_deadline.reset(token)
+
+def remaining_io_budget(default: float) -> float:
+    """Secondes restantes dans le budget d'E/S courant (`default` hors budget)."""
+    deadline = io_deadline.get()
+    return default if deadline is None else max(0.0, deadline - time.monotonic())
+
+def external_request(dependency: str, method: str, url: str, timeout: float, **kwargs):
+    """
+    Effectue un appel HTTP protégé par le disjoncteur de `dependency` et borné
+    par le budget d'E/S restant. Lève CircuitOpenError / DeadlineExceededError
+    sans attendre lorsque l'appel ne peut pas aboutir.
+    """
+    deadline = io_deadline.get()
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0.1:
+            raise DeadlineExceededError(f"Budget d'E/S épuisé, appel {dependency} ignoré")
+        timeout = min(timeout, remaining)
+
+    breaker = get_circuit_breakers()[dependency]
+    if not breaker.allow():
+        raise CircuitOpenError(
+            f"Service {dependency} temporairement indisponible (nouvel essai dans {breaker.retry_in()} s)"
+        )
+
+    try:
+        response = requests.request(method, url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Mode coach : génération en masse des plans d'un effectif (pool borné, débit plafonné, reprise)."""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from coach_ai.config import get_config_value
+from coach_ai.llm import call_openai_nutrition, call_openai_plan
+from coach_ai.nutrition import fallback_nutrition
+from coach_ai.plans import fallback_plan
+
+logger = logging.getLogger(__name__)
+
+# Débit maximal autorisé vers l'API OpenAI (requêtes/minute) et taille du pool
+OPENAI_RPM = int(get_config_value("OPENAI_RPM", 60))
+ROSTER_MAX_WORKERS = int(get_config_value("ROSTER_MAX_WORKERS", 8))
+ROSTER_CHECKPOINT_DIR = get_config_value("ROSTER_CHECKPOINT_DIR", "roster_checkpoints")
+
+class RateLimiter:
+    """Limiteur de débit partagé entre threads (espacement minimal entre deux appels)."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / max(1, per_minute)
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloque jusqu'au prochain créneau disponible."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+def read_roster_checkpoint(path: str) -> dict:
+    """Relit un fichier de reprise JSONL (athlete_id -> résultat)."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                done[record["athlete_id"]] = record
+            except (json.JSONDecodeError, KeyError):
+                # Ligne tronquée par une interruption : elle sera régénérée
+                continue
+    return done
+
+def _generate_athlete_bundle(api_key: str, profile: dict, limiter: RateLimiter, include_nutrition: bool) -> dict:
+    """Génère plan (+ nutrition) pour un athlète, avec repli local en cas d'échec."""
+    prompt_profile = {k: v for k, v in profile.items() if k != "athlete_id"}
+    source = "openai"
+
+    plan = ""
+    if api_key:
+        limiter.acquire()
+        plan = call_openai_plan(api_key, prompt_profile)
+    if not plan:
+        plan = fallback_plan(prompt_profile)
+        source = "fallback"
+
+    nutrition = None
+    if include_nutrition:
+        if api_key:
+            limiter.acquire()
+            nutrition = call_openai_nutrition(api_key, prompt_profile)
+        if not nutrition:
+            nutrition = fallback_nutrition(prompt_profile)
+            source = "fallback"
+
+    return {
+        "athlete_id": profile["athlete_id"],
+        "plan": plan,
+        "nutrition": nutrition,
+        "source": source,
+        "generated_at": dt.datetime.now().isoformat(timespec="seconds")
+    }
+
+def generate_roster_plans(api_key: str, profiles: list, checkpoint_path: str,
+                          max_workers: int = ROSTER_MAX_WORKERS, rpm: int = OPENAI_RPM,
+                          include_nutrition: bool = True, progress_callback=None) -> list:
+    """
+    Génère en masse les plans d'un effectif via un pool de threads borné.
+
+    Le débit est plafonné par un limiteur partagé (rpm) ; chaque résultat est ajouté
+    au fichier de reprise dès qu'il est disponible, et les athlètes déjà présents
+    dans ce fichier ne sont pas régénérés.
+    """
+    done = read_roster_checkpoint(checkpoint_path)
+    todo = [p for p in profiles if p["athlete_id"] not in done]
+    total = len(profiles)
+    completed = total - len(todo)
+    logger.info(f"Roster generation: {len(todo)} to do, {completed} resumed from checkpoint")
+
+    if progress_callback:
+        progress_callback(completed, total, None)
+
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    limiter = RateLimiter(rpm)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(_generate_athlete_bundle, api_key, p, limiter, include_nutrition): p
+            for p in todo
+        }
+        for future in as_completed(futures):
+            profile = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                logger.error(f"Roster generation failed for {profile['athlete_id']}: {e}")
+                continue
+
+            checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            done[record["athlete_id"]] = record
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total, record)
+
+    return [done[p["athlete_id"]] for p in profiles if p["athlete_id"] in done]
+
+def roster_checkpoint_path(data: bytes) -> str:
+    """Chemin du fichier de reprise associé au contenu d'un fichier d'effectif."""
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    return os.path.join(ROSTER_CHECKPOINT_DIR, f"roster_{digest}.jsonl")
+
+class RosterRuns:
+    """
+    Générations d'effectif en arrière-plan, une au plus par fichier de reprise.
+
+    L'interface suit l'avancement en relisant le fichier de reprise ; les résultats
+    et leur charge JSONL à télécharger ne sont recalculés que si ce fichier a changé.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._errors = {}
+        self._results = {}
+
+    def start(self, api_key: str, profiles: list, checkpoint_path: str, **options) -> bool:
+        """Lance la génération hors du thread appelant ; False si elle est déjà en cours."""
+        with self._lock:
+            thread = self._threads.get(checkpoint_path)
+            if thread is not None and thread.is_alive():
+                return False
+            self._errors.pop(checkpoint_path, None)
+            thread = threading.Thread(
+                target=self._run, args=(api_key, list(profiles), checkpoint_path, options),
+                name="roster-generation", daemon=True
+            )
+            self._threads[checkpoint_path] = thread
+        thread.start()
+        return True
+
+    def _run(self, api_key: str, profiles: list, checkpoint_path: str, options: dict):
+        try:
+            generate_roster_plans(api_key, profiles, checkpoint_path, **options)
+        except Exception as e:
+            logger.error(f"Roster generation aborted: {e}", exc_info=True)
+            with self._lock:
+                self._errors[checkpoint_path] = str(e)
+
+    def is_running(self, checkpoint_path: str) -> bool:
+        with self._lock:
+            thread = self._threads.get(checkpoint_path)
+        return thread is not None and thread.is_alive()
+
+    def error(self, checkpoint_path: str):
+        with self._lock:
+            return self._errors.get(checkpoint_path)
+
+    def results(self, checkpoint_path: str, profiles: list) -> tuple:
+        """(résultats dans l'ordre de l'effectif, charge JSONL) d'après le fichier de reprise."""
+        try:
+            stat = os.stat(checkpoint_path)
+        except FileNotFoundError:
+            return [], ""
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._results.get(checkpoint_path)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        done = read_roster_checkpoint(checkpoint_path)
+        records = [done[p["athlete_id"]] for p in profiles if p["athlete_id"] in done]
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            self._results[checkpoint_path] = (version, records, payload)
+        return records, payload
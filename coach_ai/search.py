@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Index plein texte incrémental (séances, messages du chat) avec recherche par préfixe."""
+
+import heapq
+import bisect
+
+from coach_ai.text import tokenize
+
+SEARCH_PAGE_SIZE = 20
+
+class SearchIndex:
+    """
+    Index inversé incrémental : jeton → identifiants de documents.
+
+    Les documents sont numérotés dans l'ordre d'ajout (les plus récents en premier
+    dans les résultats) et désignés par une référence externe (séance, message).
+    Chaque terme de la requête est traité comme un préfixe.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.docs = {}
+        self.doc_ids = {}
+        self._next_id = 0
+
+    def add(self, ref: tuple, text: str):
+        doc_id = self._next_id
+        self._next_id += 1
+        self.docs[doc_id] = ref
+        self.doc_ids[ref] = doc_id
+        for token in tokenize(text):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = set()
+                bisect.insort(self.vocabulary, token)
+            posting.add(doc_id)
+
+    def remove(self, ref: tuple, text: str):
+        doc_id = self.doc_ids.pop(ref, None)
+        if doc_id is None:
+            return
+        del self.docs[doc_id]
+        for token in tokenize(text):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.discard(doc_id)
+
+    def _prefix_matches(self, prefix: str) -> set:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        matches = set()
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self.postings[token]
+        return matches
+
+    def search(self, query: str, page: int = 0, page_size: int = SEARCH_PAGE_SIZE) -> dict:
+        """Documents contenant tous les termes (par préfixe), paginés du plus récent au plus ancien."""
+        terms = sorted(tokenize(query))
+        if not terms:
+            return {"total": 0, "refs": []}
+        candidate_sets = sorted((self._prefix_matches(term) for term in terms), key=len)
+        matches = candidate_sets[0].intersection(*candidate_sets[1:])
+        top = heapq.nlargest((page + 1) * page_size, matches)
+        return {"total": len(matches), "refs": [self.docs[doc_id] for doc_id in top[page * page_size:]]}
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Mémoire d'une session utilisateur : textes longs compressés, tampon du chat
+(archivé sur disque au-delà de CHAT_HISTORY_MAX) et recherche dans l'activité.
+
+Les fonctions reçoivent l'état de la session (`st.session_state` dans
+l'application, un simple dict dans les tests).
+"""
+
+import os
+import json
+import zlib
+import pickle
+import logging
+from collections import deque
+
+from coach_ai.config import get_config_value
+from coach_ai.search import SearchIndex
+from coach_ai.workouts import get_workout_index, iter_workouts, workout_search_text
+
+logger = logging.getLogger(__name__)
+
+# Nombre de messages de chat gardés en mémoire ; les plus anciens sont écrits sur disque
+CHAT_HISTORY_MAX = int(get_config_value("CHAT_HISTORY_MAX", 50))
+CHAT_SPILL_DIR = get_config_value("CHAT_SPILL_DIR", "chat_spill")
+
+# Au-delà de cette taille (caractères), les textes longs sont stockés compressés
+LARGE_TEXT_THRESHOLD = 1024
+
+def set_large_text(state, key: str, text: str):
+    """Stocke un texte long dans la session, compressé (zlib) s'il dépasse le seuil."""
+    if text and len(text) >= LARGE_TEXT_THRESHOLD:
+        state[key] = zlib.compress(text.encode("utf-8"), 6)
+    else:
+        state[key] = text
+
+def get_large_text(state, key: str) -> str:
+    """Relit un texte stocké via set_large_text ("" si absent)."""
+    value = state.get(key)
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value or ""
+
+def chat_spill_path(session_uid: str) -> str:
+    return os.path.join(CHAT_SPILL_DIR, f"{session_uid}.jsonl")
+
+def _spill_chat_message(state, message: dict):
+    """Archive sur disque un message évincé du tampon de chat ; retourne sa position dans l'archive."""
+    try:
+        os.makedirs(CHAT_SPILL_DIR, exist_ok=True)
+        with open(chat_spill_path(state["session_uid"]), "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        return offset
+    except OSError as e:
+        logger.warning(f"Chat spill failed: {e}")
+        return None
+
+def append_chat_message(state, role: str, content: str):
+    """Ajoute un message au tampon circulaire du chat (le plus ancien est archivé s'il est plein)."""
+    history = state["chat_history"]
+    if not isinstance(history, deque) or history.maxlen != CHAT_HISTORY_MAX:
+        history = deque(history, maxlen=CHAT_HISTORY_MAX)
+        state["chat_history"] = history
+
+    if len(history) == history.maxlen:
+        offset = _spill_chat_message(state, history[0])
+        offsets = state.get("chat_spill_offsets")
+        if offsets is not None and offset is not None and "seq" in history[0]:
+            offsets[history[0]["seq"]] = offset
+
+    # Numéro de séquence stable : sert de référence à l'index de recherche
+    message = {"seq": state["chat_seq"], "role": role, "content": content}
+    state["chat_seq"] += 1
+    history.append(message)
+    if state.get("search_index") is not None:
+        state["search_index"].add(("chat", message["seq"]), content)
+
+def session_size_report(state) -> list:
+    """Taille sérialisée (octets) de chaque clé de la session, de la plus lourde à la plus légère."""
+    rows = []
+    for key in list(state.keys()):
+        try:
+            size = len(pickle.dumps(state[key], protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            size = -1
+        rows.append({"clé": key, "octets": size})
+    return sorted(rows, key=lambda r: -r["octets"])
+
+# ===================== RECHERCHE DANS L'ACTIVITÉ =====================
+def get_search_index(state) -> SearchIndex:
+    """Index de la session, construit une fois (archive du chat, chat récent, séances) puis tenu à jour."""
+    index = state.get("search_index")
+    if index is not None:
+        return index
+
+    index = SearchIndex()
+    offsets = {}
+    try:
+        with open(chat_spill_path(state["session_uid"]), "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    message = json.loads(line)
+                    if "seq" in message:
+                        offsets[message["seq"]] = offset
+                        index.add(("chat", message["seq"]), message.get("content", ""))
+                except json.JSONDecodeError:
+                    pass
+                offset += len(line)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Chat archive unreadable for search: {e}")
+
+    for message in state["chat_history"]:
+        if "seq" in message:
+            index.add(("chat", message["seq"]), message.get("content", ""))
+    get_workout_index(state)
+    for workout in iter_workouts(state):
+        index.add(("workout", workout["id"]), workout_search_text(workout))
+
+    state["chat_spill_offsets"] = offsets
+    state["search_index"] = index
+    logger.info(f"Search index built: {len(index.docs)} documents, {len(index.postings)} terms")
+    return index
+
+def _read_spilled_message(state, seq: int):
+    offset = (state.get("chat_spill_offsets") or {}).get(seq)
+    if offset is None:
+        return None
+    try:
+        with open(chat_spill_path(state["session_uid"]), "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def resolve_search_ref(state, ref: tuple):
+    """Retrouve la séance ou le message désigné par une référence d'index."""
+    kind, key = ref
+    if kind == "workout":
+        pos = get_workout_index(state).get(key)
+        return None if pos is None else state["workout_history"][pos]
+    history = state["chat_history"]
+    if history and history[0].get("seq", key + 1) <= key:
+        position = key - history[0]["seq"]
+        if position < len(history) and history[position].get("seq") == key:
+            return history[position]
+    return _read_spilled_message(state, key)
+
+def search_activity(state, query: str, page: int = 0) -> dict:
+    """Recherche dans les notes de séances et le chat ; retourne le total et la page de résultats."""
+    result = get_search_index(state).search(query, page)
+    items = []
+    for ref in result["refs"]:
+        record = resolve_search_ref(state, ref)
+        if record is not None:
+            items.append({"kind": ref[0], "record": record})
+    return {"total": result["total"], "items": items}
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Instantanés de session : format binaire versionné (msgpack, ou JSON si msgpack
+est absent), écriture différée par un thread unique et clés utilisateur.
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import shutil
+import secrets
+import hashlib
+import logging
+import threading
+import datetime as dt
+from collections import deque
+
+from coach_ai.config import get_config_value
+from coach_ai.session import CHAT_HISTORY_MAX, chat_spill_path, get_large_text, set_large_text
+from coach_ai.workouts import iter_workouts
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SESSION_SNAPSHOT_DIR = get_config_value("SESSION_SNAPSHOT_DIR", "session_snapshots")
+# En-tête binaire : magie, version du schéma, format (1 = msgpack, 2 = JSON), puis charge zlib
+SNAPSHOT_MAGIC = b"LP9S"
+SNAPSHOT_SCHEMA_VERSION = 1
+SNAPSHOT_CODEC_MSGPACK = 1
+SNAPSHOT_CODEC_JSON = 2
+# Clé utilisateur : 128 bits aléatoires émis par le serveur (secrets.token_urlsafe → 22 caractères)
+USER_KEY_BYTES = 16
+USER_KEY_PATTERN = re.compile(r"[A-Za-z0-9_-]{22}")
+
+# État sauvegardé (les identifiants API / WhatsApp et les coordonnées — courriel, numéro
+# destinataire — ne sont jamais écrits sur disque ; session_uid est propre à chaque onglet
+# et régénéré à chaque restauration)
+SNAPSHOT_KEYS = [
+    "step", "form_page", "answers", "page",
+    "user_name", "user_dob", "user_gender", "city", "country", "user_bio", "avatar_url",
+    "goal_type", "current_weight", "target_weight", "training_frequency", "training_duration", "target_date",
+    "notifications_enabled", "notification_time", "weight_unit", "distance_unit", "language",
+    "reminder_days", "message_template_name",
+    "calendar_start_date", "workout_history", "last_completed_day", "chat_seq",
+]
+SNAPSHOT_LARGE_TEXT_KEYS = ["plan_text", "nutrition_plan"]
+
+def _to_snapshot_value(value):
+    """Convertit une valeur de session en types sérialisables (dates et heures balisées)."""
+    if isinstance(value, dt.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, dt.date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, dt.time):
+        return {"$time": value.isoformat()}
+    if isinstance(value, dict):
+        return {k: _to_snapshot_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, deque)):
+        return [_to_snapshot_value(v) for v in value]
+    return value
+
+def _from_snapshot_value(value):
+    if isinstance(value, dict):
+        if len(value) == 1:
+            (tag, raw), = value.items()
+            if tag == "$datetime":
+                return dt.datetime.fromisoformat(raw)
+            if tag == "$date":
+                return dt.date.fromisoformat(raw)
+            if tag == "$time":
+                return dt.time.fromisoformat(raw)
+        return {k: _from_snapshot_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_snapshot_value(v) for v in value]
+    return value
+
+def collect_session_snapshot(state) -> dict:
+    """Extrait l'état persistant de la session."""
+    data = {k: _to_snapshot_value(state.get(k)) for k in SNAPSHOT_KEYS}
+    for key in SNAPSHOT_LARGE_TEXT_KEYS:
+        data[key] = get_large_text(state, key) or None
+    data["chat_history"] = list(state.get("chat_history", []))
+    data["chat_archive"] = state["session_uid"]
+    data["workout_history"] = _to_snapshot_value(list(iter_workouts(state)))
+    return data
+
+def pack_snapshot(data: dict) -> tuple:
+    """Sérialise l'état : (format, octets), en msgpack si disponible, sinon en JSON."""
+    if MSGPACK_AVAILABLE:
+        return SNAPSHOT_CODEC_MSGPACK, msgpack.packb(data, use_bin_type=True)
+    return SNAPSHOT_CODEC_JSON, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def encode_session_snapshot(codec: int, payload: bytes) -> bytes:
+    """Assemble l'instantané binaire : en-tête versionné + charge compressée."""
+    return SNAPSHOT_MAGIC + bytes([SNAPSHOT_SCHEMA_VERSION, codec]) + zlib.compress(payload, 6)
+
+def decode_session_snapshot(blob: bytes):
+    """Décode un instantané ; None s'il est illisible ou d'un schéma inconnu."""
+    if len(blob) < 6 or blob[:4] != SNAPSHOT_MAGIC:
+        return None
+    version, codec = blob[4], blob[5]
+    if version != SNAPSHOT_SCHEMA_VERSION:
+        logger.warning(f"Unsupported session snapshot schema v{version}")
+        return None
+    try:
+        payload = zlib.decompress(blob[6:])
+        if codec == SNAPSHOT_CODEC_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                logger.warning("Session snapshot is msgpack-encoded but msgpack is not installed")
+                return None
+            return msgpack.unpackb(payload, raw=False)
+        if codec == SNAPSHOT_CODEC_JSON:
+            return json.loads(payload.decode("utf-8"))
+    except Exception as e:
+        logger.error(f"Corrupted session snapshot: {e}")
+    return None
+
+def snapshot_path(user_key: str) -> str:
+    return os.path.join(SESSION_SNAPSHOT_DIR, f"{user_key}.snap")
+
+class SnapshotWriter:
+    """
+    Écriture différée des instantanés par un thread unique : seule la dernière
+    version de chaque utilisateur est écrite, hors du chemin de rendu.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, name="snapshot-writer", daemon=True).start()
+
+    def submit(self, user_key: str, blob: bytes):
+        with self._cond:
+            self._pending[user_key] = blob
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                batch, self._pending = self._pending, {}
+            for user_key, blob in batch.items():
+                path = snapshot_path(user_key)
+                try:
+                    os.makedirs(SESSION_SNAPSHOT_DIR, exist_ok=True)
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(blob)
+                    os.replace(tmp_path, path)
+                except OSError as e:
+                    # Ni la clé ni le chemin (qui la contient) ne sont journalisés
+                    logger.error(f"Session snapshot write error: {e.strerror or type(e).__name__}")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Attend la fin des écritures en attente."""
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            with self._cond:
+                if not self._pending:
+                    return True
+            time.sleep(0.05)
+        return False
+
+# ===================== CLÉS UTILISATEUR =====================
+def new_user_key() -> str:
+    """Nouvelle clé utilisateur aléatoire (128 bits)."""
+    return secrets.token_urlsafe(USER_KEY_BYTES)
+
+def is_known_user_key(key) -> bool:
+    """
+    Vrai pour une clé émise par ce serveur (format de new_user_key, instantané
+    existant) ; toute autre valeur, choisie ou devinable, est refusée.
+    """
+    return bool(key) and bool(USER_KEY_PATTERN.fullmatch(key)) and os.path.isfile(snapshot_path(key))
+
+# ===================== RESTAURATION / SAUVEGARDE =====================
+def _restore_chat_archive(state, previous_uid):
+    """Copie l'archive de chat de la session sauvegardée vers celle de la session courante."""
+    if not previous_uid or not re.fullmatch(r"[0-9a-f]{32}", str(previous_uid)):
+        return
+    try:
+        shutil.copyfile(chat_spill_path(previous_uid), chat_spill_path(state["session_uid"]))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Chat archive restore failed: {e.strerror or type(e).__name__}")
+
+def load_session_snapshot(state, user_key: str) -> bool:
+    """Restaure, en une seule lecture, l'état sauvegardé de l'utilisateur dans `state`."""
+    try:
+        with open(snapshot_path(user_key), "rb") as f:
+            blob = f.read()
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.error(f"Session snapshot read error: {e.strerror or type(e).__name__}")
+        return False
+
+    data = decode_session_snapshot(blob)
+    if not data:
+        return False
+
+    for key in SNAPSHOT_KEYS:
+        if key in data:
+            state[key] = _from_snapshot_value(data[key])
+    for key in SNAPSHOT_LARGE_TEXT_KEYS:
+        if data.get(key):
+            set_large_text(state, key, data[key])
+    state["chat_history"] = deque(data.get("chat_history", []), maxlen=CHAT_HISTORY_MAX)
+    _restore_chat_archive(state, data.get("chat_archive"))
+    state["_snapshot_digest"] = hashlib.blake2b(zlib.decompress(blob[6:]), digest_size=16).hexdigest()
+    logger.info(f"Session restored ({len(blob)} bytes)")
+    return True
+
+def changed_session_snapshot(state):
+    """Instantané encodé si l'état persistant a changé depuis le dernier appel (None sinon)."""
+    codec, payload = pack_snapshot(collect_session_snapshot(state))
+    digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    if digest == state.get("_snapshot_digest"):
+        return None
+    state["_snapshot_digest"] = digest
+    return encode_session_snapshot(codec, payload)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Travaux spéculatifs par session : modification du plan lancée pendant que
+l'utilisateur lit la proposition, plan initial préchargé depuis le questionnaire.
+
+Un résultat n'est utilisé que s'il porte exactement sur la demande finale ; sinon
+il est annulé et les tokens déjà engagés sont comptés comme gaspillés.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from coach_ai.cache import content_cache_key
+from coach_ai.config import get_config_value
+from coach_ai.llm import ai_edit_plan, build_plan_request, call_openai_plan
+from coach_ai.plans import plan_digest
+from coach_ai.profile import QUESTIONS_BY_KEY, profile_from_answers
+from coach_ai.resilience import remaining_io_budget
+
+logger = logging.getLogger(__name__)
+
+SPECULATION_MAX_WORKERS = int(get_config_value("SPECULATION_MAX_WORKERS", 4))
+
+def _usage_tokens(result) -> int:
+    return int(((result or {}).get("usage") or {}).get("total_tokens", 0))
+
+class SpeculationPool:
+    """
+    Exécuteur partagé par les sessions du processus, travaux en cours par session
+    (`session_uid`) et métriques (lancés, utilisés, abandonnés, tokens gaspillés).
+    """
+
+    def __init__(self, executor=None, max_workers: int = SPECULATION_MAX_WORKERS):
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+        self.pending = {}
+        self.prefetch = {}
+        self.lock = threading.Lock()
+        self.metrics = {
+            "started": 0, "hits": 0, "discarded": 0, "used_tokens": 0, "wasted_tokens": 0,
+            "plan_prefetches": 0, "plan_prefetch_hits": 0,
+        }
+
+    def submit(self, fn, *args):
+        """Tâche de fond sans suivi (préchauffage de caches)."""
+        return self.executor.submit(fn, *args)
+
+    # ----- Modification spéculative du plan -----
+    def start_edit(self, uid: str, api_key: str, instruction: str, plan_text: str, profile: dict):
+        """Lance ai_edit_plan en arrière-plan pendant que l'utilisateur lit la proposition."""
+        self.discard_edit(uid)
+        future = self.executor.submit(ai_edit_plan, api_key, instruction, plan_text, dict(profile))
+        with self.lock:
+            self.pending[uid] = {
+                "future": future,
+                "instruction": instruction,
+                "plan_digest": plan_digest(plan_text),
+            }
+            self.metrics["started"] += 1
+        logger.info(f"Speculative plan edit started: {instruction[:50]}")
+
+    def discard_edit(self, uid: str):
+        """Abandonne la spéculation de la session ; les tokens déjà engagés sont comptés comme gaspillés."""
+        with self.lock:
+            spec = self.pending.pop(uid, None)
+            if spec is None:
+                return
+            self.metrics["discarded"] += 1
+        if spec["future"].cancel():
+            return
+
+        def count_waste(future):
+            try:
+                tokens = _usage_tokens(future.result())
+            except Exception:
+                tokens = 0
+            with self.lock:
+                self.metrics["wasted_tokens"] += tokens
+
+        spec["future"].add_done_callback(count_waste)
+
+    def take_edit(self, uid: str, instruction: str, plan_text: str):
+        """Résultat de la spéculation si elle porte sur la même demande et le même plan (sinon None)."""
+        with self.lock:
+            spec = self.pending.get(uid)
+        if spec is None:
+            return None
+        if spec["instruction"] != instruction or spec["plan_digest"] != plan_digest(plan_text):
+            self.discard_edit(uid)
+            return None
+
+        with self.lock:
+            self.pending.pop(uid, None)
+        try:
+            result = spec["future"].result(timeout=remaining_io_budget(60.0))
+        except Exception as e:
+            logger.warning(f"Speculative plan edit unavailable: {e}")
+            return None
+        if not result.get("ok"):
+            return None
+
+        with self.lock:
+            self.metrics["hits"] += 1
+            self.metrics["used_tokens"] += _usage_tokens(result)
+        logger.info("Speculative plan edit applied")
+        return result
+
+    # ----- Préchargement du plan initial -----
+    def start_plan_prefetch(self, uid: str, api_key: str, answers: dict):
+        """
+        Lance la génération du plan dès que toutes les réponses du questionnaire sont
+        connues ; la clé est celle de la requête complète, comme pour le plan final.
+        """
+        if not api_key or any(k not in answers for k in QUESTIONS_BY_KEY):
+            return
+        profile = profile_from_answers(answers)
+        key = content_cache_key(build_plan_request(profile))
+        with self.lock:
+            current = self.prefetch.get(uid)
+            if current and current["key"] == key:
+                return
+            future = self.executor.submit(call_openai_plan, api_key, profile)
+            self.prefetch[uid] = {"future": future, "key": key}
+            self.metrics["plan_prefetches"] += 1
+        if current:
+            current["future"].cancel()
+        logger.info("Plan prefetch started from questionnaire answers")
+
+    def take_plan_prefetch(self, uid: str, profile: dict) -> str:
+        """Plan préchargé si sa clé correspond au profil final ("" sinon)."""
+        with self.lock:
+            spec = self.prefetch.pop(uid, None)
+        if spec is None:
+            return ""
+        if spec["key"] != content_cache_key(build_plan_request(profile)):
+            spec["future"].cancel()
+            return ""
+        try:
+            plan = spec["future"].result(timeout=remaining_io_budget(90.0))
+        except Exception as e:
+            logger.warning(f"Plan prefetch unavailable: {e}")
+            return ""
+        if plan:
+            with self.lock:
+                self.metrics["plan_prefetch_hits"] += 1
+        return plan
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Normalisation de texte (minuscules, sans accents) et découpage en termes."""
+
+import re
+import unicodedata
+
+_TOKEN_PATTERN = re.compile(r"\w{2,}")
+
+def normalize_text(text: str) -> str:
+    """Minuscules sans accents (« Genou » et « génou » donnent « genou »)."""
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text: str) -> set:
+    return set(_TOKEN_PATTERN.findall(normalize_text(text)))
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Historique des versions de plans : stockage adressé par contenu et deltas ligne à ligne."""
+
+import time
+import difflib
+import threading
+
+from coach_ai.config import get_config_value
+from coach_ai.plans import plan_digest
+
+# Une version complète toutes les N versions d'une chaîne de deltas (borne le coût de reconstruction)
+PLAN_KEYFRAME_INTERVAL = 8
+# Les versions d'une session inactive depuis ce délai (onglet fermé) sont libérées
+PLAN_HISTORY_SESSION_TTL = float(get_config_value("PLAN_HISTORY_SESSION_TTL", 2 * 3600))
+
+def _make_line_delta(old_text: str, new_text: str) -> list:
+    """Delta ligne à ligne : ["=", début, fin] pour les lignes reprises, ["+", lignes] pour le nouveau texte."""
+    old_lines = old_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append(["+", "".join(new_lines[j1:j2])])
+    return ops
+
+def _apply_line_delta(old_text: str, ops: list) -> str:
+    """Reconstruit un texte à partir de sa version de base et d'un delta."""
+    old_lines = old_text.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == "=":
+            parts.extend(old_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+class PlanVersionStore:
+    """
+    Magasin de versions de plans adressé par contenu, partagé par le processus.
+
+    Un texte identique (même entre utilisateurs) n'est stocké qu'une fois. Chaque
+    version est gardée soit en entier, soit sous forme de delta par rapport à sa
+    version parente : le coût de stockage suit la taille des modifications, pas
+    celle du plan. Les versions sont libérées par comptage de références.
+
+    Les références prises pour une session (`owner`) lui sont rattachées : une
+    session qui ne s'est pas signalée (`touch`) depuis `session_ttl` secondes
+    est considérée comme terminée et toutes ses références sont libérées.
+    """
+
+    def __init__(self, session_ttl: float = PLAN_HISTORY_SESSION_TTL):
+        self.session_ttl = session_ttl
+        self._blobs = {}
+        self._owners = {}
+        self._next_sweep = 0.0
+        self._lock = threading.RLock()
+
+    def put(self, text: str, parent: str = None, digest: str = None, owner: str = None) -> str:
+        """Enregistre une version (référence +1, rattachée à `owner`) et retourne son empreinte."""
+        digest = digest or plan_digest(text)
+        with self._lock:
+            self._sweep(time.monotonic())
+            self._hold(owner, digest)
+            blob = self._blobs.get(digest)
+            if blob:
+                blob["refs"] += 1
+                return digest
+
+            base = self._blobs.get(parent) if parent else None
+            if base and base["depth"] + 1 < PLAN_KEYFRAME_INTERVAL:
+                delta = _make_line_delta(self.get(parent), text)
+                base["children"] += 1
+                blob = {"base": parent, "delta": delta, "depth": base["depth"] + 1}
+            else:
+                blob = {"base": None, "text": text, "depth": 0}
+
+            blob.update(refs=1, children=0)
+            self._blobs[digest] = blob
+            return digest
+
+    def get(self, digest: str) -> str:
+        """Reconstruit le texte d'une version."""
+        with self._lock:
+            chain = []
+            blob = self._blobs[digest]
+            while blob["base"] is not None:
+                chain.append(blob["delta"])
+                blob = self._blobs[blob["base"]]
+            text = blob["text"]
+            for delta in reversed(chain):
+                text = _apply_line_delta(text, delta)
+            return text
+
+    def release(self, digest: str, owner: str = None):
+        """Libère une référence ; supprime les versions devenues inutiles."""
+        with self._lock:
+            if owner is not None:
+                held = self._owners.get(owner, {}).get("refs", {})
+                if not held.get(digest):
+                    # Déjà libérée avec la session (expirée)
+                    return
+                held[digest] -= 1
+                if not held[digest]:
+                    del held[digest]
+            self._release(digest)
+
+    def touch(self, owner: str) -> bool:
+        """
+        Signale que la session est toujours active. Retourne False si ses
+        références ont déjà été libérées : son historique n'est plus valide.
+        """
+        with self._lock:
+            now = time.monotonic()
+            holder = self._owners.get(owner)
+            if holder is not None:
+                holder["seen"] = now
+            self._sweep(now)
+            return holder is not None
+
+    def release_owner(self, owner: str):
+        """Libère toutes les références d'une session."""
+        with self._lock:
+            holder = self._owners.pop(owner, None)
+            for digest, count in (holder or {}).get("refs", {}).items():
+                for _ in range(count):
+                    self._release(digest)
+
+    def _hold(self, owner: str, digest: str):
+        if owner is None:
+            return
+        holder = self._owners.setdefault(owner, {"refs": {}, "seen": time.monotonic()})
+        holder["refs"][digest] = holder["refs"].get(digest, 0) + 1
+
+    def _release(self, digest: str):
+        blob = self._blobs.get(digest)
+        if not blob:
+            return
+        blob["refs"] -= 1
+        while blob and blob["refs"] <= 0 and blob["children"] <= 0:
+            del self._blobs[digest]
+            digest = blob["base"]
+            blob = self._blobs.get(digest) if digest else None
+            if blob:
+                blob["children"] -= 1
+
+    def _sweep(self, now: float):
+        """Libère les sessions expirées (au plus une passe par minute)."""
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + min(60.0, self.session_ttl)
+        for owner in [o for o, h in self._owners.items() if now - h["seen"] > self.session_ttl]:
+            self.release_owner(owner)
+
+    def stats(self) -> dict:
+        """Nombre de versions, de sessions et taille approximative stockée (octets)."""
+        with self._lock:
+            size = 0
+            for blob in self._blobs.values():
+                if blob["base"] is None:
+                    size += len(blob["text"].encode("utf-8"))
+                else:
+                    size += sum(len(op[1].encode("utf-8")) if op[0] == "+" else 8 for op in blob["delta"])
+            return {"versions": len(self._blobs), "sessions": len(self._owners), "bytes": size}
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""Géocodage (index local puis Open-Meteo), prévisions et conseils météo par séance."""
+
+import os
+import re
+import csv
+import bisect
+import logging
+import warnings
+import functools
+import datetime as dt
+
+import numpy as np
+
+from coach_ai.cache import FORECAST_CACHE_TTL, GEOCODE_CACHE_TTL, WEATHER_CACHE_TTL, get_shared_cache
+from coach_ai.calendar_events import expand_calendar_events
+from coach_ai.resilience import external_request
+from coach_ai.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+def _geocode_remote(city: str):
+    response = external_request(
+        "open-meteo", "GET",
+        "https://geocoding-api.open-meteo.com/v1/search",
+        timeout=10,
+        params={"name": city, "count": 1, "language": "fr"}
+    )
+    results = response.json().get("results", [])
+    if not results:
+        return None
+    loc = results[0]
+    return [
+        float(loc["latitude"]),
+        float(loc["longitude"]),
+        f'{loc["name"]}, {loc.get("country","")}'
+    ]
+
+CITY_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.csv")
+
+GAZETTEER_MIN_PREFIX = 4
+
+def _gazetteer_key(text: str) -> str:
+    """Clé de recherche : sans accents ni ponctuation (« St-Jérôme » → « st jerome »)."""
+    return " ".join(re.findall(r"[a-z0-9]+", normalize_text(text)))
+
+@functools.lru_cache(maxsize=None)
+def load_city_gazetteer(path: str = CITY_GAZETTEER_PATH) -> dict:
+    """
+    Index local des villes : clés normalisées triées (recherche par bisection) et
+    tableaux NumPy parallèles pour les coordonnées et la population.
+    """
+    names, countries, lats, lons, populations = [], [], [], [], []
+    best = {}
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                rid = len(names)
+                names.append(row["name"])
+                countries.append(row["country"])
+                lats.append(float(row["lat"]))
+                lons.append(float(row["lon"]))
+                populations.append(int(row["population"] or 0))
+                aliases = [row["name"]] + [a for a in (row.get("aliases") or "").split("|") if a]
+                for alias in aliases:
+                    key = _gazetteer_key(alias)
+                    # Homonymes : la ville la plus peuplée l'emporte, comme le fait l'API
+                    if key and (key not in best or populations[best[key]] < populations[rid]):
+                        best[key] = rid
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"City gazetteer unavailable ({path}): {e}")
+        names, countries, lats, lons, populations, best = [], [], [], [], [], {}
+
+    keys = sorted(best)
+    logger.info(f"City gazetteer loaded: {len(names)} cities, {len(keys)} keys")
+    return {
+        "keys": keys,
+        "ids": np.array([best[k] for k in keys], dtype=np.int32),
+        "names": names,
+        "countries": countries,
+        "lat": np.array(lats, dtype=np.float64),
+        "lon": np.array(lons, dtype=np.float64),
+        "population": np.array(populations, dtype=np.int64),
+    }
+
+def lookup_city(city: str):
+    """
+    Résout une ville dans l'index local : nom ou alias exact, sinon préfixe s'il
+    ne désigne qu'une ville ou s'il se termine sur un mot complet (la plus peuplée
+    parmi celles-là). Retourne (lat, lon, "Nom, Pays") ou None : un préfixe ambigu
+    (« Sain », « Lon ») est laissé à l'API de géocodage.
+    """
+    gazetteer = load_city_gazetteer()
+    keys = gazetteer["keys"]
+    key = _gazetteer_key((city or "").split(",")[0])
+    if not key or not keys:
+        return None
+
+    lo = bisect.bisect_left(keys, key)
+    if lo < len(keys) and keys[lo] == key:
+        rid = int(gazetteer["ids"][lo])
+    elif len(key) >= GAZETTEER_MIN_PREFIX:
+        hi = bisect.bisect_left(keys, key + "\uffff", lo)
+        candidates = gazetteer["ids"][lo:hi]
+        if len(np.unique(candidates)) != 1:
+            # « Trois » ou « Saint Jean » sont des mots complets ; « Sain » ne l'est pas
+            candidates = gazetteer["ids"][[i for i in range(lo, hi) if keys[i][len(key)] == " "]]
+        if len(candidates) == 0:
+            return None
+        rid = int(candidates[np.argmax(gazetteer["population"][candidates])])
+    else:
+        return None
+    return (
+        float(gazetteer["lat"][rid]),
+        float(gazetteer["lon"][rid]),
+        f'{gazetteer["names"][rid]}, {gazetteer["countries"][rid]}'
+    )
+
+def geocode_city(city: str):
+    """Récupère les coordonnées d'une ville (index local, sinon API partagée entre répliques)"""
+    local = lookup_city(city)
+    if local:
+        return local
+    try:
+        geo = get_shared_cache().get_or_compute(
+            "geocode", city.strip().lower(), GEOCODE_CACHE_TTL, lambda: _geocode_remote(city)
+        )
+        return tuple(geo) if geo else None
+    except Exception as e:
+        logger.error(f"Geocoding error: {str(e)}")
+        return None
+
+# Seuils au-delà desquels l'entraînement extérieur est déconseillé
+OUTDOOR_MAX_PRECIPITATION = 50
+OUTDOOR_MIN_TEMP = 0
+OUTDOOR_MAX_TEMP = 28
+
+def fetch_week_forecast(lat: float, lon: float, days: int):
+    """Prévision horaire Open-Meteo via le cache partagé ; lève une exception en cas d'échec (jamais mise en cache)."""
+    return get_shared_cache().get_or_compute(
+        "forecast", f"{lat:.3f},{lon:.3f},{days}", FORECAST_CACHE_TTL,
+        lambda: _fetch_week_forecast_remote(lat, lon, days)
+    )
+
+def _fetch_week_forecast_remote(lat: float, lon: float, days: int):
+    response = external_request(
+        "open-meteo", "GET",
+        "https://api.open-meteo.com/v1/forecast",
+        timeout=10,
+        params={
+            "latitude": lat,
+            "longitude": lon,
+            "hourly": "temperature_2m,precipitation_probability",
+            "forecast_days": days,
+            "timezone": "auto"
+        }
+    )
+    response.raise_for_status()
+    return response.json()
+
+def weather_advice(weather_json, planned_minutes: int, hour_index: int = 0) -> str:
+    """Génère des conseils selon la météo à l'heure de la séance (index horaire de la prévision)."""
+    try:
+        temps = weather_json["hourly"]["temperature_2m"][hour_index]
+        prec = weather_json["hourly"]["precipitation_probability"][hour_index]
+        
+        if prec > OUTDOOR_MAX_PRECIPITATION or temps < OUTDOOR_MIN_TEMP or temps > OUTDOOR_MAX_TEMP:
+            return (
+                f"⚠️ Météo peu favorable ({temps}°C, pluie {prec}%). "
+                f"Alternative indoor ~{planned_minutes} min : circuit cardio / full body / yoga."
+            )
+        return f"✅ Météo OK ({temps}°C, pluie {prec}%). Entraînement extérieur possible!"
+    except Exception as e:
+        logger.error(f"Weather advice error: {str(e)}")
+        return "Météo indisponible."
+
+def forecast_session_conditions(weather_json, starts: list, planned_minutes: int) -> dict:
+    """
+    Évalue la météo sur la plage horaire de chaque séance, de façon vectorisée.
+
+    `starts` contient les débuts de séance (ISO, heure locale). Pour chaque séance,
+    on agrège toutes les heures couvertes : température min/max et pluie max.
+    Retourne des tableaux alignés sur `starts` (valid=False hors de la prévision).
+    """
+    hourly = weather_json["hourly"]
+    times = np.array(hourly["time"], dtype="datetime64[m]")
+    temps = np.array([np.nan if v is None else v for v in hourly["temperature_2m"]], dtype=float)
+    precs = np.array([np.nan if v is None else v for v in hourly["precipitation_probability"]], dtype=float)
+
+    targets = np.array([s[:16] for s in starts], dtype="datetime64[m]")
+    first = np.searchsorted(times, targets, side="right") - 1
+
+    # Nombre d'heures touchées par la séance (ex. 18:30 + 45 min -> 18h et 19h)
+    offsets_min = (targets - targets.astype("datetime64[h]")).astype(int)
+    n_hours = (offsets_min + max(1, int(planned_minutes)) + 59) // 60
+    width = int(n_hours.max()) if len(starts) else 1
+    window = first[:, None] + np.arange(width)[None, :]
+    in_session = np.arange(width)[None, :] < n_hours[:, None]
+    window = np.clip(window, 0, len(times) - 1)
+
+    valid = (first >= 0) & (targets < times[-1] + np.timedelta64(60, "m"))
+    window_temps = np.where(in_session, temps[window], np.nan)
+    window_precs = np.where(in_session, precs[window], np.nan)
+
+    # Séance sans aucune valeur (null côté Open-Meteo) : « All-NaN slice » attendu, résultat NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        temp_min = np.nanmin(window_temps, axis=1)
+        temp_max = np.nanmax(window_temps, axis=1)
+        prec_max = np.nanmax(window_precs, axis=1)
+
+    # Température ou pluie inconnue sur toute la séance : pas de recommandation
+    valid &= ~np.isnan(temp_min) & ~np.isnan(prec_max)
+    indoor = (prec_max > OUTDOOR_MAX_PRECIPITATION) | (temp_min < OUTDOOR_MIN_TEMP) | (temp_max > OUTDOOR_MAX_TEMP)
+
+    return {
+        "valid": valid,
+        "indoor": indoor & valid,
+        "temp_min": temp_min,
+        "temp_max": temp_max,
+        "precipitation": prec_max
+    }
+
+def annotate_events_with_forecast(events: list, weather_json, window_start, window_end, planned_minutes: int) -> list:
+    """
+    Annote les séances de la fenêtre de prévision avec une recommandation intérieur/extérieur.
+
+    Les occurrences de la fenêtre sont matérialisées et annotées ; les règles récurrentes
+    sont découpées autour de la fenêtre pour ne pas dupliquer ces séances.
+    """
+    if not events or not weather_json or "hourly" not in weather_json:
+        return events
+
+    occurrences = [
+        occ for occ in expand_calendar_events(events, window_start, window_end)
+        if not occ["extendedProps"].get("is_rest")
+    ]
+    if not occurrences:
+        return events
+
+    conditions = forecast_session_conditions(weather_json, [occ["start"] for occ in occurrences], planned_minutes)
+
+    annotated_dates = set()
+    annotated = []
+    for i, occ in enumerate(occurrences):
+        if not conditions["valid"][i]:
+            continue
+        indoor = bool(conditions["indoor"][i])
+        temp_min = round(float(conditions["temp_min"][i]))
+        temp_max = round(float(conditions["temp_max"][i]))
+        prec = int(conditions["precipitation"][i])
+        temp_label = f"{temp_min}°C" if temp_min == temp_max else f"{temp_min}-{temp_max}°C"
+
+        occ = dict(occ)
+        occ["title"] = f"{'🏠' if indoor else '🌳'} {occ['title']}"
+        occ["extendedProps"] = {
+            **occ["extendedProps"],
+            "weather": {
+                "recommendation": "indoor" if indoor else "outdoor",
+                "temperature": temp_label,
+                "precipitation": prec,
+                "advice": (
+                    f"Intérieur conseillé ({temp_label}, pluie {prec}%)" if indoor
+                    else f"Extérieur possible ({temp_label}, pluie {prec}%)"
+                )
+            }
+        }
+        annotated.append(occ)
+        annotated_dates.add((occ["extendedProps"]["day_number"], occ["start"][:10]))
+
+    if not annotated:
+        return events
+
+    if isinstance(window_start, dt.datetime):
+        window_start = window_start.date()
+    if isinstance(window_end, dt.datetime):
+        window_end = window_end.date()
+
+    result = []
+    for event in events:
+        day_number = event["extendedProps"]["day_number"]
+        has_annotation = any(day == day_number for day, _ in annotated_dates)
+        if not has_annotation:
+            result.append(event)
+            continue
+
+        # Règle découpée : [début, fenêtre[ puis [fin de fenêtre, fin[ ; la suite reprend au
+        # même jour de semaine (expand_calendar_events le déduit de startRecur)
+        first = dt.date.fromisoformat(event["startRecur"])
+        resume = max(first, window_end)
+        resume += dt.timedelta(days=(first - resume).days % 7)
+        before = dict(event, endRecur=window_start.isoformat())
+        after = dict(event, startRecur=resume.isoformat())
+        if before["startRecur"] < before["endRecur"]:
+            result.append(before)
+        if after["startRecur"] < after["endRecur"]:
+            result.append(after)
+        # Occurrences de la fenêtre sans prévision exploitable : conservées telles quelles
+        for occ in expand_calendar_events([event], window_start, window_end):
+            if (day_number, occ["start"][:10]) not in annotated_dates:
+                result.append(occ)
+
+    return result + annotated
+
+def _fetch_current_weather_remote(lat: float, lon: float):
+    response = external_request(
+        "open-meteo", "GET",
+        "https://api.open-meteo.com/v1/forecast",
+        timeout=10,
+        params={
+            "latitude": lat,
+            "longitude": lon,
+            "current_weather": True,
+            "timezone": "auto"
+        }
+    )
+    response.raise_for_status()
+    return response.json().get("current_weather") or None
+
+def get_weather(city: str = "Montreal") -> dict:
+    """Récupère la météo actuelle pour une ville via Open-Meteo (plus fiable)."""
+    geo = geocode_city(city)
+    if geo:
+        lat, lon, full_name = geo
+        try:
+            cw = get_shared_cache().get_or_compute(
+                "weather", f"{lat:.3f},{lon:.3f}", WEATHER_CACHE_TTL,
+                lambda: _fetch_current_weather_remote(lat, lon)
+            ) or {}
+            temp = cw.get("temperature")
+            weather_code = cw.get("weathercode")
+
+            code_map = {
+                0: "Ciel dégagé",
+                1: "Principalement dégagé",
+                2: "Partiellement nuageux",
+                3: "Couvert",
+                45: "Brouillard",
+                48: "Brouillard givrant",
+                51: "Bruine faible",
+                53: "Bruine modérée",
+                55: "Bruine forte",
+                61: "Pluie faible",
+                63: "Pluie modérée",
+                65: "Pluie forte",
+                71: "Neige faible",
+                73: "Neige modérée",
+                75: "Neige forte",
+                80: "Averses faibles",
+                81: "Averses modérées",
+                82: "Averses fortes"
+            }
+            condition = code_map.get(weather_code, "Conditions variables")
+
+            if isinstance(temp, (int, float)):
+                return {
+                    "temp": f"{round(temp)}",
+                    "condition": condition,
+                    "humidity": "--",
+                    "feels_like": f"{round(temp)}"
+                }
+        except Exception as e:
+            logger.warning(f"Open-Meteo error in get_weather: {e}")
+
+    logger.warning("Fallback météo utilisé (valeurs par défaut).")
+    return {
+        "temp": "20",
+        "condition": "Ensoleillé",
+        "humidity": "65",
+        "feels_like": "18"
+    }
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Journal des séances d'une session : ids stables, suppression en O(1) par
+pierre tombale (None) et compactage amorti.
+
+L'historique, son index id → position et les agrégats vivent dans l'état de la
+session (`workout_history`, `workout_index`, `workout_rollups`).
+"""
+
+import uuid
+
+from coach_ai.analytics import apply_workout_to_rollups, rebuild_workout_rollups
+
+# Compactage de l'historique dès que les pierres tombales dépassent ce seuil et les séances actives
+WORKOUT_COMPACT_MIN = 64
+
+def workout_search_text(workout: dict) -> str:
+    return f"{workout.get('type', '')} {workout.get('notes', '')}"
+
+def get_workout_index(state) -> dict:
+    """Index id → position des séances dans l'historique (les anciennes séances reçoivent un id)."""
+    if state.get("workout_index") is None:
+        index = {}
+        for pos, workout in enumerate(state["workout_history"]):
+            if workout is not None:
+                index[workout.setdefault("id", uuid.uuid4().hex)] = pos
+        state["workout_index"] = index
+    return state["workout_index"]
+
+def get_workout_rollups(state) -> dict:
+    """Agrégats semaine / mois / type de la session, tenus à jour à chaque ajout ou suppression."""
+    if state.get("workout_rollups") is None:
+        state["workout_rollups"] = rebuild_workout_rollups(iter_workouts(state))
+    return state["workout_rollups"]
+
+def iter_workouts(state, reverse: bool = False):
+    """Séances actives, dans l'ordre d'enregistrement (ou inverse)."""
+    history = state["workout_history"]
+    for workout in (reversed(history) if reverse else history):
+        if workout is not None:
+            yield workout
+
+def recent_workouts(state, count: int) -> list:
+    """Les `count` dernières séances actives, de la plus ancienne à la plus récente."""
+    recent = []
+    for workout in iter_workouts(state, reverse=True):
+        if len(recent) == count:
+            break
+        recent.append(workout)
+    return recent[::-1]
+
+def add_workout(state, workout: dict):
+    """Enregistre une séance (avec un id stable) et met à jour l'index et les agrégats."""
+    index = get_workout_index(state)
+    rollups = get_workout_rollups(state)
+    workout.setdefault("id", uuid.uuid4().hex)
+    index[workout["id"]] = len(state["workout_history"])
+    state["workout_history"].append(workout)
+    apply_workout_to_rollups(rollups, workout, 1)
+    if state.get("search_index") is not None:
+        state["search_index"].add(("workout", workout["id"]), workout_search_text(workout))
+
+def delete_workout(state, workout_id: str) -> bool:
+    """Supprime une séance par id en O(1) : sa position devient une pierre tombale (None)."""
+    index = get_workout_index(state)
+    pos = index.pop(workout_id, None)
+    if pos is None:
+        return False
+    history = state["workout_history"]
+    apply_workout_to_rollups(get_workout_rollups(state), history[pos], -1)
+    if state.get("search_index") is not None:
+        state["search_index"].remove(("workout", workout_id), workout_search_text(history[pos]))
+    history[pos] = None
+
+    if len(history) - len(index) > max(WORKOUT_COMPACT_MIN, len(index)):
+        _compact_workouts(state)
+    return True
+
+def _compact_workouts(state):
+    """Retire les pierres tombales et reconstruit l'index (coût amorti par les suppressions)."""
+    state["workout_history"] = list(iter_workouts(state))
+    state["workout_index"] = None
+    get_workout_index(state)
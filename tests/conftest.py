@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+# Tests hors réseau et sans effet de bord : pas de cache partagé sur disque,
+# bibliothèque de repli gardée en mémoire
+os.environ.setdefault("SHARED_CACHE_URL", "none")
+os.environ.setdefault("FALLBACK_LIBRARY_PATH", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+SAMPLE_PROFILE = {
+    "age": 30, "sexe": "Homme", "taille_cm": 180, "poids_kg": 80, "niveau_exp": "Débutant",
+    "activite": "Modérément actif (Marche régulière)", "objectif_principal": "perte de poids",
+    "jours_sem": 3, "duree_min": 45, "moment": "Soir / Nuit (19h+)", "horizon": "6 mois",
+}
+
+@pytest.fixture
+def profile():
+    return dict(SAMPLE_PROFILE)
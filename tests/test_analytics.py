@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import random
+import datetime as dt
+
+from coach_ai.analytics import rebuild_workout_rollups, rollup_series, weekly_adherence
+from coach_ai.workouts import add_workout, delete_workout, get_workout_rollups, iter_workouts
+
+# Bornes de semaines ISO : la semaine 53 de 2026 chevauche deux mois et deux années civiles
+BOUNDARY_DAYS = ["2026-12-27", "2026-12-28", "2026-12-31", "2027-01-01", "2027-01-03", "2027-01-04",
+                 "2026-03-01", "2026-02-28", "2024-02-29"]
+
+
+def empty_state():
+    return {"workout_history": [], "workout_index": None, "workout_rollups": None}
+
+
+def test_incremental_rollups_match_full_recompute():
+    rng = random.Random(7)
+    state = empty_state()
+    live = []
+    for step in range(600):
+        if live and rng.random() < 0.4:
+            workout_id = live.pop(rng.randrange(len(live)))
+            assert delete_workout(state, workout_id)
+        else:
+            day = rng.choice(BOUNDARY_DAYS + [None, "pas une date"])
+            workout = {"date": day, "type": rng.choice(["Course", "Vélo", " ", None]),
+                       "duration": rng.choice([0, 20, 45, None])}
+            add_workout(state, workout)
+            live.append(workout["id"])
+        if step % 50 == 0:
+            assert get_workout_rollups(state) == rebuild_workout_rollups(iter_workouts(state))
+    assert get_workout_rollups(state) == rebuild_workout_rollups(iter_workouts(state))
+
+
+def test_week_boundaries():
+    state = empty_state()
+    for day in ["2026-12-31", "2027-01-01", "2027-01-03", "2027-01-04"]:
+        add_workout(state, {"date": day, "type": "Course", "duration": 30})
+    rollups = get_workout_rollups(state)
+    assert rollups["week"] == {"2026-S53": {"sessions": 3, "minutes": 90}, "2027-S01": {"sessions": 1, "minutes": 30}}
+    assert rollups["month"] == {"2026-12": {"sessions": 1, "minutes": 30}, "2027-01": {"sessions": 3, "minutes": 90}}
+
+    first = next(iter_workouts(state))
+    delete_workout(state, first["id"])
+    assert rollups["month"] == {"2027-01": {"sessions": 3, "minutes": 90}}
+    assert rollups["week"]["2026-S53"] == {"sessions": 2, "minutes": 60}
+
+
+def test_series_and_adherence_read_rollups():
+    state = empty_state()
+    for day in ["2026-12-31", "2027-01-01", "2027-01-04", "2027-01-05", "2027-01-06", "2027-01-07"]:
+        add_workout(state, {"date": day, "type": "Course", "duration": 30})
+    rollups = get_workout_rollups(state)
+    today = dt.date(2027, 1, 7)
+    weekly = rollup_series(rollups, "week", 3, today)
+    assert weekly["période"] == ["2026-S52", "2026-S53", "2027-S01"]
+    assert weekly["séances"] == [0, 2, 4] and weekly["minutes"] == [0, 60, 120]
+    assert rollup_series(rollups, "month", 2, today)["période"] == ["2026-12", "2027-01"]
+    assert weekly_adherence(rollups, 3, 3, today)["réalisation (%)"] == [0, 67, 100]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import json
+
+from coach_ai.batch import (
+    edit_batch_job, ingest_batch_results, iter_profile_batch_jobs, run_local_batch, write_batch_requests,
+)
+from coach_ai.llm import build_plan_request
+from coach_ai.roster import read_roster_checkpoint
+
+def _roster(profile):
+    return [dict(profile, athlete_id="a1"), dict(profile, athlete_id="a2", jours_sem=5)]
+
+def test_batch_requests_use_interactive_prompts(profile):
+    jobs = list(iter_profile_batch_jobs(_roster(profile)))
+    assert [j["custom_id"] for j in jobs] == ["a1::plan", "a1::nutrition", "a2::plan", "a2::nutrition"]
+    assert jobs[0]["body"] == build_plan_request(profile)
+    assert jobs[0]["url"] == "/v1/chat/completions"
+
+def test_local_batch_round_trip(profile, tmp_path):
+    requests_path = tmp_path / "requests.jsonl"
+    results_path = tmp_path / "results.jsonl"
+    store_path = tmp_path / "store" / "plans.jsonl"
+
+    jobs = list(iter_profile_batch_jobs(_roster(profile), kinds=("plan",)))
+    jobs.append(edit_batch_job("a1", "moins de cardio", "**Jour 1 — Full Body**\n- Squats", profile))
+    assert write_batch_requests(str(requests_path), jobs) == 3
+    assert run_local_batch(str(requests_path), str(results_path)) == 3
+
+    stats = ingest_batch_results(str(results_path), str(store_path))
+    assert stats == {"ok": 3, "failed": 0}
+    store = read_roster_checkpoint(str(store_path))
+    assert set(store) == {"a1", "a2"}
+    assert store["a1"]["plan"].startswith("**Jour 1")
+    assert "5 jours/semaine" in store["a2"]["plan"]
+
+def test_ingest_skips_failed_results(tmp_path):
+    results_path = tmp_path / "results.jsonl"
+    results_path.write_text(json.dumps({
+        "custom_id": "a1::plan", "response": None, "error": {"code": "x", "message": "boom"}
+    }) + "\n", encoding="utf-8")
+    stats = ingest_batch_results(str(results_path), str(tmp_path / "store.jsonl"))
+    assert stats == {"ok": 0, "failed": 1}
+
+def test_local_batch_reads_profile_after_prompt_prefix(profile, tmp_path):
+    requests_path = tmp_path / "requests.jsonl"
+    results_path = tmp_path / "results.jsonl"
+    jobs = list(iter_profile_batch_jobs([dict(profile, athlete_id="a1", blessures="genou: ménisque")]))
+    foreign = json.loads(json.dumps(jobs[0]))
+    foreign["custom_id"] = "a2::plan"
+    foreign["body"]["messages"][-1]["content"] = "Voici: " + foreign["body"]["messages"][-1]["content"]
+    write_batch_requests(str(requests_path), jobs + [foreign])
+    run_local_batch(str(requests_path), str(results_path))
+
+    results = [json.loads(line) for line in results_path.read_text(encoding="utf-8").splitlines()]
+    assert [r["error"] is None for r in results] == [True, True, False]
+    assert results[2]["error"]["code"] == "local_error"
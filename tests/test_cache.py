@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import time
+import sqlite3
+import threading
+
+from coach_ai import cache as cache_module
+from coach_ai import weather
+from coach_ai.cache import SharedCache, SQLiteCacheBackend
+
+def _cache(tmp_path):
+    return SharedCache(SQLiteCacheBackend(str(tmp_path / "cache.sqlite3")))
+
+def test_same_key_is_computed_once(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"ok": True}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("ns", "k", 60, compute)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"ok": True}] * 4
+
+def test_slow_key_does_not_block_other_keys(tmp_path):
+    cache = _cache(tmp_path)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "lent"
+
+    slow_thread = threading.Thread(target=lambda: cache.get_or_compute("ns", "lent", 60, slow))
+    slow_thread.start()
+    assert started.wait(5)
+    try:
+        # Une autre clé (quelle que soit sa tranche) est servie pendant le calcul lent
+        begin = time.monotonic()
+        for i in range(100):
+            assert cache.get_or_compute("ns", f"rapide-{i}", 60, lambda: i) == i
+        assert time.monotonic() - begin < 2
+    finally:
+        release.set()
+        slow_thread.join()
+
+def test_failed_compute_lets_waiter_retry(tmp_path):
+    cache = _cache(tmp_path)
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        return None
+
+    first = threading.Thread(target=lambda: cache.get_or_compute("ns", "k", 60, failing))
+    first.start()
+    assert started.wait(5)
+    assert cache.get_or_compute("ns", "k", 60, lambda: "relais") == "relais"
+    first.join()
+
+def test_current_weather_goes_through_shared_cache(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        return {"temperature": 12.4, "weathercode": 3}
+
+    monkeypatch.setattr(weather, "get_shared_cache", lambda: cache)
+    monkeypatch.setattr(weather, "_fetch_current_weather_remote", fetch)
+    first = weather.get_weather("Montréal")
+    assert weather.get_weather("Montreal") == first
+    assert first["temp"] == "12" and first["condition"] == "Couvert"
+    assert len(calls) == 1
+
+def _cache_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+def test_sqlite_prunes_expired_rows_on_write(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path, prune_every=4, prune_interval=3600)
+    for i in range(3):
+        backend.set(f"old{i}", b"x", 0.01)
+    time.sleep(0.05)
+    backend.set("fresh0", b"x", 60)
+    # Quatrième écriture : les entrées expirées sont purgées sans redémarrage
+    assert _cache_rows(path) == 1
+    assert backend.get("fresh0") == b"x"
+
+def test_sqlite_prunes_after_interval(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path, prune_every=1000, prune_interval=600)
+    backend.set("old", b"x", 1)
+    now = time.time()
+    monkeypatch.setattr(cache_module.time, "time", lambda: now + 601)
+    backend.set("fresh", b"x", 60)
+    assert _cache_rows(path) == 1
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+
+from coach_ai.calendar_events import (
+    apply_calendar_offsets, build_calendar_layout, compute_plan_horizon_end,
+    expand_calendar_events, iter_ics_calendar, write_ics_file,
+)
+
+SESSIONS = [
+    {"day": 1, "title": "Full Body", "description": "Squats"},
+    {"day": 2, "title": "Repos", "description": "Récupération"},
+    {"day": 3, "title": "Cardio", "description": "Course, 30 min; facile"},
+]
+
+def test_horizon_end():
+    start = dt.date(2026, 1, 5)
+    assert compute_plan_horizon_end(start) == dt.date(2026, 1, 12)
+    assert compute_plan_horizon_end(start, "3 mois") == start + dt.timedelta(days=91)
+    assert compute_plan_horizon_end(start, "3 mois", dt.date(2027, 1, 1)) == dt.date(2027, 1, 2)
+
+def test_offsets_produce_weekly_rules():
+    layout = build_calendar_layout(SESSIONS, "Matin (6h-10h)", 45)
+    events = apply_calendar_offsets(layout, dt.date(2026, 1, 5), dt.date(2026, 3, 2))
+    assert [e["startRecur"] for e in events] == ["2026-01-05", "2026-01-06", "2026-01-07"]
+    assert events[0]["daysOfWeek"] == [1]
+    assert events[1]["extendedProps"]["is_rest"]
+    assert {e["endRecur"] for e in events} == {"2026-03-02"}
+
+def test_layout_reuses_unchanged_days():
+    layout = build_calendar_layout(SESSIONS, "Matin (6h-10h)", 45)
+    changed = SESSIONS[:2] + [dict(SESSIONS[2], title="Vélo")]
+    relaid = build_calendar_layout(changed, "Matin (6h-10h)", 45, previous=layout)
+    assert relaid["days"][0]["template"] is layout["days"][0]["template"]
+    assert relaid["days"][2]["template"] is not layout["days"][2]["template"]
+
+def test_expand_keeps_weekday():
+    layout = build_calendar_layout(SESSIONS, "Soir / Nuit (19h+)", 60)
+    events = apply_calendar_offsets(layout, dt.date(2026, 1, 5), dt.date(2026, 2, 2))
+    occurrences = list(expand_calendar_events(events, dt.date(2026, 1, 10), dt.date(2026, 1, 24)))
+    starts = sorted(o["start"] for o in occurrences)
+    assert starts == [
+        "2026-01-12T18:00:00", "2026-01-13T18:00:00", "2026-01-14T18:00:00",
+        "2026-01-19T18:00:00", "2026-01-20T18:00:00", "2026-01-21T18:00:00",
+    ]
+
+def test_ics_document(tmp_path):
+    schedule = {
+        "sessions": SESSIONS, "start_date": dt.date(2026, 1, 5), "end_date": dt.date(2026, 4, 6),
+        "moment": "Midi (11h-14h)", "duree": 50, "uid": "test",
+    }
+    path = tmp_path / "plan.ics"
+    lines = write_ics_file(str(path), iter_ics_calendar([schedule], calendar_name="Essai"))
+    text = path.read_bytes().decode("utf-8")
+    assert text.startswith("BEGIN:VCALENDAR\r\n") and text.endswith("END:VCALENDAR\r\n")
+    assert text.count("BEGIN:VEVENT") == 3
+    assert "DTSTART:20260105T120000" in text and "DTEND:20260105T125000" in text
+    assert "RRULE:FREQ=WEEKLY;UNTIL=20260405T235959" in text
+    assert "Course\\, 30 min\\; facile" in text
+    assert lines == text.count("\r\n")
+    assert all(len(line.encode("utf-8")) <= 75 for line in text.split("\r\n"))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from coach_ai import plans
+from coach_ai.cli import main
+
+def test_profile_to_ics_offline(profile, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "profil.json").write_text(json.dumps(profile), encoding="utf-8")
+
+    assert main(["profil.json", "--ics", "plan.ics", "--plans-dir", "plans", "--nutrition",
+                 "--start", "2026-01-05", "--offline"]) == 0
+
+    text = (tmp_path / "plan.ics").read_text(encoding="utf-8")
+    assert text.count("BEGIN:VEVENT") == 7
+    assert "DTSTART:20260105T180000" in text
+    assert sorted(os.listdir(tmp_path / "plans")) == ["athlete-1.md", "athlete-1.nutrition.md"]
+    # Aucun fichier annexe écrit dans le dossier courant
+    assert sorted(os.listdir(tmp_path)) == ["plan.ics", "plans", "profil.json"]
+
+def test_fallback_library_path_is_explicit(profile, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "profil.json").write_text(json.dumps(profile), encoding="utf-8")
+    # main() choisit le fichier de la bibliothèque pour tout le processus : rétabli après le test
+    monkeypatch.setattr(plans, "_fallback_library_path", plans._fallback_library_path)
+    library = tmp_path / "cache" / "library.json.gz"
+    library.parent.mkdir()
+    assert main(["profil.json", "--ics", "plan.ics", "--offline", "--fallback-library", str(library)]) == 0
+    assert library.exists()
+
+def test_batch_subcommands(profile, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "effectif.jsonl").write_text(
+        json.dumps(dict(profile, athlete_id="a1")) + "\n" + json.dumps(dict(profile, athlete_id="a2")) + "\n",
+        encoding="utf-8"
+    )
+    assert main(["batch", "prepare", "effectif.jsonl", "requests.jsonl", "--kinds", "plan"]) == 0
+    assert main(["batch", "run-local", "requests.jsonl", "results.jsonl"]) == 0
+    assert main(["batch", "ingest", "results.jsonl", "--store", "store.jsonl"]) == 0
+    store = [json.loads(line) for line in (tmp_path / "store.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [r["athlete_id"] for r in store] == ["a1", "a2"]
+
+def test_unreadable_profile(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert main(["absent.json", "--offline"]) == 2
+    assert "absent.json" in capsys.readouterr().err
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from coach_ai.exercises import apply_local_substitution, find_catalog_exercises, load_exercise_catalog, resolve_local_substitution
+
+@pytest.mark.parametrize("plan, source, replacement, expected", [
+    ("- Goblet Squat: 3 x 12\n- Squats: 3 x 10", "Squat", "Squat au poids du corps",
+     "- Goblet Squat: 3 x 12\n- Squat au poids du corps: 3 x 10"),
+    ("- Box squat: 3 x 8", "Squat", "Squat au poids du corps", "- Box squat: 3 x 8"),
+    ("- Squat au poids du corps: 3 x 15", "Squat", "Goblet squat", "- Squat au poids du corps: 3 x 15"),
+    ("- Développé couché aux haltères: 3 x 10\n- Développé couché: 4 x 6", "Développé couché",
+     "Développé couché aux haltères",
+     "- Développé couché aux haltères: 3 x 10\n- Développé couché aux haltères: 4 x 6"),
+    ("- Leg curl: 3 x 12\n- Curl biceps: 3 x 12", "Curl biceps", "Extensions triceps",
+     "- Leg curl: 3 x 12\n- Extensions triceps: 3 x 12"),
+    ("- Planche latérale: 3 x 20 s\n- Planche: 3 x 30 s", "Planche", "Planche latérale",
+     "- Planche latérale: 3 x 20 s\n- Planche latérale: 3 x 30 s"),
+    ("- Presse à cuisses: 4 x 10", "Presse à cuisses", "Fentes", "- Fentes: 4 x 10"),
+    ("- Rowing haltère un bras: 3 x 10\n- Rowing: 3 x 12", "Rowing barre", "Tirage horizontal",
+     "- Rowing haltère un bras: 3 x 10\n- Tirage horizontal: 3 x 12"),
+])
+def test_substitution_replaces_whole_names_only(plan, source, replacement, expected):
+    new_plan, count = apply_local_substitution(plan, source, replacement)
+    assert new_plan == expected
+    assert count == expected.count(replacement) - plan.count(replacement)
+
+def test_replacement_name_is_inserted_literally():
+    new_plan, count = apply_local_substitution("- Pompes: 3 x 10", "Pompes", r"Dips \1 \g<0>")
+    assert (new_plan, count) == (r"- Dips \1 \g<0>: 3 x 10", 1)
+
+def test_overlapping_names_are_not_mentions():
+    catalog = load_exercise_catalog()
+    names = [e["name"] for e in find_catalog_exercises("goblet squat puis leg curl", catalog)]
+    assert names == ["Goblet squat", "Leg curl"]
+
+def test_resolution_requires_exercise_in_plan(profile):
+    plan = "**Jour 1 — Jambes**\n- Leg curl: 3 x 12\n- Goblet squat: 3 x 10"
+    assert resolve_local_substitution("remplace le curl biceps", profile, plan) is None
+    assert resolve_local_substitution("remplace le squat", profile, plan) is None
+    assert resolve_local_substitution("remplace le squat", profile, "") is None
+    resolution = resolve_local_substitution("remplace le goblet squat", profile, plan)
+    assert resolution["source"]["name"] == "Goblet squat"
+    assert resolution["options"]
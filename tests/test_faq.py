@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from coach_ai.faq import FaqCache, faq_system_prompt, mentions_personal_data
+
+def test_similar_question_in_same_bucket_is_served(profile):
+    cache = FaqCache()
+    key = cache.make_key("Combien de protéines par jour pour la récupération ?", profile)
+    cache.put(key, "Environ 1,6 g/kg.")
+    assert cache.get(cache.make_key("combien de proteine par jour pour récupérer", profile)) == "Environ 1,6 g/kg."
+    other = dict(profile, objectif_principal="prise de masse")
+    assert cache.get(cache.make_key("Combien de protéines par jour pour la récupération ?", other)) is None
+
+def test_personal_questions_are_not_cached(profile):
+    cache = FaqCache()
+    assert cache.make_key("Que changer dans mon plan ?", profile) is None
+    assert cache.make_key("Je pèse 80 kg, combien de protéines ?", profile) is None
+    assert cache.make_key("Conseils pour Camille ?", profile, identity=("Camille", None)) is None
+    assert mentions_personal_data("Un athlète doit-il s'étirer ?", profile, identity=("Athlète", None))
+
+def test_faq_prompt_has_no_personal_context(profile):
+    profile = dict(profile, ville="Sherbrooke", blessures="genou droit", age=37)
+    prompt = faq_system_prompt(profile)
+    assert "perte de poids" in prompt and "80-89 kg" in prompt
+    for private in ("Sherbrooke", "genou", "37", "180"):
+        assert private not in prompt
+
+def test_similarity_scan_is_capped(profile):
+    cache = FaqCache(scan_limit=5)
+    old = cache.make_key("Faut-il s'étirer après la course à pied en hiver ?", profile)
+    cache.put(old, "Oui, en douceur.")
+    for i in range(10):
+        cache.put(cache.make_key(f"Question {chr(97 + i)}{chr(97 + i)}{chr(97 + i)} sur la nutrition", profile), "…")
+    similar = cache.make_key("Faut-il s'étirer après la course à pied en hiver froid ?", profile)
+    assert similar != old
+    assert cache.get(similar) is None
+    # Un accès exact remet l'entrée parmi les plus récentes de son groupe
+    assert cache.get(old) == "Oui, en douceur."
+    assert cache.get(similar) == "Oui, en douceur."
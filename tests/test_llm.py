@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+import requests
+
+from coach_ai import llm
+from coach_ai.llm import JsonStreamScanner, ai_edit_plan, build_plan_request
+from coach_ai.profile import QUESTIONS, profile_from_answers
+
+PLAN = "## Jour 1\n- Squat — 3 x 10\n"
+
+
+class TrickleRaw:
+    """Flux brut qui ne rend que quelques octets par lecture (coupe les caractères UTF-8)."""
+
+    def __init__(self, data: bytes, step: int = 3):
+        self.data, self.pos, self.step = data, 0, step
+        self.closed = False
+
+    def read(self, amt=None, **kwargs):
+        chunk = self.data[self.pos:self.pos + min(amt or self.step, self.step)]
+        self.pos += len(chunk)
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+def sse_response(deltas, usage=None, status=200, step=3):
+    lines = []
+    for delta in deltas:
+        lines.append("data: " + json.dumps({"choices": [{"delta": {"content": delta}}]}, ensure_ascii=False))
+    if usage:
+        lines.append("data: " + json.dumps({"choices": [], "usage": usage}))
+    lines.append("data: [DONE]")
+    response = requests.Response()
+    response.status_code = status
+    response.encoding = "utf-8"
+    response.raw = TrickleRaw("\n\n".join(lines).encode("utf-8") + b"\n\n", step)
+    return response
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Remplace l'appel HTTP par une réponse SSE préparée ; retourne la liste des réponses servies."""
+    served = []
+
+    def install(response):
+        def fake_request(service, method, url, **kwargs):
+            assert kwargs["json"]["stream"] is True
+            served.append(response)
+            return response
+        monkeypatch.setattr(llm, "external_request", fake_request)
+        return response
+
+    install.served = served
+    return install
+
+
+def test_scanner_ignores_braces_inside_strings():
+    text = '{"summary": "pas de } ici, ni de \\" { ]", "new_plan": "## Jour 1", "tags": [1, {"a": null}]}'
+    scanner = JsonStreamScanner()
+    done = [scanner.feed(ch) for ch in text]
+    assert done[-1] and not any(done[:-1])
+    assert scanner.text() == text and json.loads(scanner.text())["tags"] == [1, {"a": None}]
+
+
+def test_scanner_accepts_json_fence_and_ignores_trailing_text():
+    scanner = JsonStreamScanner()
+    assert not scanner.feed("```js")
+    assert scanner.feed('on\n{"a": 1}\n```\nBonne séance')
+    assert scanner.text() == '{"a": 1}'
+
+
+@pytest.mark.parametrize("chunks", [
+    ["Voici ton plan", " modifié : {"],
+    ['{"a": [1, 2}'],
+    ['{"a": ', "vrai}"],
+])
+def test_scanner_rejects_malformed_output(chunks):
+    scanner = JsonStreamScanner()
+    with pytest.raises(ValueError):
+        for chunk in chunks:
+            scanner.feed(chunk)
+
+
+def test_edit_plan_streams_result_and_usage(profile, serve):
+    obj = {"new_plan": "## Jour 1\n- Échauffement — 10 min\n- Fentes — 3 x 12", "summary": "Squat → fentes"}
+    text = json.dumps(obj, ensure_ascii=False)
+    response = serve(sse_response([text[:7], text[7:30], text[30:]], usage={"total_tokens": 321}))
+    result = ai_edit_plan("sk-test", "remplace les squats par des fentes", PLAN, profile)
+    assert result["ok"] and result["new_plan"] == obj["new_plan"]
+    assert result["summary"] == "Squat → fentes"
+    assert result["usage"] == {"total_tokens": 321}
+    assert response.raw.closed
+
+
+def test_edit_plan_decodes_utf8_split_across_reads(profile, serve):
+    obj = {"new_plan": "## Jour 1\n- Élévations latérales — 3 x 12 💪", "summary": "Épaules"}
+    # Une lecture de 1 à 3 octets coupe « É », « — » et l'émoji au milieu de leur encodage
+    for step in (1, 2, 3):
+        serve(sse_response([json.dumps(obj, ensure_ascii=False)], step=step))
+        result = ai_edit_plan("sk-test", f"ajoute des élévations ({step})", PLAN, profile)
+        assert result["new_plan"] == obj["new_plan"] and result["summary"] == "Épaules"
+
+
+def test_malformed_stream_aborts_early(profile, serve):
+    deltas = ["Bien sûr ! Voici", " le plan :"] + ['{"new_plan": "## Jour 1"}'] * 50
+    response = serve(sse_response(deltas, usage={"total_tokens": 999}, step=64))
+    result = ai_edit_plan("sk-test", "rends le plan plus dur", PLAN, profile)
+    assert not result["ok"] and result["summary"] == "Réponse modèle non exploitable."
+    # La réception s'arrête au premier fragment invalide : le reste du flux n'est jamais lu
+    assert response.raw.closed and response.raw.pos < len(response.raw.data) // 4
+    assert result["usage"] == {}
+
+
+def test_schema_invalid_object_is_rejected(profile, serve):
+    serve(sse_response(['{"plan": "## Jour 1", "summary": "ok"}'], usage={"total_tokens": 50}))
+    result = ai_edit_plan("sk-test", "ajoute du gainage", PLAN, profile)
+    assert not result["ok"] and result["new_plan"] == ""
+    assert result["usage"] == {"total_tokens": 50}
+
+
+def test_http_error_is_reported(profile, serve):
+    response = serve(sse_response([], status=500))
+    result = ai_edit_plan("sk-test", "supprime le jour 3", PLAN, profile)
+    assert not result["ok"] and result["summary"] == "Erreur API: 500"
+    assert response.raw.closed
+
+
+def test_plan_prompt_sends_every_answer(profile):
+    answers = dict(profile, moment="Matin (6h-9h)", ville="Montréal", nutrition="Oui, absolument")
+    content = build_plan_request(profile_from_answers(answers))["messages"][-1]["content"]
+    assert content.startswith(llm.PLAN_PROFILE_PREFIX)
+    sent = json.loads(content[len(llm.PLAN_PROFILE_PREFIX):])
+    assert list(sent) == [q["key"] for q in QUESTIONS]
+    assert sent["moment"] == "Matin (6h-9h)" and sent["ville"] == "Montréal" and sent["nutrition"] == "Oui, absolument"
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from coach_ai import notifications
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+
+    def fake_request(service, method, url, **kwargs):
+        calls.append({"service": service, "method": method, "url": url, **kwargs})
+        return SimpleNamespace(status_code=200)
+
+    monkeypatch.setattr(notifications, "external_request", fake_request)
+    return calls
+
+
+def test_text_message_payload(sent):
+    assert notifications.send_whatsapp_text_message("15141234567", "Salut", "123", "tok")
+    call = sent[0]
+    assert call["service"] == "whatsapp" and call["method"] == "POST"
+    assert call["url"].endswith("/v18.0/123/messages")
+    assert call["headers"]["Authorization"] == "Bearer tok"
+    body = json.loads(call["data"])
+    assert body["to"] == "15141234567" and body["text"]["body"] == "Salut"
+
+
+def test_template_message_payload(sent):
+    assert notifications.send_whatsapp_template_message("15141234567", "rappel", "123", "tok", "v19.0", [3, "Soir"])
+    body = json.loads(sent[0]["data"])
+    assert sent[0]["url"].endswith("/v19.0/123/messages")
+    assert body["template"]["name"] == "rappel"
+    assert body["template"]["components"][0]["parameters"] == [
+        {"type": "text", "text": "3"}, {"type": "text", "text": "Soir"}
+    ]
+
+
+def test_api_error_returns_false(monkeypatch):
+    monkeypatch.setattr(notifications, "external_request", lambda *a, **k: SimpleNamespace(status_code=401))
+    assert not notifications.send_whatsapp_text_message("15141234567", "Salut", "123", "tok")
+
+
+def test_sidebar_test_button_sends(sent, tmp_path, monkeypatch):
+    """Le bouton « Test » de la barre latérale passe par le module notifications."""
+    apptest = pytest.importorskip("streamlit.testing.v1")
+    monkeypatch.chdir(tmp_path)
+    app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+    at = apptest.AppTest.from_file(app_path, default_timeout=60)
+    at.run()
+    at.text_input(key="sidebar_wa_phone").set_value("123")
+    at.text_input(key="sidebar_wa_token").set_value("tok")
+    at.text_input(key="sidebar_recipient").set_value("15141234567")
+    at.run()
+    at.button(key="sidebar_test").click().run()
+    assert not at.exception, at.exception
+    assert [s.value for s in at.success] == ["Envoyé!"]
+    assert json.loads(sent[0]["data"])["to"] == "15141234567"
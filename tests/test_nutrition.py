@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from coach_ai.nutrition import (
+    compute_calorie_targets, compute_calorie_targets_batch, fallback_nutrition, profiles_to_calorie_columns,
+)
+
+def test_batch_matches_scalar(profile):
+    profiles = [
+        profile,
+        dict(profile, sexe="Femme", objectif_principal="prise de masse", poids_kg=58, age=45),
+        {},
+    ]
+    batch = compute_calorie_targets_batch(**profiles_to_calorie_columns(profiles))
+    for i, p in enumerate(profiles):
+        calories, proteines, glucides, lipides, _ = compute_calorie_targets(p)
+        assert (calories, proteines, glucides, lipides) == (
+            batch["calories"][i], batch["proteines"][i], batch["glucides"][i], batch["lipides"][i]
+        )
+
+def test_objective_adjusts_calories(profile):
+    base = compute_calorie_targets(dict(profile, objectif_principal="forme"))[0]
+    assert compute_calorie_targets(profile)[0] == base - 400
+    assert compute_calorie_targets(dict(profile, objectif_principal="gain musculaire"))[0] == base + 400
+
+def test_fallback_nutrition_covers_the_week(profile):
+    text = fallback_nutrition(profile)
+    calories = compute_calorie_targets(profile)[0]
+    assert all(f"Jour {d}" in text for d in range(1, 8))
+    assert f"{calories} kcal" in text
+
+def test_batch_is_vectorized():
+    n = 1000
+    result = compute_calorie_targets_batch(
+        np.full(n, 70.0), np.full(n, 175.0), np.full(n, 30), ["Homme"] * n,
+        ["Actif (Travail physique)"] * n, ["perte de poids"] * n
+    )
+    assert result["calories"].shape == (n,)
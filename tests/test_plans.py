@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import os
+
+from coach_ai.plans import fallback_plan, parse_workout_plan, plan_digest
+
+PLAN = """# Mon plan
+
+**Jour 1 — Full Body**
+- Squats: 3 x 10
+
+**Jour 2 — Repos complet**
+Récupération
+
+### Jour 3: Cardio
+- Course 30 min
+"""
+
+def test_parse_workout_plan_reads_each_day_format():
+    sessions = parse_workout_plan(PLAN)
+    assert [(s["day"], s["title"]) for s in sessions] == [
+        (1, "Full Body"), (2, "Repos complet"), (3, "Cardio"),
+    ]
+    assert sessions[0]["description"] == "- Squats: 3 x 10"
+
+def test_parse_workout_plan_empty():
+    assert parse_workout_plan("") == []
+    assert parse_workout_plan(None) == []
+
+def test_plan_digest_is_stable():
+    assert plan_digest(PLAN) == plan_digest(str(PLAN))
+    assert plan_digest(PLAN) != plan_digest(PLAN + " ")
+    assert len(plan_digest(PLAN)) == 32
+
+def test_fallback_plan_respects_training_days(profile, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    plan = fallback_plan(profile)
+    sessions = parse_workout_plan(plan)
+    assert len(sessions) == 7
+    assert sum("Repos" not in s["title"] for s in sessions) == profile["jours_sem"]
+    assert "perte de poids" in plan
+    # Sans chemin configuré, la bibliothèque reste en mémoire
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from coach_ai.resilience import (
+    CircuitBreaker, DeadlineExceededError, action_io_budget, external_request, io_deadline,
+    remaining_io_budget, start_io_budget,
+)
+
+def test_circuit_breaker_opens_then_probes():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_exhausted_budget_fails_fast():
+    token = io_deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(DeadlineExceededError):
+            external_request("openai", "GET", "http://127.0.0.1:9", timeout=60)
+        assert remaining_io_budget(60.0) == 0.0
+    finally:
+        io_deadline.reset(token)
+
+def test_action_budget_replaces_then_restores_run_budget():
+    token = io_deadline.set(None)
+    try:
+        assert remaining_io_budget(90.0) == 90.0
+        start_io_budget(0.5)
+        run_deadline = io_deadline.get()
+        with action_io_budget(120):
+            assert remaining_io_budget(0.0) > 100
+        assert io_deadline.get() == run_deadline
+    finally:
+        io_deadline.reset(token)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import threading
+
+from coach_ai import roster
+from coach_ai.roster import RosterRuns, generate_roster_plans
+
+def _roster(profile):
+    return [dict(profile, athlete_id="a1"), dict(profile, athlete_id="a2", jours_sem=5)]
+
+def test_roster_generation_resumes_from_checkpoint(profile, tmp_path):
+    checkpoint = tmp_path / "roster.jsonl"
+    seen = []
+    results = generate_roster_plans(
+        "", _roster(profile), str(checkpoint), max_workers=2, include_nutrition=False,
+        progress_callback=lambda done, total, record: seen.append((done, total))
+    )
+    assert [r["athlete_id"] for r in results] == ["a1", "a2"]
+    assert all(r["source"] == "fallback" for r in results)
+    assert seen[-1] == (2, 2)
+
+    seen.clear()
+    generate_roster_plans("", _roster(profile), str(checkpoint), include_nutrition=False,
+                          progress_callback=lambda done, total, record: seen.append((done, total)))
+    assert seen == [(2, 2)]
+
+def test_roster_runs_in_background_and_caches_results(profile, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "roster.jsonl")
+    release = threading.Event()
+    real_generate = roster.generate_roster_plans
+
+    def slow_generate(*args, **kwargs):
+        release.wait(5)
+        return real_generate(*args, **kwargs)
+
+    monkeypatch.setattr(roster, "generate_roster_plans", slow_generate)
+    runs = RosterRuns()
+    assert runs.start("", _roster(profile), checkpoint, include_nutrition=False)
+    assert runs.is_running(checkpoint)
+    assert not runs.start("", _roster(profile), checkpoint, include_nutrition=False)
+    assert runs.results(checkpoint, _roster(profile)) == ([], "")
+
+    release.set()
+    for _ in range(100):
+        if not runs.is_running(checkpoint):
+            break
+        time.sleep(0.05)
+    assert not runs.is_running(checkpoint) and runs.error(checkpoint) is None
+
+    records, payload = runs.results(checkpoint, _roster(profile))
+    assert [r["athlete_id"] for r in records] == ["a1", "a2"]
+    assert [json.loads(line)["athlete_id"] for line in payload.splitlines()] == ["a1", "a2"]
+    # Fichier de reprise inchangé : la charge mise en cache est réutilisée telle quelle
+    assert runs.results(checkpoint, _roster(profile))[1] is payload
+
+def test_roster_run_error_is_reported(profile, tmp_path, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("disque plein")
+
+    monkeypatch.setattr(roster, "generate_roster_plans", broken)
+    runs = RosterRuns()
+    checkpoint = str(tmp_path / "roster.jsonl")
+    runs.start("", _roster(profile), checkpoint)
+    for _ in range(100):
+        if not runs.is_running(checkpoint):
+            break
+        time.sleep(0.05)
+    assert runs.error(checkpoint) == "disque plein"
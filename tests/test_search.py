@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from coach_ai.search import SearchIndex
+
+def test_prefix_search_newest_first():
+    index = SearchIndex()
+    index.add(("workout", "w1"), "Course fractionnée, genou sensible")
+    index.add(("chat", 1), "Comment protéger mon genou ?")
+    index.add(("chat", 2), "Séance de vélo")
+    result = index.search("gen")
+    assert result == {"total": 2, "refs": [("chat", 1), ("workout", "w1")]}
+    assert index.search("GENOU fractionne")["refs"] == [("workout", "w1")]
+    assert index.search("natation")["total"] == 0
+
+def test_remove_and_paginate():
+    index = SearchIndex()
+    for i in range(5):
+        index.add(("chat", i), f"message {i}")
+    index.remove(("chat", 4), "message 4")
+    page = index.search("mess", page=1, page_size=3)
+    assert page["total"] == 4
+    assert page["refs"] == [("chat", 0)]
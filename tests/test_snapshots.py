@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+from collections import deque
+
+import pytest
+
+from coach_ai import session, snapshots
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SESSION_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(session, "CHAT_SPILL_DIR", str(tmp_path / "spill"))
+    return tmp_path
+
+
+def make_state(**extra):
+    state = {
+        "session_uid": "a" * 32, "step": "dashboard", "answers": {"ville": "Montréal"},
+        "user_name": "Sam", "user_email": "sam@example.com", "recipient_phone": "15141234567",
+        "calendar_start_date": dt.date(2026, 10, 19), "notification_time": dt.time(7, 30),
+        "chat_history": deque([{"seq": 0, "role": "user", "content": "bonjour"}]), "chat_seq": 1,
+        "workout_history": [{"id": "w1", "date": "2026-10-19", "type": "Course", "duration": 30}, None],
+    }
+    state.update(extra)
+    session.set_large_text(state, "plan_text", "## Jour 1\n" + "- Squat — 3 x 10\n" * 200)
+    return state
+
+
+def test_json_round_trip_without_msgpack(monkeypatch):
+    monkeypatch.setattr(snapshots, "MSGPACK_AVAILABLE", False)
+    data = snapshots.collect_session_snapshot(make_state())
+    codec, payload = snapshots.pack_snapshot(data)
+    assert codec == snapshots.SNAPSHOT_CODEC_JSON
+    blob = snapshots.encode_session_snapshot(codec, payload)
+    assert blob[:4] == snapshots.SNAPSHOT_MAGIC
+    assert snapshots.decode_session_snapshot(blob) == data
+
+
+def test_msgpack_round_trip():
+    pytest.importorskip("msgpack")
+    data = snapshots.collect_session_snapshot(make_state())
+    codec, payload = snapshots.pack_snapshot(data)
+    assert codec == snapshots.SNAPSHOT_CODEC_MSGPACK
+    assert snapshots.decode_session_snapshot(snapshots.encode_session_snapshot(codec, payload)) == data
+
+
+def test_msgpack_snapshot_unreadable_without_msgpack(monkeypatch):
+    monkeypatch.setattr(snapshots, "MSGPACK_AVAILABLE", False)
+    blob = snapshots.encode_session_snapshot(snapshots.SNAPSHOT_CODEC_MSGPACK, b"\x80")
+    assert snapshots.decode_session_snapshot(blob) is None
+
+
+def test_rejects_foreign_or_corrupted_blobs():
+    payload = b'{"step":"dashboard"}'
+    assert snapshots.decode_session_snapshot(b"XXXX\x01\x02" + payload) is None
+    future = snapshots.SNAPSHOT_MAGIC + bytes([snapshots.SNAPSHOT_SCHEMA_VERSION + 1, 2])
+    assert snapshots.decode_session_snapshot(future + payload) is None
+    assert snapshots.decode_session_snapshot(snapshots.SNAPSHOT_MAGIC + b"\x01\x02garbage") is None
+
+
+def test_contact_data_is_never_written():
+    data = snapshots.collect_session_snapshot(make_state())
+    assert "user_email" not in data and "recipient_phone" not in data
+    assert data["workout_history"] == [{"id": "w1", "date": "2026-10-19", "type": "Course", "duration": 30}]
+
+
+def test_restore_round_trip(dirs):
+    state = make_state()
+    blob = snapshots.changed_session_snapshot(state)
+    assert blob and snapshots.changed_session_snapshot(state) is None
+
+    key = snapshots.new_user_key()
+    writer = snapshots.SnapshotWriter()
+    writer.submit(key, blob)
+    assert writer.flush()
+
+    restored = {"session_uid": "b" * 32}
+    assert snapshots.load_session_snapshot(restored, key)
+    assert restored["calendar_start_date"] == dt.date(2026, 10, 19)
+    assert restored["notification_time"] == dt.time(7, 30)
+    assert session.get_large_text(restored, "plan_text") == session.get_large_text(state, "plan_text")
+    assert list(restored["chat_history"]) == list(state["chat_history"])
+    assert "user_email" not in restored and "recipient_phone" not in restored
+
+
+def test_user_key_acceptance(dirs):
+    key = snapshots.new_user_key()
+    assert len(key) == 22
+    # Clé bien formée mais jamais émise (aucun instantané) : refusée
+    assert not snapshots.is_known_user_key(key)
+
+    writer = snapshots.SnapshotWriter()
+    writer.submit(key, snapshots.encode_session_snapshot(snapshots.SNAPSHOT_CODEC_JSON, b"{}"))
+    assert writer.flush()
+    assert snapshots.is_known_user_key(key)
+
+    for malformed in [None, "", "testuser12345", key[:-1], key + "A", key + "\n", "../" + key[3:], "é" * 22]:
+        assert not snapshots.is_known_user_key(malformed), malformed
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import Future
+
+import pytest
+
+from coach_ai.profile import QUESTIONS, profile_from_answers
+from coach_ai.speculation import SpeculationPool
+
+PLAN = "## Jour 1\n- Squat — 3 x 10\n"
+EDITED = {"ok": True, "new_plan": "## Jour 1\n- Fentes — 3 x 10\n", "summary": "ok", "usage": {"total_tokens": 120}}
+
+
+class StubExecutor:
+    """Exécuteur qui n'exécute rien : le test décide quand et comment chaque travail se termine."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.calls.append((fn, args, future))
+        return future
+
+
+@pytest.fixture
+def pool():
+    return SpeculationPool(executor=StubExecutor())
+
+
+def last_future(pool):
+    return pool.executor.calls[-1][2]
+
+
+def test_hit_requires_same_instruction_and_plan(pool, profile):
+    pool.start_edit("uid", "sk-test", "remplace les squats", PLAN, profile)
+    last_future(pool).set_result(EDITED)
+    assert pool.take_edit("uid", "remplace les pompes", PLAN) is None
+    assert pool.metrics["discarded"] == 1 and "uid" not in pool.pending
+
+    pool.start_edit("uid", "sk-test", "remplace les squats", PLAN, profile)
+    last_future(pool).set_result(EDITED)
+    assert pool.take_edit("uid", "remplace les squats", PLAN + "- Gainage — 3 x 30 s\n") is None
+    assert pool.metrics["discarded"] == 2
+
+    pool.start_edit("uid", "sk-test", "remplace les squats", PLAN, profile)
+    last_future(pool).set_result(EDITED)
+    assert pool.take_edit("uid", "remplace les squats", PLAN) == EDITED
+    assert pool.metrics["hits"] == 1 and pool.metrics["used_tokens"] == 120
+    # Les deux résultats écartés avaient déjà consommé leurs tokens
+    assert pool.metrics["started"] == 3 and pool.metrics["wasted_tokens"] == 240
+    # Le résultat n'est servi qu'une fois
+    assert pool.take_edit("uid", "remplace les squats", PLAN) is None
+
+
+def test_sessions_do_not_share_speculations(pool, profile):
+    pool.start_edit("a", "sk-test", "remplace les squats", PLAN, profile)
+    last_future(pool).set_result(EDITED)
+    assert pool.take_edit("b", "remplace les squats", PLAN) is None
+    assert pool.take_edit("a", "remplace les squats", PLAN) == EDITED
+
+
+def test_discard_before_start_cancels_without_waste(pool, profile):
+    pool.start_edit("uid", "sk-test", "remplace les squats", PLAN, profile)
+    future = last_future(pool)
+    pool.discard_edit("uid")
+    assert future.cancelled()
+    assert pool.metrics["discarded"] == 1 and pool.metrics["wasted_tokens"] == 0
+
+
+def test_discard_while_running_counts_wasted_tokens(pool, profile):
+    pool.start_edit("uid", "sk-test", "remplace les squats", PLAN, profile)
+    future = last_future(pool)
+    assert future.set_running_or_notify_cancel()
+    # Une nouvelle demande remplace la spéculation en cours, qui ne peut plus être annulée
+    pool.start_edit("uid", "sk-test", "ajoute du cardio", PLAN, profile)
+    assert pool.metrics["discarded"] == 1 and pool.metrics["wasted_tokens"] == 0
+
+    future.set_result(EDITED)
+    assert pool.metrics["wasted_tokens"] == 120
+
+    running = last_future(pool)
+    running.set_running_or_notify_cancel()
+    pool.discard_edit("uid")
+    running.set_exception(RuntimeError("timeout"))
+    assert pool.metrics["discarded"] == 2 and pool.metrics["wasted_tokens"] == 120
+
+
+def test_plan_prefetch_waits_for_all_answers_and_matches_final_profile(pool):
+    answers = {q["key"]: f"réponse {i}" for i, q in enumerate(QUESTIONS)}
+    answers["jours_sem"] = 3
+    partial = {k: v for k, v in answers.items() if k != "jours_sem"}
+    pool.start_plan_prefetch("uid", "sk-test", partial)
+    assert pool.executor.calls == []
+
+    pool.start_plan_prefetch("uid", "sk-test", answers)
+    pool.start_plan_prefetch("uid", "sk-test", dict(answers))
+    assert len(pool.executor.calls) == 1 and pool.metrics["plan_prefetches"] == 1
+    last_future(pool).set_result("## Jour 1 — Full body")
+    assert pool.take_plan_prefetch("uid", profile_from_answers(answers)) == "## Jour 1 — Full body"
+    assert pool.metrics["plan_prefetch_hits"] == 1
+
+    pool.start_plan_prefetch("uid", "sk-test", answers)
+    stale = last_future(pool)
+    assert pool.take_plan_prefetch("uid", profile_from_answers(dict(answers, ville="Québec"))) == ""
+    assert stale.cancelled()
+
+
+def test_plan_prefetch_ignores_answer_order(pool):
+    answers = {q["key"]: f"réponse {i}" for i, q in enumerate(QUESTIONS)}
+    # Réponses saisies page par page, dans un autre ordre que le questionnaire
+    pool.start_plan_prefetch("uid", "sk-test", dict(reversed(list(answers.items()))))
+    last_future(pool).set_result("## Jour 1 — Full body")
+    assert pool.take_plan_prefetch("uid", profile_from_answers(answers)) == "## Jour 1 — Full body"
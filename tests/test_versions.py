@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import time
+
+from coach_ai.versions import PlanVersionStore
+
+PLAN = "".join(
+    f"**Jour {d} — Séance {d}**\n" + "".join(f"- Exercice {d}.{i}: 3 x 10, repos 90 s\n" for i in range(6)) + "\n"
+    for d in range(1, 8)
+)
+
+def _edit(text: str, n: int) -> str:
+    return text.replace("Exercice 3.2: 3 x 10", f"Exercice 3.2: {n} x 10")
+
+def test_versions_round_trip_through_deltas():
+    store = PlanVersionStore()
+    digests = [store.put(PLAN)]
+    texts = [PLAN]
+    for n in range(1, 12):
+        texts.append(_edit(PLAN, n))
+        digests.append(store.put(texts[-1], parent=digests[-1]))
+    assert [store.get(d) for d in digests] == texts
+    # Stockage proportionnel aux modifications, pas à la taille du plan
+    assert store.stats()["bytes"] < 3 * len(PLAN.encode("utf-8"))
+
+def test_identical_plans_are_shared_and_released():
+    store = PlanVersionStore()
+    a = store.put(PLAN, owner="s1")
+    b = store.put(PLAN, owner="s2")
+    assert a == b and store.stats()["versions"] == 1
+    store.release(a, "s1")
+    assert store.get(a) == PLAN
+    store.release(a, "s2")
+    assert store.stats()["versions"] == 0
+
+def test_expired_sessions_release_their_versions():
+    store = PlanVersionStore(session_ttl=0.05)
+    parent = store.put(PLAN, owner="gone")
+    store.put(_edit(PLAN, 5), parent=parent, owner="gone")
+    kept = store.put(_edit(PLAN, 9), owner="active")
+    time.sleep(0.06)
+    assert store.touch("active")
+    store._next_sweep = 0.0
+    assert store.touch("active")
+    assert not store.touch("gone")
+    assert store.stats() == {**store.stats(), "versions": 1, "sessions": 1}
+    assert store.get(kept) == _edit(PLAN, 9)
+    # Une libération tardive de la session expirée est ignorée
+    store.release(parent, "gone")
+    assert store.get(kept) == _edit(PLAN, 9)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import warnings
+import datetime as dt
+
+from coach_ai.calendar_events import apply_calendar_offsets, build_calendar_layout, expand_calendar_events
+from coach_ai import weather
+from coach_ai.weather import annotate_events_with_forecast, forecast_session_conditions, lookup_city
+
+def test_lookup_city_exact_alias_and_prefix():
+    quebec = lookup_city("Québec")
+    assert quebec[2] == "Québec, Canada"
+    assert lookup_city("quebec city, QC") == quebec
+    assert lookup_city("St-Jérôme")[2].startswith("Saint-Jérôme")
+    assert lookup_city("Montr")[2].startswith("Montréal")
+
+def test_lookup_city_misses():
+    assert lookup_city("") is None
+    assert lookup_city("Mo") is None
+    assert lookup_city("Zzyzx-sur-Mer") is None
+
+def test_lookup_city_prefix_must_be_unique_or_whole_word():
+    # Un seul lieu derrière le préfixe, même via deux alias (London / Londres)
+    assert lookup_city("Lond")[2].startswith("Londres")
+    assert lookup_city("Trois")[2].startswith("Trois-Rivières")
+    assert lookup_city("Saint Jean")[2].startswith("Saint-Jean-sur-Richelieu")
+    # Préfixes ambigus coupés au milieu d'un mot : laissés à l'API
+    assert lookup_city("Sain") is None
+    assert lookup_city("Long") is not None and lookup_city("Lon") is None
+    assert lookup_city("St J") is None
+
+def test_ambiguous_prefix_falls_through_to_geocoding_api(monkeypatch):
+    calls = []
+
+    def remote(city):
+        calls.append(city)
+        return (45.9, -72.0, "Saint-Nulle-Part, Canada")
+
+    monkeypatch.setattr(weather, "_geocode_remote", remote)
+    assert weather.geocode_city("Sain") == (45.9, -72.0, "Saint-Nulle-Part, Canada")
+    assert weather.geocode_city("Trois")[2].startswith("Trois-Rivières")
+    assert calls == ["Sain"]
+
+def _forecast(temps, precs, day="2026-01-05"):
+    return {"hourly": {
+        "time": [f"{day}T{h:02d}:00" for h in range(len(temps))],
+        "temperature_2m": temps,
+        "precipitation_probability": precs,
+    }}
+
+def test_session_window_aggregates_hours():
+    temps = [10.0] * 24
+    precs = [0] * 24
+    temps[19] = 30.0
+    precs[18] = 80
+    conditions = forecast_session_conditions(
+        _forecast(temps, precs), ["2026-01-05T07:00:00", "2026-01-05T18:30:00", "2026-01-07T07:00:00"], 45
+    )
+    assert conditions["valid"].tolist() == [True, True, False]
+    assert conditions["indoor"].tolist() == [False, True, False]
+    assert conditions["temp_max"][1] == 30.0
+    assert conditions["precipitation"][1] == 80
+
+def test_unknown_precipitation_is_not_annotated():
+    temps = [10.0] * 24
+    precs = [None] * 24
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        conditions = forecast_session_conditions(_forecast(temps, precs), ["2026-01-05T07:00:00"], 60)
+    assert not conditions["valid"][0]
+
+def test_split_rule_resumes_on_same_weekday():
+    sessions = [{"day": 1, "title": "Full Body", "description": "Squats"},
+                {"day": 3, "title": "Cardio", "description": "Course"}]
+    layout = build_calendar_layout(sessions, "Matin (6h-10h)", 60)
+    # Lundi 5 et mercredi 7 janvier, sur 6 semaines
+    events = apply_calendar_offsets(layout, dt.date(2026, 1, 5), dt.date(2026, 2, 16))
+    forecast = _forecast([12.0] * 24 * 5, [10] * 24 * 5, day="2026-01-05")
+    forecast["hourly"]["time"] = [
+        f"2026-01-{5 + h // 24:02d}T{h % 24:02d}:00" for h in range(24 * 5)
+    ]
+    # Fenêtre de prévision du samedi 3 au jeudi 8 janvier (fin exclue)
+    annotated = annotate_events_with_forecast(events, forecast, dt.date(2026, 1, 3), dt.date(2026, 1, 8), 60)
+
+    rules = [e for e in annotated if "startRecur" in e]
+    assert sorted(e["startRecur"] for e in rules) == ["2026-01-12", "2026-01-14"]
+    starts = sorted(o["start"][:10] for o in expand_calendar_events(rules, dt.date(2026, 1, 1), dt.date(2026, 2, 16)))
+    assert all(dt.date.fromisoformat(s).weekday() in (0, 2) for s in starts)
+    assert len(starts) == 10
+    assert sorted(e["start"][:10] for e in annotated if "start" in e) == ["2026-01-05", "2026-01-07"]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from coach_ai import session
+from coach_ai.workouts import (
+    WORKOUT_COMPACT_MIN, add_workout, delete_workout, get_workout_index, iter_workouts, recent_workouts,
+)
+
+
+def make_state(tmp_path, monkeypatch, count):
+    monkeypatch.setattr(session, "CHAT_SPILL_DIR", str(tmp_path))
+    state = {"session_uid": "a" * 32, "chat_history": [], "workout_history": [],
+             "workout_index": None, "workout_rollups": None, "search_index": None}
+    for i in range(count):
+        add_workout(state, {"date": "2026-10-19", "type": "Course", "duration": 30, "notes": f"séance{i} genou"})
+    return state
+
+
+def test_delete_same_id_twice(tmp_path, monkeypatch):
+    state = make_state(tmp_path, monkeypatch, 3)
+    first = state["workout_history"][0]["id"]
+    assert delete_workout(state, first)
+    assert not delete_workout(state, first)
+    assert not delete_workout(state, "inconnu")
+    assert state["workout_history"][0] is None
+    assert [w["notes"] for w in iter_workouts(state)] == ["séance1 genou", "séance2 genou"]
+    assert state["workout_rollups"]["total"]["sessions"] == 2
+
+
+def test_ids_survive_compaction(tmp_path, monkeypatch):
+    count = 3 * WORKOUT_COMPACT_MIN
+    state = make_state(tmp_path, monkeypatch, count)
+    ids = [w["id"] for w in state["workout_history"]]
+    deleted = ids[:count // 2 + 1]
+    for workout_id in deleted:
+        assert delete_workout(state, workout_id)
+
+    # Plus de pierres tombales que de séances actives : l'historique a été compacté
+    assert None not in state["workout_history"]
+    kept = ids[len(deleted):]
+    assert [w["id"] for w in iter_workouts(state)] == kept
+    index = get_workout_index(state)
+    assert set(index) == set(kept)
+    assert all(state["workout_history"][pos]["id"] == workout_id for workout_id, pos in index.items())
+    assert [w["id"] for w in recent_workouts(state, 2)] == kept[-2:]
+
+    # Les ids restent utilisables après compactage
+    assert delete_workout(state, kept[0]) and not delete_workout(state, deleted[0])
+    assert state["workout_rollups"]["total"]["sessions"] == len(kept) - 1
+
+
+def test_search_index_drops_deleted_workouts(tmp_path, monkeypatch):
+    state = make_state(tmp_path, monkeypatch, 3)
+    assert session.search_activity(state, "genou")["total"] == 3
+
+    target = state["workout_history"][1]
+    delete_workout(state, target["id"])
+    result = session.search_activity(state, "genou")
+    assert result["total"] == 2 and target not in [item["record"] for item in result["items"]]
+    assert session.search_activity(state, "séance1")["total"] == 0
+
+    add_workout(state, {"date": "2026-10-20", "type": "Vélo", "duration": 60, "notes": "genou ok"})
+    assert [item["record"]["type"] for item in session.search_activity(state, "genou")["items"]][0] == "Vélo"